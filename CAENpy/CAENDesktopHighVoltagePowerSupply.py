@@ -2,7 +2,11 @@ import serial
 import socket
 import platform
 import time
-from threading import RLock
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, Future
+from threading import RLock, Thread, Event
+from enum import IntFlag
 
 def create_command_string(BD, CMD, PAR, CH=None, VAL=None):
 	try:
@@ -32,10 +36,91 @@ def check_successful_response(response_string):
 		raise TypeError(f'<response_string> must be an instance of <str>, received {response_string} of type {type(response_string)}.')
 	return 'OK' in response_string # According to the user manual, if there was no error the answer always contains an "OK".
 
+def _parse_parameter_value(parameter_value:str):
+	# Converts the string of a value in a response from the instrument into an int or float, if possible.
+	if parameter_value.isdigit(): # This means it only contains numerical values, thus it is an int.
+		return int(parameter_value)
+	try:
+		parameter_value = float(parameter_value)
+	except:
+		pass
+	return parameter_value
+
+def _parse_all_channels_response(response:str, parameter:str, n_channels:int) -> list:
+	# Parses the answer to a MON command sent with `CH:n_channels`, which contains the values for all the channels separated by ';'.
+	if check_successful_response(response) == False:
+		raise RuntimeError(f'Error trying to get the parameter {parameter}. The response from the instrument is: "{response}"')
+	values = [_parse_parameter_value(_) for _ in response.split('VAL:')[-1].split(';')]
+	if len(values) != n_channels:
+		raise RuntimeError(f'Expecting {n_channels} values for parameter {parameter}, one per channel, but the instrument answered "{response}". ')
+	return values
+
+class ChannelStatus(IntFlag):
+	"""The bits of the status of a channel (`PAR:STAT`), as specified in
+	the user manual. Example:
+	```
+	status = caen.get_channel_status(channel=0)
+	if ChannelStatus.TRIP in status:
+		print('Channel 0 was switched off because of overcurrent.')
+	if status & ChannelStatus.RAMPING:
+		print('Channel 0 is ramping.')
+	```
+	"""
+	ON = 1<<0 # Channel is on.
+	RUP = 1<<1 # Channel is ramping up.
+	RDW = 1<<2 # Channel is ramping down.
+	OVC = 1<<3 # Overcurrent, IMON >= ISET.
+	OVV = 1<<4 # Overvoltage, VMON > VSET + 2 %.
+	UNV = 1<<5 # Undervoltage, VMON < VSET - 2 %.
+	MAXV = 1<<6 # Output voltage is limited by MAXV.
+	TRIP = 1<<7 # Channel was switched off because of overcurrent for longer than TRIP.
+	OVP = 1<<8 # Output power is above the maximum.
+	OVT = 1<<9 # Temperature is above 105 °C.
+	DIS = 1<<10 # Channel disabled, remote mode with the switch in off position.
+	KILL = 1<<11 # Channel was killed from the front panel.
+	ILK = 1<<12 # Channel is in interlock from the front panel.
+	NOCAL = 1<<13 # Calibration error.
+	RAMPING = RUP | RDW
+
+def _decode_channel_status(status:ChannelStatus) -> dict:
+	# Produces the dictionary returned by `channel_status`.
+	return {
+		'status byte': int(status),
+		'output': 'on' if ChannelStatus.ON in status else 'off',
+		'ramping up': 'yes' if ChannelStatus.RUP in status else 'no',
+		'ramping down': 'yes' if ChannelStatus.RDW in status else 'no',
+		'there was overcurrent': 'yes' if ChannelStatus.OVC in status else 'no',
+	}
+
+def _default_BD(BD, default_BD0:bool):
+	if BD is None:
+		if default_BD0 == True:
+			BD = 0
+		else:
+			raise ValueError(f'Please specify a value for the <BD> parameter. Refer to the CAEN user manual.')
+	return BD
+
 def _validate_type(variable, variable_name, variable_type):
 	if not isinstance(variable, variable_type):
 		raise TypeError(f'<{variable_name}> expected object of type {variable_type}, received object of type {type(variable)}.')
 
+def _validate_ramp_targets(voltages:dict, default_BD0:bool) -> dict:
+	# Validates the `{(device, channel): voltage}` dictionaries used for ramping many channels. A `device` that is `None` is replaced by the default `BD`, so each channel has only one key.
+	_validate_type(voltages, 'voltages', dict)
+	targets = {}
+	for key,voltage in voltages.items():
+		if not isinstance(key, tuple) or len(key) != 2:
+			raise ValueError(f'The keys of <voltages> must be tuples of the form `(device, channel)`, received {repr(key)}. ')
+		device, channel = key
+		channel = _validate_numeric_type(channel, 'channel', int)
+		if device is not None:
+			device = _validate_numeric_type(device, 'device', int)
+		device = _default_BD(device, default_BD0)
+		if (device,channel) in targets:
+			raise ValueError(f'Channel {channel} of device {device} is more than once in <voltages>, received {repr(voltages)}. ')
+		targets[(device,channel)] = _validate_numeric_type(voltage, 'voltage', float)
+	return targets
+
 def _validate_numeric_type(variable, variable_name, variable_numeric_type):
 	try:
 		variable = variable_numeric_type(variable)
@@ -56,9 +141,9 @@ class CAENDesktopHighVoltagePowerSupply:
 		if ip is not None and port is not None: # This is an error, which connection protocol should we use?
 			raise ValueError(f'You have specified both <port> and <ip>. Please specify only one of them to use.')
 		elif ip is not None and port is None: # Connect via Ethernet.
-			self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-			self.socket.connect((ip, 1470)) # According to the user manual the port 1470 always has to be used.
-			self.socket.settimeout(timeout)
+			self._socket_address = (ip, 1470) # According to the user manual the port 1470 always has to be used.
+			self._socket_timeout = timeout
+			self._connect_socket()
 		elif port is not None and ip is None: # Connect via USB serial port.
 			self.serial_port = serial.Serial(
 				# This configuration is specified in the user manual.
@@ -74,15 +159,33 @@ class CAENDesktopHighVoltagePowerSupply:
 			raise ValueError(f'Please specify a serial port or an IP addres in which the CAEN device can be found.')
 
 		self._communication_lock = RLock() # To make a thread safe implementation.
+		self._received_bytes = bytearray() # Bytes received from the instrument that were not yet returned as a response.
+		self._receive_chunk = bytearray(1024) # Reused for every `recv_into`, to avoid allocating a new object each time.
+		self._ramp_monitor = _RampMonitor(self) # Takes care of all the ramps started with `start_ramp`.
+		self._channels_in_use = _ChannelsInUse() # A channel can be in only one ramp at a time.
+
+	def _connect_socket(self):
+		self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.socket.connect(self._socket_address)
+		self.socket.settimeout(self._socket_timeout)
+
+	def _resynchronize(self):
+		# Called when a read failed in the middle, e.g. a timeout. The answer we were waiting for may still arrive later, and it would then be taken as the answer to the next command, so everything in flight is discarded.
+		self._received_bytes.clear()
+		if hasattr(self, 'serial_port'): # This means that we are talking through the serial port.
+			while len(self.serial_port.read(max(1, self.serial_port.in_waiting))) > 0: # Drain until the instrument is silent for `timeout` seconds.
+				pass
+			self.serial_port.reset_input_buffer()
+		elif hasattr(self, 'socket'): # This means that we are talking through an Ethernet connection.
+			self.socket.close() # Late answers will go to this closed connection instead of to the next command.
+			try:
+				self._connect_socket()
+			except OSError:
+				pass # Nothing else we can do, the next command will fail and report it.
 
 	def send_command(self, CMD, PAR, CH=None, VAL=None, BD=None):
 		# Send a command to the CAEN device. The parameters of this method are the ones specified in the user manual.
-		if BD is None:
-			if self.default_BD0 == True:
-				BD = 0
-			else:
-				raise ValueError(f'Please specify a value for the <BD> parameter. Refer to the CAEN user manual.')
-		bytes2send = create_command_string(BD=BD, CMD=CMD, PAR=PAR, CH=CH, VAL=VAL).encode('ASCII')
+		bytes2send = create_command_string(BD=_default_BD(BD, self.default_BD0), CMD=CMD, PAR=PAR, CH=CH, VAL=VAL).encode('ASCII')
 		if hasattr(self, 'serial_port'): # This means that we are talking through the serial port.
 			with self._communication_lock:
 				self.serial_port.write(bytes2send)
@@ -92,17 +195,38 @@ class CAENDesktopHighVoltagePowerSupply:
 		else:
 			raise RuntimeError(f'There is no serial or Ethernet communication.')
 
-	def read_response(self):
-		# Reads the answer from the CAEN device.
+	def _receive_more_bytes(self):
+		# Appends to `self._received_bytes` whatever arrives next from the instrument, blocking at most `timeout` seconds.
 		if hasattr(self, 'serial_port'): # This means that we are talking through the serial port.
-			with self._communication_lock:
-				received_bytes = self.serial_port.readline()
+			received_bytes = self.serial_port.read(max(1, self.serial_port.in_waiting))
+			if len(received_bytes) == 0:
+				raise TimeoutError(f'No answer from the instrument within the timeout of {self.serial_port.timeout} seconds. ')
+			self._received_bytes += received_bytes
 		elif hasattr(self, 'socket'): # This means that we are talking through an Ethernet connection.
-			with self._communication_lock:
-				received_bytes = self.socket.recv(1024)
+			n_bytes = self.socket.recv_into(self._receive_chunk)
+			if n_bytes == 0:
+				raise RuntimeError(f'The connection with the instrument was closed. ')
+			self._received_bytes += memoryview(self._receive_chunk)[:n_bytes]
 		else:
 			raise RuntimeError(f'There is no serial or Ethernet communication.')
-		return received_bytes.decode('ASCII').replace('\n','').replace('\r','') # Remove the annoying '\r\n' in the end and convert into a string.
+
+	def read_response(self):
+		# Reads the answer from the CAEN device. Each answer is one line terminated by '\r\n', so the bytes are buffered until a full line arrives, and anything after it is kept for the next call. Otherwise an answer split in many packets, or many answers in one packet, would be attributed to the wrong command.
+		with self._communication_lock:
+			searched_until = 0
+			try:
+				while True:
+					end_of_line = self._received_bytes.find(b'\r\n', searched_until)
+					if end_of_line != -1:
+						break
+					searched_until = max(0, len(self._received_bytes)-1) # The '\r' may already be here with the '\n' still to come.
+					self._receive_more_bytes()
+			except BaseException:
+				self._resynchronize()
+				raise
+			response = self._received_bytes[:end_of_line].decode('ASCII')
+			del self._received_bytes[:end_of_line+2]
+		return response
 
 	def query(self, CMD, PAR, CH=None, VAL=None, BD=None):
 		# Sends a command and reads the answer.
@@ -111,6 +235,105 @@ class CAENDesktopHighVoltagePowerSupply:
 			response = self.read_response()
 		return response
 
+	def query_pipelined(self, commands: list, max_commands_in_flight: int=16) -> list:
+		"""Sends many commands and reads their answers, without waiting for
+		each answer before sending the next command. Through Ethernet this
+		makes the time required for e.g. configuring many channels almost
+		independent of the network latency. Through the serial port the
+		commands are simply sent one by one, since there is nothing to gain.
+		
+		Note that if one of the commands produces no answer at all (which
+		this instrument does e.g. for a `BD` that is not in the daisy
+		chain), a timeout error will be raised.
+		
+		Arguments
+		---------
+		commands: list of dict
+			Each element is a dictionary with the arguments for `query`,
+			e.g. `{'CMD':'SET', 'PAR':'VSET', 'CH':0, 'VAL':10}`.
+		max_commands_in_flight: int, default 16
+			Maximum number of commands sent before reading their answers,
+			so the input buffer of the instrument is not overflowed.
+		
+		Returns
+		-------
+		responses: list of str
+			The answer to each command, in the same order as `commands`.
+		"""
+		max_commands_in_flight = _validate_numeric_type(max_commands_in_flight, 'max_commands_in_flight', int)
+		if max_commands_in_flight < 1:
+			raise ValueError(f'<max_commands_in_flight> must be at least 1, received {max_commands_in_flight}. ')
+		if not hasattr(self, 'socket'):
+			with self._communication_lock:
+				return [self.query(**command) for command in commands]
+		
+		bytes2send = []
+		for command in commands:
+			_validate_type(command, 'command', dict)
+			command = {**command, 'BD': _default_BD(command.get('BD'), self.default_BD0)}
+			bytes2send.append(create_command_string(**command).encode('ASCII'))
+		responses = []
+		with self._communication_lock:
+			for n in range(0, len(bytes2send), max_commands_in_flight):
+				chunk = bytes2send[n:n+max_commands_in_flight]
+				try:
+					self.socket.sendall(b''.join(chunk))
+				except BaseException: # Part of the chunk may have been sent, and its answers would be taken as the answers to the next commands.
+					self._resynchronize()
+					raise
+				responses += [self.read_response() for _ in chunk] # If one of these fails, `read_response` already discards the answers still in flight.
+		return responses
+
+	def set_many_channel_parameters(self, settings: list):
+		"""Sets many parameters at once using `query_pipelined`. Example:
+		```
+		caen.set_many_channel_parameters([
+			dict(parameter='VSET', channel=n_channel, value=100)
+			for n_channel in range(4)
+		])
+		```
+		
+		Arguments
+		---------
+		settings: list of dict
+			Each element is a dictionary with the arguments for `set_single_channel_parameter`,
+			i.e. with keys `parameter`, `channel`, `value` and optionally
+			`device`.
+		"""
+		commands = []
+		for setting in settings:
+			_validate_type(setting, 'setting', dict)
+			commands.append(dict(CMD='SET', PAR=setting['parameter'], CH=setting['channel'], VAL=setting['value'], BD=setting.get('device')))
+		responses = self.query_pipelined(commands)
+		errors = [f'{setting} -> "{response}"' for setting,response in zip(settings,responses) if check_successful_response(response) == False]
+		if len(errors) > 0: # All the answers were already read, so the communication is still in sync.
+			raise RuntimeError(f'Error trying to set {len(errors)} out of {len(settings)} parameters. The responses from the instrument are: ' + ', '.join(errors))
+
+	def get_many_channel_parameters(self, requests: list) -> list:
+		"""Gets many parameters at once using `query_pipelined`, the
+		counterpart of `set_many_channel_parameters`.
+		
+		Arguments
+		---------
+		requests: list of dict
+			Each element is a dictionary with the arguments for `get_single_channel_parameter`,
+			i.e. with keys `parameter`, `channel` and optionally `device`.
+		
+		Returns
+		-------
+		values: list
+			The value of each parameter, in the same order as `requests`.
+		"""
+		commands = []
+		for request in requests:
+			_validate_type(request, 'request', dict)
+			commands.append(dict(CMD='MON', PAR=request['parameter'], CH=request['channel'], BD=request.get('device')))
+		responses = self.query_pipelined(commands)
+		errors = [f'{request} -> "{response}"' for request,response in zip(requests,responses) if check_successful_response(response) == False]
+		if len(errors) > 0:
+			raise RuntimeError(f'Error trying to get {len(errors)} out of {len(requests)} parameters. The responses from the instrument are: ' + ', '.join(errors))
+		return [_parse_parameter_value(response.split('VAL:')[-1]) for response in responses]
+
 	def get_single_channel_parameter(self, parameter: str, channel: int, device: int=None):
 		# Gets the current value of some parameter (see "MONITOR commands related to the Channels" in the CAEN user manual.)
 		# parameter: This is the <whatever> value in "PAR:whatever" that is specified in the user manual.
@@ -119,14 +342,179 @@ class CAENDesktopHighVoltagePowerSupply:
 		response = self.query(CMD='MON', PAR=parameter, CH=channel, BD=device)
 		if check_successful_response(response) == False:
 			raise RuntimeError(f'Error trying to get the parameter {parameter}. The response from the instrument is: "{response}"')
-		parameter_value = response.split('VAL:')[-1]
-		if parameter_value.isdigit(): # This means it only contains numerical values, thus it is an int.
-			return int(parameter_value)
+		return _parse_parameter_value(response.split('VAL:')[-1])
+
+	def get_parameter_all_channels(self, parameter: str, device: int=None) -> list:
+		"""Gets the current value of some parameter for all the channels
+		at once, using a single query.
+		
+		The instrument accepts `CH:N` with `N` the number of channels
+		(e.g. `CH:4` in a DT1470ET) to mean "all channels", in which
+		case it answers all the values separated by `;`. This is much
+		faster than querying each channel, especially through the serial
+		port.
+		
+		Arguments
+		---------
+		parameter: str
+			This is the <whatever> value in "PAR:whatever" that is specified
+			in the user manual, see "MONITOR commands related to the Channels".
+		device: int, default None
+			If you have more than 1 device connected in the daisy chain,
+			use this parameter to specify the device number.
+		
+		Returns
+		-------
+		values: list
+			A list with the value of the parameter for each channel, i.e.
+			`values[n_channel]`.
+		"""
+		n_channels = self._get_channels_count(device=device)
+		response = self.query(CMD='MON', PAR=parameter, CH=n_channels, BD=device)
+		return _parse_all_channels_response(response, parameter=parameter, n_channels=n_channels)
+
+	def get_many(self, parameters: list, device: int=None) -> dict:
+		"""Gets the current value of several parameters for all the channels,
+		using one query per parameter (instead of one per parameter per
+		channel). Through Ethernet these queries are pipelined with `query_pipelined`,
+		so they take a single round trip. Example:
+		```
+		values = caen.get_many(['VMON','IMON'])
+		print(values['VMON'][0]) # VMON of channel 0.
+		```
+		
+		Arguments
+		---------
+		parameters: list of str
+			The parameters to get, see "MONITOR commands related to the
+			Channels" in the user manual.
+		device: int, default None
+			If you have more than 1 device connected in the daisy chain,
+			use this parameter to specify the device number.
+		
+		Returns
+		-------
+		values: dict
+			A dictionary of the form `{parameter: [value_CH0, value_CH1, ...]}`.
+			Note that the values are the raw ones from the instrument, i.e.
+			`VMON` is not signed according to `POL` and `IMON` is in µA.
+		"""
+		if isinstance(parameters, str):
+			parameters = [parameters]
+		n_channels = self._get_channels_count(device=device)
+		responses = self.query_pipelined([dict(CMD='MON', PAR=parameter, CH=n_channels, BD=device) for parameter in parameters])
+		return {parameter: _parse_all_channels_response(response, parameter=parameter, n_channels=n_channels) for parameter,response in zip(parameters,responses)}
+
+	def start_telemetry(self, period_seconds: float=1, max_age_seconds: float=None, devices: list=None, parameters: list=None):
+		"""Starts a thread that periodically reads the monitored parameters
+		of all the channels and publishes them in a snapshot, see `get_telemetry`.
+		While the snapshot is not older than `max_age_seconds`, the `V_mon`,
+		`I_mon` and status properties of `OneCAENChannel` are
+		served from it instead of querying the instrument. This way the
+		traffic with the instrument does not depend on how many threads
+		are reading these properties.
+		
+		Arguments
+		---------
+		period_seconds: float, default 1
+			Time between the start of two consecutive scans of all the
+			channels.
+		max_age_seconds: float, default None
+			Snapshots older than this are considered outdated, and the
+			properties of `OneCAENChannel` go back to querying the
+			instrument. If `None`, twice `period_seconds` is used.
+		devices: list of int, default None
+			The devices in the daisy chain to scan. If `None`, only the
+			default one.
+		parameters: list of str, default None
+			The parameters to read in each scan. If `None`, the ones
+			required by `OneCAENChannel`, i.e. `['VMON','IMON','STAT']`.
+		"""
+		period_seconds = _validate_numeric_type(period_seconds, 'period_seconds', float)
+		if period_seconds <= 0:
+			raise ValueError(f'<period_seconds> must be positive, received {period_seconds}. ')
+		max_age_seconds = 2*period_seconds if max_age_seconds is None else _validate_numeric_type(max_age_seconds, 'max_age_seconds', float)
+		devices = [None] if devices is None else list(devices)
+		devices = list(dict.fromkeys(_default_BD(device, self.default_BD0) for device in devices)) # The snapshot is keyed by the actual `BD`, so e.g. `None` and `0` are the same device.
+		parameters = ['VMON','IMON','STAT'] if parameters is None else list(parameters)
+		self.stop_telemetry()
+		self._telemetry_max_age_seconds = max_age_seconds
+		self._telemetry_stop_event = Event()
+		self._telemetry_thread = Thread(
+			target = self._telemetry_loop,
+			kwargs = dict(period_seconds=period_seconds, devices=devices, parameters=parameters, stop_event=self._telemetry_stop_event),
+			name = 'CAEN telemetry',
+			daemon = True,
+		)
+		self._telemetry_thread.start()
+
+	def stop_telemetry(self):
+		"""Stops the thread started by `start_telemetry`, if any."""
+		if getattr(self, '_telemetry_thread', None) is not None:
+			self._telemetry_stop_event.set()
+			self._telemetry_thread.join()
+			self._telemetry_thread = None
+		self._telemetry_snapshot = None
+
+	def _telemetry_loop(self, period_seconds, devices, parameters, stop_event):
+		while not stop_event.is_set():
+			started = time.monotonic()
+			try:
+				values = {device: self.get_many(parameters, device=device) for device in devices}
+			except Exception: # The snapshot will become outdated, so the readers fall back to querying and get the error themselves.
+				pass
+			else:
+				self._telemetry_snapshot = {
+					'time': time.time(),
+					'monotonic time': started,
+					'values': values,
+				} # Replacing the whole dictionary at once, readers never see a half updated snapshot.
+			stop_event.wait(max(0, period_seconds - (time.monotonic() - started)))
+
+	def get_telemetry(self, max_age_seconds: float=None) -> dict:
+		"""Returns the latest snapshot published by the thread started
+		with `start_telemetry`.
+		
+		Arguments
+		---------
+		max_age_seconds: float, default None
+			If the snapshot is older than this, `None` is returned instead.
+			If `None`, the value given to `start_telemetry` is used.
+		
+		Returns
+		-------
+		snapshot: dict or None
+			A dictionary of the form
+			```
+			{
+				'time': float, # As returned by `time.time()` when the scan started.
+				'monotonic time': float, # As returned by `time.monotonic()` when the scan started.
+				'values': {BD: {parameter: [value_CH0, value_CH1, ...]}},
+			}
+			```
+			where `BD` is the number of each device, i.e. `0` for the
+			default one, with the raw values from the instrument (see
+			`get_many`), or
+			`None` if telemetry is not running or the snapshot is too old.
+		"""
+		snapshot = getattr(self, '_telemetry_snapshot', None)
+		if snapshot is None:
+			return None
+		if max_age_seconds is None:
+			max_age_seconds = self._telemetry_max_age_seconds
+		if time.monotonic() - snapshot['monotonic time'] > max_age_seconds:
+			return None
+		return snapshot
+
+	def _get_from_telemetry(self, parameter: str, channel: int, device: int=None):
+		# Returns the value of the parameter from the telemetry snapshot, or `None` if it is not there or it is too old.
+		snapshot = self.get_telemetry()
+		if snapshot is None:
+			return None
 		try:
-			parameter_value = float(parameter_value)
-		except:
-			pass
-		return parameter_value
+			return snapshot['values'][_default_BD(device, self.default_BD0)][parameter][channel]
+		except (KeyError, IndexError, ValueError): # `ValueError` if there is no default device, then querying will raise the proper error.
+			return None
 
 	def set_single_channel_parameter(self, parameter: str, channel: int, value, device: int=None):
 		# Sets the value of some parameter (see "SET commands related to the Channels" in the CAEN user manual.)
@@ -140,61 +528,111 @@ class CAENDesktopHighVoltagePowerSupply:
 	def ramp_voltage(self, voltage: float, channel: int, device: int = None, ramp_speed_VperSec: float = 5, timeout: float = 10):
 		# Blocks the execution until the ramp is completed.
 		# timeout: It is the number of seconds to wait until the VMON (measured voltage) is stable. After this number of seconds, an error will be raised because the voltage cannot stabilize.
-		ramp_speed_VperSec = _validate_numeric_type(ramp_speed_VperSec, 'ramp_speed_VperSec', float)
 		voltage = _validate_numeric_type(voltage, 'voltage', float)
-		timeout = _validate_numeric_type(timeout, 'timeout', float)
 		channel = _validate_numeric_type(channel, 'channel', int)
 		if device is not None:
 			device = _validate_numeric_type(device, 'device', int)
+		self.ramp_many({(device,channel): voltage}, ramp_speed_VperSec=ramp_speed_VperSec, timeout=timeout)
 
-		current_ramp_speed_settings = {}
-		for par in ['RUP', 'RDW']:
-			current_ramp_speed_settings[par] = self.get_single_channel_parameter(parameter=par, channel=channel, device=device)
-			self.set_single_channel_parameter(parameter=par, channel=channel, device=device, value=ramp_speed_VperSec)
-		current_voltage = self.get_single_channel_parameter(parameter='VSET', channel=channel, device=device)
-		expected_ramping_seconds = ((current_voltage-voltage)**2)**.5/ramp_speed_VperSec
+	def ramp_many(self, voltages: dict, ramp_speed_VperSec: float = 5, timeout: float = 10, min_poll_seconds: float = .2):
+		"""Ramps many channels, possibly in different devices of the daisy
+		chain, at the same time. Blocks the execution until all of them
+		have finished. Example:
+		```
+		caen.ramp_many({
+			(None,0): 100, # Channel 0 of the default device to 100 V.
+			(1,2): 44, # Channel 2 of device 1 to 44 V.
+		})
+		```
+		
+		Arguments
+		---------
+		voltages: dict
+			A dictionary of the form `{(device, channel): voltage}`. A
+			`device` that is `None` means the default one, i.e. `0`, and
+			is reported as such by the `RampHandle`.
+		ramp_speed_VperSec: float, default 5
+			The ramp speed to use for all the channels. The original `RUP`
+			and `RDW` of each channel are set back when finished.
+		timeout: float, default 10
+			Number of seconds to wait, after the time the slowest ramp
+			is expected to take, before raising an error because the
+			voltage cannot stabilize.
+		min_poll_seconds: float, default 0.2
+			The channels are polled more often as they approach the final
+			voltage, but never more often than this.
+		"""
+		ramp = self.start_ramp(voltages, ramp_speed_VperSec=ramp_speed_VperSec, timeout=timeout, min_poll_seconds=min_poll_seconds)
 		try:
-			self.set_single_channel_parameter(
-				parameter = 'VSET',
-				channel = channel,
-				device = device,
-				value = voltage,
-			)
-			n_waited_seconds = 0
-			while True: # Here I wait until it stabilizes.
-				time.sleep(1)
-				n_waited_seconds += 1
-				if self.channel_status(channel = channel)['ramping up'] == 'no' and self.channel_status(channel = channel)['ramping down'] == 'no':
-					break
-				if n_waited_seconds > expected_ramping_seconds + timeout: # If this happens, better to raise an error that I cannot set the voltage. Otherwise this can be blocked forever.
-					raise RuntimeError(f'Cannot reach a stable voltage after a timeout of {timeout} seconds.')
-		except Exception as e:
-			raise e
-		finally:
-			# Set back original configuration.
-			for par in ['RUP', 'RDW']:
-				self.set_single_channel_parameter(
-					parameter = par,
-					channel = channel,
-					device = device,
-					value = current_ramp_speed_settings[par],
-				)
+			ramp.result()
+		except BaseException: # E.g. `KeyboardInterrupt`, don't leave the ramp going on.
+			ramp.cancel()
+			raise
+
+	def start_ramp(self, voltages: dict, ramp_speed_VperSec: float = 5, timeout: float = 10, min_poll_seconds: float = .2):
+		"""Same as `ramp_many` but does not block the execution. Instead,
+		it returns a `RampHandle`, which is a `concurrent.futures.Future`,
+		to follow the ramp. Example:
+		```
+		ramp = caen.start_ramp({(None,0): 100})
+		while not ramp.done():
+			print(f'VMON = {ramp.V_mon[(0,0)]} V, {ramp.remaining_seconds:.0f} s remaining')
+			time.sleep(1)
+		ramp.result() # Raises the error, if there was one.
+		```
+		All the ramps of a power supply are monitored by a single thread.
+		A channel can be in only one ramp at a time, starting a ramp on a
+		channel that is already being ramped raises `ValueError`.
+		
+		Arguments
+		---------
+		See `ramp_many`.
+		
+		Returns
+		-------
+		ramp: RampHandle
+			The handle to follow, wait for, or cancel the ramp.
+		"""
+		ramp = RampHandle(
+			caen = self,
+			targets = _validate_ramp_targets(voltages, default_BD0=self.default_BD0),
+			ramp_speed_VperSec = _validate_numeric_type(ramp_speed_VperSec, 'ramp_speed_VperSec', float),
+			timeout = _validate_numeric_type(timeout, 'timeout', float),
+			min_poll_seconds = _validate_numeric_type(min_poll_seconds, 'min_poll_seconds', float),
+		)
+		if len(ramp.targets) == 0:
+			ramp.set_result({})
+		else:
+			self._ramp_monitor.add(ramp)
+		return ramp
+
+	def _start_ramps(self, ramp):
+		# Sets the ramp speed and the final voltage of all the channels of `ramp`, a `_RampState`, with pipelined commands. If it fails, the original ramp speeds are set back.
+		speed_settings, voltage_settings = ramp._start(self.get_many_channel_parameters(ramp._read_requests()))
+		try:
+			self.set_many_channel_parameters(speed_settings)
+			self.set_many_channel_parameters(voltage_settings)
+		except:
+			self.set_many_channel_parameters(ramp._restore_settings())
+			raise
+
+	def _poll_ramps(self, keys):
+		# Reads STAT and VMON of the channels `(device, channel)` in `keys`, all the queries pipelined.
+		n_channels = {device: self._get_channels_count(device=device) for device,channel in keys}
+		return _parse_ramp_poll(keys, n_channels, self.query_pipelined(_ramp_poll_commands(keys, n_channels)))
 
 	def channel_status(self, channel: int, device: int=None):
 		"""Returns the information from the status byte for the specified
 		channel. Returns a dictionary containint the status byte and also
 		some "human friendly" interpretations of the status byte."""
+		return _decode_channel_status(self.get_channel_status(channel=channel, device=device))
+
+	def get_channel_status(self, channel: int, device: int=None) -> ChannelStatus:
+		"""Returns the status of the specified channel, with all the bits
+		described in the user manual, using a single query. See `ChannelStatus`."""
 		_validate_type(channel, 'channel', int)
 		status_byte = int(self.query(CMD='MON', PAR='STAT',  CH=channel, BD=device)[-5:])
-		status_byte_str = f"{status_byte:016b}"
-		status_byte_str = status_byte_str[::-1]
-		return {
-			'status byte': status_byte,
-			'output': 'on' if status_byte_str[0]=='1' else 'off',
-			'ramping up': 'yes' if status_byte_str[1]=='1' else 'no',
-			'ramping down': 'yes' if status_byte_str[2]=='1' else 'no',
-			'there was overcurrent': 'yes' if status_byte_str[3]=='1' else 'no',
-		}
+		return ChannelStatus(status_byte)
 
 	@property
 	def model_name(self):
@@ -226,12 +664,19 @@ class CAENDesktopHighVoltagePowerSupply:
 	@property
 	def channels_count(self) -> int:
 		"""Return the number of channels available in the power supply."""
+		return self._get_channels_count(device=None)
+
+	def _get_channels_count(self, device: int=None) -> int:
+		# Number of channels of each device in the daisy chain, it never changes so it is asked only once.
 		if not hasattr(self, '_channels_count'):
-			response = self.query(CMD='MON', PAR='BDNCH')
+			self._channels_count = {}
+		device = _default_BD(device, self.default_BD0) # So `None` and the default `BD` share the same entry.
+		if device not in self._channels_count:
+			response = self.query(CMD='MON', PAR='BDNCH', BD=device)
 			if check_successful_response(response) == False:
 				raise RuntimeError(f'The instument responded with error: {response}.')
-			self._channels_count = int(response.split('VAL:')[-1])
-		return self._channels_count
+			self._channels_count[device] = int(response.split('VAL:')[-1])
+		return self._channels_count[device]
 
 	@property
 	def channels(self):
@@ -242,6 +687,8 @@ class CAENDesktopHighVoltagePowerSupply:
 		return self._channels
 
 class OneCAENChannel:
+	_CACHED_PARAMETERS = {'POL','MAXV','IMRANGE'} # These (almost) never change, so they are read only once. See `refresh`.
+
 	def __init__(self, caen, channel_number, device: int=None):
 		"""A wrapper for a single channel of the CAEN power supply, to ease
 		its usage and avoid confisuions with channel numbers."""
@@ -252,6 +699,7 @@ class OneCAENChannel:
 		self._caen = caen
 		self._channel_number = channel_number
 		self._device = device
+		self._cache = {}
 
 	@property
 	def idn(self):
@@ -261,11 +709,33 @@ class OneCAENChannel:
 		VALID_PARs = {'VSET','ISET','MAXV','RUP','RDW','TRIP','PDWN','IMRANGE','ON','OFF','ZCADJ'}
 		if PAR not in VALID_PARs:
 			raise ValueError(f'<PAR> must be one of {VALID_PARs}. Refer to the user manual of the CAEN power supply for more information.')
-		self._caen.set_single_channel_parameter(parameter=PAR, value=VAL, channel=self.channel_number, device=self._device)
+		try:
+			self._caen.set_single_channel_parameter(parameter=PAR, value=VAL, channel=self.channel_number, device=self._device)
+		finally:
+			self.refresh() # Whatever was changed, the cached values may not be valid anymore.
 
 	def get(self, PAR):
+		if PAR in self._CACHED_PARAMETERS:
+			if PAR not in self._cache:
+				self._cache[PAR] = self._caen.get_single_channel_parameter(parameter=PAR, channel=self.channel_number, device=self._device)
+			return self._cache[PAR]
 		return self._caen.get_single_channel_parameter(parameter=PAR, channel=self.channel_number, device=self._device)
 
+	def refresh(self):
+		"""Forgets the cached values of the parameters that (almost) never
+		change, i.e. polarity, `MAXV` and `IMRANGE`, so they are read again
+		from the instrument the next time. Changing them with `set` does
+		this automatically, call it if they were changed in any other way
+		(e.g. the polarity switch in the instrument, or another program)."""
+		self._cache = {}
+
+	def _get_monitored(self, PAR):
+		# Same as `get` but uses the telemetry snapshot of the power supply when available, see `CAENDesktopHighVoltagePowerSupply.start_telemetry`.
+		value = self._caen._get_from_telemetry(parameter=PAR, channel=self.channel_number, device=self._device)
+		if value is None:
+			value = self.get(PAR)
+		return value
+
 	@property
 	def belongs_to(self):
 		return f'CAEN model {self._caen.model_name}, serial number {self._caen.serial_number}'
@@ -283,11 +753,11 @@ class OneCAENChannel:
 			polarity = -1
 		else:
 			raise RuntimeError(f'Unexpected polarity response from the insturment. I was expecting one of {{"+","-"}} but received instead {channel_polarity}.')
-		return polarity*self.get(PAR='VMON')
+		return polarity*self._get_monitored(PAR='VMON')
 
 	@property
 	def I_mon(self):
-		return 1e-6*self.get(PAR='IMON')
+		return 1e-6*self._get_monitored(PAR='IMON')
 
 	@property
 	def V_set(self):
@@ -302,18 +772,23 @@ class OneCAENChannel:
 		return self.get(PAR='POL')
 
 	@property
+	def status(self) -> ChannelStatus:
+		"""The status of the channel, with all the bits described in the
+		user manual, see `ChannelStatus`. Each access is a single query."""
+		return ChannelStatus(self._get_monitored('STAT'))
+	@property
 	def status_byte(self):
-		return self._caen.channel_status(channel=self.channel_number, device=self._device)['status byte']
+		return int(self.status)
 	@property
 	def is_ramping(self):
-		return self._caen.channel_status(channel=self.channel_number, device=self._device)['ramping up']=='yes' or self._caen.channel_status(channel=self.channel_number, device=self._device)['ramping down']=='yes'
+		return bool(self.status & ChannelStatus.RAMPING)
 	@property
 	def there_was_overcurrent(self):
-		return self._caen.channel_status(channel=self.channel_number, device=self._device)['there was overcurrent']=='yes'
+		return ChannelStatus.OVC in self.status
 
 	@property
 	def output(self):
-		return self._caen.channel_status(channel=self.channel_number, device=self._device)['output']
+		return 'on' if ChannelStatus.ON in self.status else 'off'
 	@output.setter
 	def output(self, output_status: str):
 		_validate_type(output_status, 'output_status', str)
@@ -339,9 +814,449 @@ class OneCAENChannel:
 		_validate_numeric_type(timeout, 'timeout', float)
 		self._caen.ramp_voltage(voltage=voltage, channel=self.channel_number, device = self._device, ramp_speed_VperSec = ramp_speed_VperSec, timeout = timeout)
 
+	def start_ramp_voltage(self, voltage, ramp_speed_VperSec: float = 5, timeout: float = 10):
+		"""Same as `ramp_voltage` but without blocking the execution, returns
+		a `RampHandle`. See `CAENDesktopHighVoltagePowerSupply.start_ramp`."""
+		return self._caen.start_ramp({(self._device,self.channel_number): voltage}, ramp_speed_VperSec=ramp_speed_VperSec, timeout=timeout)
+
 	def __str__(self):
 		return f'Channel {self.channel_number} of {self.belongs_to}'
 
 	def __repr__(self):
 		return f'<{str(type(self))[1:-1]}, {self}>'
 
+def _ramp_poll_commands(keys, n_channels:dict) -> list:
+	# Commands to read STAT and VMON of the channels `(device, channel)` in `keys`, using one all-channels query per parameter and device. Their answers go to `_parse_ramp_poll`.
+	return [dict(CMD='MON', PAR=par, CH=n_channels[device], BD=device) for device in sorted({device for device,channel in keys}) for par in ['STAT','VMON']]
+
+def _parse_ramp_poll(keys, n_channels:dict, responses:list) -> tuple:
+	# Returns `{(device, channel): ChannelStatus}` and `{(device, channel): VMON}` from the answers to `_ramp_poll_commands`.
+	responses = iter(responses)
+	status = {}
+	V_mon = {}
+	for device in sorted({device for device,channel in keys}):
+		status[device] = _parse_all_channels_response(next(responses), parameter='STAT', n_channels=n_channels[device])
+		V_mon[device] = _parse_all_channels_response(next(responses), parameter='VMON', n_channels=n_channels[device])
+	return (
+		{(device,channel): ChannelStatus(status[device][channel]) for device,channel in keys},
+		{(device,channel): V_mon[device][channel] for device,channel in keys},
+	)
+
+class _ChannelsInUse:
+	# The `(device, channel)` of all the ramps of a power supply, from the moment they change the ramp speeds until they set back the original ones. Two ramps on the same channel would each take the ramp speed set by the other as the original one, and never set back the true original one.
+	def __init__(self):
+		self._channels = set()
+		self._lock = RLock()
+
+	def reserve(self, keys):
+		with self._lock:
+			overlapping = self._channels & set(keys)
+			if len(overlapping) > 0:
+				raise ValueError(f'The (device, channel) {sorted(overlapping)} are already being ramped, cancel that ramp or wait for it to finish before starting a new one. ')
+			self._channels |= set(keys)
+
+	def release(self, keys):
+		with self._lock:
+			self._channels -= set(keys)
+
+class _RampState:
+	# How a ramp of many channels goes, without communicating with the instrument, so `RampHandle` and `AsyncCAENDesktopHighVoltagePowerSupply.ramp_many` follow the same logic. Read `_read_requests()` and give the values to `_start`, set the ramp speeds and then the final voltages it returns, and after that poll (see `_ramp_poll_commands`) at `_next_poll` and give the result to `_update` until no channel is `_ramping` any more. In any case, set `_restore_settings()` at the end.
+	def __init__(self, targets: dict, ramp_speed_VperSec: float, timeout: float, min_poll_seconds: float):
+		self._targets = targets
+		self._ramp_speed_VperSec = ramp_speed_VperSec
+		self._timeout = timeout
+		self._min_poll_seconds = min_poll_seconds
+		self._V_mon = {key: None for key in targets}
+		self._ramping = set(targets)
+		self._original_ramp_speeds = {} # Only the ones that were actually read, so nothing is restored if the ramp could not even start.
+
+	def _read_requests(self) -> list:
+		return [dict(parameter=par, channel=channel, device=device) for device,channel in self._targets for par in ['RUP','RDW','VSET']]
+
+	def _start(self, current: list) -> tuple:
+		# `current` are the values read for `_read_requests()`. Returns the settings for the ramp speeds and for the final voltages.
+		keys = list(self._targets)
+		self._original_ramp_speeds = {key: dict(RUP=current[3*n], RDW=current[3*n+1]) for n,key in enumerate(keys)}
+		self._expected_ramping_seconds = max(abs(current[3*n+2]-self._targets[key]) for n,key in enumerate(keys))/self._ramp_speed_VperSec
+		self._started = time.monotonic()
+		self._next_poll = self._started + self._poll_seconds(self._expected_ramping_seconds)
+		return (
+			[dict(parameter=par, channel=channel, device=device, value=self._ramp_speed_VperSec) for device,channel in keys for par in ['RUP','RDW']],
+			[dict(parameter='VSET', channel=channel, device=device, value=voltage) for (device,channel),voltage in self._targets.items()],
+		)
+
+	def _restore_settings(self) -> list:
+		return [dict(parameter=par, channel=channel, device=device, value=speeds[par]) for (device,channel),speeds in self._original_ramp_speeds.items() for par in ['RUP','RDW']]
+
+	def _stop_requests(self) -> list:
+		# To stop the ramp, read these and give them to `_stop_settings`.
+		return [dict(parameter='VMON', channel=channel, device=device) for device,channel in sorted(self._ramping)]
+
+	def _stop_settings(self, V_mon: list) -> list:
+		return [dict(parameter='VSET', channel=channel, device=device, value=V) for (device,channel),V in zip(sorted(self._ramping),V_mon)]
+
+	def _remaining_seconds(self) -> float:
+		if any(self._V_mon[key] is None for key in self._ramping):
+			return max(0, self._expected_ramping_seconds - (time.monotonic() - self._started))
+		return max([abs(self._targets[key]-self._V_mon[key]) for key in self._ramping], default=0)/self._ramp_speed_VperSec
+
+	def _poll_seconds(self, remaining_seconds: float) -> float:
+		return min(max(remaining_seconds/2, self._min_poll_seconds), 2) # Half the expected remaining time, within reasonable limits.
+
+	def _update(self, status: dict, V_mon: dict):
+		# Called with the result of a poll. Returns the exception to finish the ramp with, if it can never finish.
+		for key in self._ramping:
+			self._V_mon[key] = V_mon[key]
+		self._ramping = {key for key in self._ramping if status[key] & ChannelStatus.RAMPING}
+		now = time.monotonic()
+		if len(self._ramping) > 0 and now - self._started > self._expected_ramping_seconds + self._timeout: # If this happens, better to raise an error that I cannot set the voltage. Otherwise this can be waiting forever.
+			return RuntimeError(f'Cannot reach a stable voltage after a timeout of {self._timeout} seconds in (device, channel) {sorted(self._ramping, key=str)}. ')
+		self._next_poll = now + self._poll_seconds(self._remaining_seconds())
+
+class RampHandle(Future, _RampState):
+	"""A `concurrent.futures.Future` for a ramp started with `CAENDesktopHighVoltagePowerSupply.start_ramp`.
+	`result()` waits until all the channels have reached their voltage and
+	returns their final `VMON`, or raises an error if they could not. While
+	the ramp is in progress `V_mon` and `remaining_seconds` can be used
+	to follow it, and `cancel()` stops it. In any case the original `RUP`
+	and `RDW` of the channels are set back once the ramp finishes."""
+	def __init__(self, caen, targets: dict, ramp_speed_VperSec: float, timeout: float, min_poll_seconds: float):
+		Future.__init__(self)
+		_RampState.__init__(self, targets=targets, ramp_speed_VperSec=ramp_speed_VperSec, timeout=timeout, min_poll_seconds=min_poll_seconds)
+		self._caen = caen
+		if len(targets) > 0:
+			caen._channels_in_use.reserve(targets)
+			try:
+				caen._start_ramps(self)
+			except:
+				caen._channels_in_use.release(targets) # `_start_ramps` already set back the original speeds.
+				raise
+
+	@property
+	def targets(self) -> dict:
+		"""The final voltage of each channel, `{(device, channel): voltage}`."""
+		return dict(self._targets)
+
+	@property
+	def V_mon(self) -> dict:
+		"""The last measured voltage (raw `VMON`, i.e. not signed according
+		to the polarity) of each channel, `{(device, channel): voltage}`.
+		It is `None` for the channels not yet measured."""
+		return dict(self._V_mon)
+
+	@property
+	def remaining_seconds(self) -> float:
+		"""Estimation of the time until the ramp of all the channels is finished."""
+		if self.done():
+			return 0
+		return self._remaining_seconds()
+
+	def running(self):
+		return not self.done()
+
+	def cancel(self):
+		"""Stops the ramp of all the channels at their current voltage,
+		and sets back their original `RUP` and `RDW`. Returns `False` if
+		the ramp had already finished."""
+		if not self._caen._ramp_monitor.remove(self): # It already finished, or was already cancelled.
+			return self.cancelled()
+		try:
+			try:
+				self._caen.set_many_channel_parameters(self._stop_settings(self._caen.get_many_channel_parameters(self._stop_requests())))
+			finally:
+				try:
+					self._caen.set_many_channel_parameters(self._restore_settings())
+				finally:
+					self._caen._channels_in_use.release(self._targets)
+		except BaseException as e:
+			self.set_exception(e)
+			raise
+		return super().cancel()
+
+	def _finish(self, exception: Exception=None):
+		# Called by the `_RampMonitor` once it removed this ramp from its list.
+		try:
+			self._caen.set_many_channel_parameters(self._restore_settings())
+		except Exception as e:
+			if exception is None:
+				exception = e
+		finally:
+			self._caen._channels_in_use.release(self._targets)
+		if exception is not None:
+			self.set_exception(exception)
+		else:
+			self.set_result(self.V_mon)
+
+class _RampMonitor:
+	# A single thread that polls all the ramps of a power supply, with one batched query for all of them. The thread only exists while there are ramps in progress.
+	def __init__(self, caen):
+		self._caen = caen
+		self._ramps = []
+		self._lock = RLock()
+		self._wake_up = Event()
+		self._thread = None
+
+	def add(self, ramp: RampHandle):
+		with self._lock:
+			self._ramps.append(ramp)
+			if self._thread is None:
+				self._thread = Thread(target=self._loop, name='CAEN ramps monitor', daemon=True)
+				self._thread.start()
+		self._wake_up.set()
+
+	def remove(self, ramp: RampHandle) -> bool:
+		# Returns `True` if the ramp was removed, i.e. whoever called this is now responsible for finishing it.
+		with self._lock:
+			if ramp not in self._ramps:
+				return False
+			self._ramps.remove(ramp)
+			return True
+
+	def _loop(self):
+		while True:
+			with self._lock:
+				if len(self._ramps) == 0:
+					self._thread = None
+					return
+				next_poll = min(ramp._next_poll for ramp in self._ramps)
+			if self._wake_up.wait(timeout=max(0, next_poll - time.monotonic())):
+				self._wake_up.clear()
+				continue # A new ramp was added, recompute when the next poll is.
+			with self._lock:
+				now = time.monotonic()
+				ramps = [ramp for ramp in self._ramps if ramp._next_poll <= now]
+			if len(ramps) == 0:
+				continue
+			try:
+				status, V_mon = self._caen._poll_ramps({key for ramp in ramps for key in ramp._ramping})
+			except Exception as e:
+				for ramp in ramps:
+					if self.remove(ramp):
+						ramp._finish(exception=e)
+				continue
+			for ramp in ramps:
+				exception = ramp._update(status, V_mon)
+				if (exception is not None or len(ramp._ramping) == 0) and self.remove(ramp):
+					ramp._finish(exception=exception)
+
+class AsyncCAENDesktopHighVoltagePowerSupply:
+	"""Same as `CAENDesktopHighVoltagePowerSupply` but for usage within
+	`asyncio`, so many power supplies (and other instruments) can be
+	handled concurrently in one event loop without one thread for each.
+	Example:
+	```
+	async def main():
+		async with AsyncCAENDesktopHighVoltagePowerSupply(ip='130.60.165.238') as caen:
+			await caen.set_single_channel_parameter(parameter='ON', channel=0, value=None)
+			await caen.ramp_voltage(voltage=22, channel=0)
+			print(await caen.get_single_channel_parameter(parameter='VMON', channel=0))
+	
+	asyncio.run(main())
+	```
+	Through Ethernet the communication is done with `asyncio` streams.
+	Through the serial port it is done by a `CAENDesktopHighVoltagePowerSupply`
+	in a dedicated thread, since `pyserial` offers no `asyncio` interface.
+	"""
+	def __init__(self, port=None, ip=None, default_BD0=True, timeout=1):
+		# The arguments are the same as for `CAENDesktopHighVoltagePowerSupply`, the connection is opened by `open` or by the `async with` statement.
+		if default_BD0 not in [True, False]:
+			raise ValueError(f'The argument <default_BD0> must be either True of False. Received {default_BD0}.')
+		if ip is not None and port is not None: # This is an error, which connection protocol should we use?
+			raise ValueError(f'You have specified both <port> and <ip>. Please specify only one of them to use.')
+		if ip is None and port is None:
+			raise ValueError(f'Please specify a serial port or an IP addres in which the CAEN device can be found.')
+		self.default_BD0 = default_BD0
+		self.timeout = timeout
+		self._ip = ip
+		self._port = port
+		self._reader = None
+		self._writer = None
+		self._serial_caen = None
+		self._executor = None
+		self._communication_lock = asyncio.Lock() # To ensure that the answer to each command is read by whoever sent it.
+		self._channels_count = {}
+		self._channels_in_use = _ChannelsInUse() # A channel can be in only one ramp at a time.
+
+	async def open(self):
+		"""Opens the connection with the instrument."""
+		async with self._communication_lock:
+			await self._open()
+
+	async def _open(self):
+		# Opens the connection, if it is not already open. Must be called holding `self._communication_lock`.
+		if self._ip is not None:
+			if self._writer is None:
+				self._reader, self._writer = await asyncio.wait_for(
+					asyncio.open_connection(self._ip, 1470), # According to the user manual the port 1470 always has to be used.
+					timeout = self.timeout,
+				)
+		else:
+			if self._serial_caen is None:
+				self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='CAEN serial port')
+				self._serial_caen = await asyncio.get_running_loop().run_in_executor(
+					self._executor,
+					functools.partial(CAENDesktopHighVoltagePowerSupply, port=self._port, default_BD0=self.default_BD0, timeout=self.timeout),
+				)
+
+	async def close(self):
+		"""Closes the connection with the instrument."""
+		async with self._communication_lock: # Wait for any query in progress to finish, instead of closing the connection under its feet.
+			if self._writer is not None:
+				writer = self._writer
+				self._close_stream()
+				try:
+					await writer.wait_closed()
+				except ConnectionError:
+					pass # It was already closed by the other side, which is what we wanted anyway.
+			if self._serial_caen is not None:
+				self._serial_caen.serial_port.close()
+				self._serial_caen = None
+				self._executor.shutdown(wait=False)
+				self._executor = None
+
+	def _close_stream(self):
+		self._writer.close()
+		self._reader = None
+		self._writer = None
+
+	async def __aenter__(self):
+		await self.open()
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, traceback):
+		await self.close()
+
+	async def query(self, CMD, PAR, CH=None, VAL=None, BD=None) -> str:
+		"""Sends a command and reads the answer, the arguments are the
+		ones specified in the user manual."""
+		bytes2send = create_command_string(BD=_default_BD(BD, self.default_BD0), CMD=CMD, PAR=PAR, CH=CH, VAL=VAL).encode('ASCII')
+		async with self._communication_lock: # Ensure that the answer I return corresponds to this command.
+			await self._open() # In case it was never opened, or it was closed by an error in a previous query.
+			if self._serial_caen is not None:
+				return await asyncio.get_running_loop().run_in_executor(
+					self._executor,
+					functools.partial(self._serial_caen.query, CMD=CMD, PAR=PAR, CH=CH, VAL=VAL, BD=BD),
+				)
+			try:
+				self._writer.write(bytes2send)
+				await self._writer.drain()
+				received_bytes = await asyncio.wait_for(self._reader.readuntil(b'\r\n'), timeout=self.timeout)
+			except BaseException:
+				# If the answer did not arrive (timeout, cancellation, ...) it may still arrive later and be read as the answer to the next command, so start again with a new connection.
+				self._close_stream()
+				raise
+		return received_bytes[:-2].decode('ASCII')
+
+	async def get_single_channel_parameter(self, parameter: str, channel: int, device: int=None):
+		"""Same as `CAENDesktopHighVoltagePowerSupply.get_single_channel_parameter`."""
+		response = await self.query(CMD='MON', PAR=parameter, CH=channel, BD=device)
+		if check_successful_response(response) == False:
+			raise RuntimeError(f'Error trying to get the parameter {parameter}. The response from the instrument is: "{response}"')
+		return _parse_parameter_value(response.split('VAL:')[-1])
+
+	async def set_single_channel_parameter(self, parameter: str, channel: int, value, device: int=None):
+		"""Same as `CAENDesktopHighVoltagePowerSupply.set_single_channel_parameter`."""
+		response = await self.query(CMD='SET', PAR=parameter, CH=channel, BD=device, VAL=value)
+		if check_successful_response(response) == False:
+			raise RuntimeError(f'Error trying to set the parameter {parameter}. The response from the instrument is: "{response}"')
+
+	async def get_channels_count(self, device: int=None) -> int:
+		"""Return the number of channels available in the power supply,
+		same as `CAENDesktopHighVoltagePowerSupply.channels_count`. It
+		never changes, so it is asked to the instrument only once."""
+		device = _default_BD(device, self.default_BD0) # So `None` and the default `BD` share the same entry.
+		if device not in self._channels_count:
+			response = await self.query(CMD='MON', PAR='BDNCH', BD=device)
+			if check_successful_response(response) == False:
+				raise RuntimeError(f'The instument responded with error: {response}.')
+			self._channels_count[device] = int(response.split('VAL:')[-1])
+		return self._channels_count[device]
+
+	async def get_parameter_all_channels(self, parameter: str, device: int=None) -> list:
+		"""Same as `CAENDesktopHighVoltagePowerSupply.get_parameter_all_channels`."""
+		n_channels = await self.get_channels_count(device=device)
+		response = await self.query(CMD='MON', PAR=parameter, CH=n_channels, BD=device)
+		return _parse_all_channels_response(response, parameter=parameter, n_channels=n_channels)
+
+	async def get_many(self, parameters: list, device: int=None) -> dict:
+		"""Same as `CAENDesktopHighVoltagePowerSupply.get_many`."""
+		if isinstance(parameters, str):
+			parameters = [parameters]
+		return {parameter: await self.get_parameter_all_channels(parameter=parameter, device=device) for parameter in parameters}
+
+	async def channel_status(self, channel: int, device: int=None) -> dict:
+		"""Same as `CAENDesktopHighVoltagePowerSupply.channel_status`."""
+		return _decode_channel_status(await self.get_channel_status(channel=channel, device=device))
+
+	async def get_channel_status(self, channel: int, device: int=None) -> ChannelStatus:
+		"""Same as `CAENDesktopHighVoltagePowerSupply.get_channel_status`."""
+		_validate_type(channel, 'channel', int)
+		status_byte = int((await self.query(CMD='MON', PAR='STAT',  CH=channel, BD=device))[-5:])
+		return ChannelStatus(status_byte)
+
+	async def _get_many_channel_parameters(self, requests: list) -> list:
+		# Same as `CAENDesktopHighVoltagePowerSupply.get_many_channel_parameters`, but one command after the other.
+		return [await self.get_single_channel_parameter(**request) for request in requests]
+
+	async def _set_many_channel_parameters(self, settings: list):
+		# Same as `CAENDesktopHighVoltagePowerSupply.set_many_channel_parameters`, but one command after the other. All of them are tried even if some fail, then the first error is raised.
+		first_error = None
+		for setting in settings:
+			try:
+				await self.set_single_channel_parameter(**setting)
+			except Exception as e:
+				if first_error is None:
+					first_error = e
+		if first_error is not None:
+			raise first_error
+
+	async def _poll_ramps(self, keys):
+		n_channels = {device: await self.get_channels_count(device=device) for device,channel in keys}
+		return _parse_ramp_poll(keys, n_channels, [await self.query(**command) for command in _ramp_poll_commands(keys, n_channels)])
+
+	async def ramp_voltage(self, voltage: float, channel: int, device: int = None, ramp_speed_VperSec: float = 5, timeout: float = 10):
+		"""Same as `CAENDesktopHighVoltagePowerSupply.ramp_voltage`, but
+		instead of blocking the execution it yields control to the event
+		loop while waiting for the ramp to complete."""
+		voltage = _validate_numeric_type(voltage, 'voltage', float)
+		channel = _validate_numeric_type(channel, 'channel', int)
+		if device is not None:
+			device = _validate_numeric_type(device, 'device', int)
+		await self.ramp_many({(device,channel): voltage}, ramp_speed_VperSec=ramp_speed_VperSec, timeout=timeout)
+
+	async def ramp_many(self, voltages: dict, ramp_speed_VperSec: float = 5, timeout: float = 10, min_poll_seconds: float = .2) -> dict:
+		"""Same as `CAENDesktopHighVoltagePowerSupply.ramp_many`, but
+		instead of blocking the execution it yields control to the event
+		loop while waiting for the ramp to complete. Returns the final 
+		`VMON` of each channel, `{(device, channel): voltage}`. If it is
+		cancelled, the channels are stopped at their current voltage."""
+		ramp = _RampState(
+			targets = _validate_ramp_targets(voltages, default_BD0=self.default_BD0),
+			ramp_speed_VperSec = _validate_numeric_type(ramp_speed_VperSec, 'ramp_speed_VperSec', float),
+			timeout = _validate_numeric_type(timeout, 'timeout', float),
+			min_poll_seconds = _validate_numeric_type(min_poll_seconds, 'min_poll_seconds', float),
+		)
+		if len(ramp._targets) == 0:
+			return {}
+		self._channels_in_use.reserve(ramp._targets)
+		try:
+			voltages_sent = False
+			try:
+				speed_settings, voltage_settings = ramp._start(await self._get_many_channel_parameters(ramp._read_requests()))
+				await self._set_many_channel_parameters(speed_settings)
+				voltages_sent = True
+				await self._set_many_channel_parameters(voltage_settings)
+				while len(ramp._ramping) > 0:
+					await asyncio.sleep(max(0, ramp._next_poll - time.monotonic()))
+					exception = ramp._update(*await self._poll_ramps(ramp._ramping))
+					if exception is not None:
+						raise exception
+			except asyncio.CancelledError:
+				if voltages_sent:
+					await self._set_many_channel_parameters(ramp._stop_settings(await self._get_many_channel_parameters(ramp._stop_requests())))
+				raise
+			finally:
+				await self._set_many_channel_parameters(ramp._restore_settings())
+		finally:
+			self._channels_in_use.release(ramp._targets)
+		return dict(ramp._V_mon)
@@ -5,8 +5,22 @@
 from ctypes import *
 import time
 import numpy
+import functools
+import threading
+import queue
+import json
+import warnings
+import os
+import collections
+import concurrent.futures
+import multiprocessing.shared_memory
+from pathlib import Path
 
-libCAENDigitizer = CDLL('/usr/lib/libCAENDigitizer.so') # Change the path according to your installation. This is the default one in Ubuntu 22.04. The official library can be found here https://www.caen.it/products/caendigitizer-library/
+try:
+	libCAENDigitizer = CDLL('/usr/lib/libCAENDigitizer.so') # Change the path according to your installation. This is the default one in Ubuntu 22.04. The official library can be found here https://www.caen.it/products/caendigitizer-library/
+except OSError as e:
+	libCAENDigitizer = None # The digitizer cannot be operated, but the offline tools (e.g. `decode_x742_raw_block`) can still be used.
+	_libCAENDigitizer_loading_error = e
 
 CAEN_DGTZ_DRS4Frequency_MEGA_HERTZ = {
 	750: 3,
@@ -72,7 +86,96 @@ class EventInfo(Structure):
 		("EventCounter", c_uint32),
 		("TriggerTimeTag", c_uint32)]
 
-def decode_event_waveforms_to_python_friendly_stuff(event:Event, ADC_peak_to_peak_dynamic_range_volts:float=None, time_axis_parameters:dict=None, ADC_dynamic_range_margin:int=77):
+CHANNELS_NAMES = tuple([f'CH{n}' for n in [0,1,2,3,4,5,6,7]] + ['trigger_group_0'] + [f'CH{n-1}' for n in [9,10,11,12,13,14,15,16]] + ['trigger_group_1']) # Human friendly names, in the order in which they are found in the `Event` structure.
+MAX_ADC = 2**12-1 # It is a 12 bit ADC.
+EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH = ('EventCounter','TriggerTimeTag','Pattern','BoardId')
+COLUMNAR_BATCH_KEYS_COMMON_TO_ALL_EVENTS = {'channels','Time (s)','t0 (s)','dt (s)'} # All other items in a columnar batch have one element per event along their first axis.
+
+@functools.lru_cache(maxsize=64, typed=True)
+def _time_axis(record_length:int, sampling_frequency:float, post_trigger_size:int, fast_trigger_mode:bool):
+	"""Reconstruct the time axis, see `get_time_axis`. The result is
+	cached, so the array is created only once for each configuration
+	and then shared by all the waveforms, thus it is made read only."""
+	if not isinstance(record_length, int):
+		raise TypeError(f'record_length must be an integer number, received object of type {type(record_length)}. ')
+	if not isinstance(sampling_frequency, (int, float)):
+		raise TypeError(f'Sampling frequency must be a float, received object of type {type(sampling_frequency)}. ')
+	if not isinstance(post_trigger_size, int):
+		raise TypeError(f'post_trigger_size must be an integer number, received object of type {type(post_trigger_size)}. ')
+	if not isinstance(fast_trigger_mode, bool):
+		raise TypeError(f'fast_trigger_mode must be a boolean, received object of type {type(fast_trigger_mode)}. ')
+	
+	time_array = numpy.arange(record_length)/sampling_frequency
+	if fast_trigger_mode == True:
+		trigger_latency = 42e-9 # This comes from the user manual, see § 9.8.3 of 'UM4270_DT5742_UserManual_rev11.pdf'.
+	else:
+		trigger_latency = 0 # Unknown value, cannot use NaN as it would destroy all the time array.
+	if record_length > 0:
+		time_array -= time_array.max()*(100-post_trigger_size)/100 - trigger_latency
+	time_array.flags.writeable = False
+	return time_array
+
+def get_time_axis(record_length:int, sampling_frequency:float, post_trigger_size:int, fast_trigger_mode:bool, only_t0_and_dt:bool=False):
+	"""Get the time axis for the waveforms acquired with a given configuration
+	of the digitizer, such that t=0 is the trigger time (see the note
+	in `CAEN_DT5742_Digitizer.get_waveforms`).
+	
+	Arguments
+	---------
+	record_length: int
+		Number of samples in each waveform.
+	sampling_frequency: float
+		The sampling frequency in Hertz.
+	post_trigger_size: int
+		The post trigger size in percentage of the record length, see
+		`CAEN_DT5742_Digitizer.set_post_trigger_size`.
+	fast_trigger_mode: bool
+		Whether the fast trigger mode is enabled, see `CAEN_DT5742_Digitizer.set_fast_trigger_mode`.
+	only_t0_and_dt: bool, default False
+		If `True`, instead of the array only the time of the first
+		sample and the sampling period are returned.
+	
+	Returns
+	-------
+	time_axis: numpy.array or dict
+		If `only_t0_and_dt` is `False`, a read only array with the time
+		of each sample, in seconds. This array is cached and shared
+		between all the calls with the same arguments, so don't try
+		to modify it, make a copy instead. If `only_t0_and_dt` is `True`
+		a dictionary of the form `{'t0 (s)': float, 'dt (s)': float}`
+		such that the time of sample `n` is `t0 + n*dt`.
+	"""
+	time_array = _time_axis(record_length, sampling_frequency, post_trigger_size, fast_trigger_mode)
+	if only_t0_and_dt == True:
+		return {
+			't0 (s)': float(time_array[0]) if record_length > 0 else float('NaN'),
+			'dt (s)': 1/sampling_frequency,
+		}
+	return time_array
+
+def _channels_present_in_event(event:Event)->list:
+	"""Returns a list of tuples `(n_channel, n_group, n_channel_within_group)`
+	with all the channels that contain samples in `event`, in the order
+	of `CHANNELS_NAMES`."""
+	channels = []
+	for n_channel in range(18):
+		n_group = int(n_channel / 9)
+		if event.GrPresent[n_group] != 1:
+			continue
+		n_channel_within_group = n_channel - (9 * n_group)
+		if event.DataGroup[n_group].ChSize[n_channel_within_group] == 0:
+			continue # E.g. the trigger channel when its digitization is disabled.
+		channels.append((n_channel, n_group, n_channel_within_group))
+	return channels
+
+def _view_channel_samples(group:Group, n_channel_within_group:int):
+	"""Returns a numpy `float32` array that views, without copying, the
+	samples of one channel inside the memory of the libCAENDigitizer.
+	The view is only valid until the next event is decoded, so copy 
+	it before that."""
+	return numpy.ctypeslib.as_array(group.DataChannel[n_channel_within_group], shape=(group.ChSize[n_channel_within_group],))
+
+def decode_event_waveforms_to_python_friendly_stuff(event:Event, ADC_peak_to_peak_dynamic_range_volts:float=None, time_axis_parameters:dict=None, ADC_dynamic_range_margin:int=77, time_as_t0_and_dt:bool=False, dtype=numpy.float64, overflow_as_mask:bool=False):
 	"""Decode the waveforms contained in an `Event` object into human friendly
 	pythonic objects.
 	
@@ -100,6 +203,21 @@ def decode_event_waveforms_to_python_friendly_stuff(event:Event, ADC_peak_to_pea
 		Samples that are in `0+ADC_dynamic_range_margin` or in `MAX_ADC-ADC_dynamic_range_margin`
 		will be replaced by NaN values, to indicate ADC overflow. Setting 
 		this to 0 will disable this feature.
+	time_as_t0_and_dt: bool, default False
+		If `True`, the `'Time (s)'` array is replaced by `'t0 (s)'` and
+		`'dt (s)'`, see `get_time_axis`. Ignored if `time_axis_parameters`
+		is `None`.
+	dtype: numpy dtype, default `numpy.float64`
+		Floating point type of the samples. The library provides the 
+		samples as `float32`, so using `numpy.float32` halves the memory
+		without losing any precision in ADC units. An integer type, e.g.
+		`numpy.uint16`, can be used for samples in ADC units together
+		with `overflow_as_mask`, in which case the samples are rounded.
+	overflow_as_mask: bool, default False
+		If `True`, the samples considered as ADC overflow (see `ADC_dynamic_range_margin`)
+		are not replaced by NaN but marked in a boolean array `'ADC overflow'`
+		with the same shape as the samples, next to `'Amplitude (V)'`
+		or `'Amplitude (ADCu)'`. See also `ADCu_to_volts`.
 	
 	Returns
 	-------
@@ -128,9 +246,10 @@ def decode_event_waveforms_to_python_friendly_stuff(event:Event, ADC_peak_to_pea
 			}
 		}
 		```
+		Note that the `'Time (s)'` array is the same object for all the
+		channels, and it is read only, see `get_time_axis`.
 	"""
-	CHANNELS_NAMES = tuple([f'CH{n}' for n in [0,1,2,3,4,5,6,7]] + ['trigger_group_0'] + [f'CH{n-1}' for n in [9,10,11,12,13,14,15,16]] + ['trigger_group_1']) # Human friendly names.
-	MAX_ADC = 2**12-1 # It is a 12 bit ADC.
+	_validate_samples_dtype(dtype, ADC_peak_to_peak_dynamic_range_volts, overflow_as_mask)
 	
 	event_waveforms = {}
 	for n_channel in range(18):
@@ -144,41 +263,1080 @@ def decode_event_waveforms_to_python_friendly_stuff(event:Event, ADC_peak_to_pea
 		n_channel_within_group = n_channel - (9 * n_group)
 		block = event.DataGroup[n_group]
 		waveform_length = block.ChSize[n_channel_within_group]
+		if waveform_length == 0:
+			continue # E.g. the trigger channel when its digitization is disabled.
 		
-		if time_axis_parameters is not None and 'time_array' not in locals():
-			sampling_frequency = time_axis_parameters['sampling_frequency']
-			post_trigger_size = time_axis_parameters['post_trigger_size']
-			fast_trigger_mode = time_axis_parameters['fast_trigger_mode']
-			if not isinstance(sampling_frequency, (int, float)):
-				raise TypeError(f'Sampling frequency must be a float, received object of type {type(sampling_frequency)}. ')
-			if not isinstance(post_trigger_size, int):
-				raise TypeError(f'post_trigger_size must be an integer number, received object of type {type(post_trigger_size)}. ')
-			if not isinstance(fast_trigger_mode, bool):
-				raise TypeError(f'fast_trigger_mode must be a boolean, received object of type {type(fast_trigger_mode)}. ')
-			
-			time_array = numpy.array(range(waveform_length))/sampling_frequency
-			if fast_trigger_mode == True:
-				trigger_latency = 42e-9 # This comes from the user manual, see § 9.8.3 of 'UM4270_DT5742_UserManual_rev11.pdf'.
-			else:
-				trigger_latency = 0 # Unknown value, cannot use NaN as it would destroy all the time array.
-			time_array -= time_array.max()*(100-post_trigger_size)/100 - trigger_latency
+		if time_axis_parameters is not None and 'time_axis' not in locals():
+			time_axis = get_time_axis(record_length=waveform_length, only_t0_and_dt=time_as_t0_and_dt, **time_axis_parameters)
 		
-		samples = numpy.array(block.DataChannel[n_channel_within_group][0:waveform_length])
-		samples[(samples<ADC_dynamic_range_margin)|(samples>MAX_ADC-ADC_dynamic_range_margin)] = float('NaN') # These values are considered as ADC overflow, thus it is safer to replace them with NaN so they don't go unnoticed.
+		samples = _view_channel_samples(block, n_channel_within_group)
+		overflow = (samples<ADC_dynamic_range_margin)|(samples>MAX_ADC-ADC_dynamic_range_margin) # These values are considered as ADC overflow.
+		samples = _cast_ADC_samples(samples, dtype) # The only copy of the samples out of the library memory.
+		if overflow_as_mask == False:
+			samples[overflow] = float('NaN') # It is safer to replace them with NaN so they don't go unnoticed.
 		
 		wf = {}
 		if ADC_peak_to_peak_dynamic_range_volts is not None:
-			if not isinstance(ADC_peak_to_peak_dynamic_range_volts, (int,float)):
-				raise TypeError(f'`ADC_peak_to_peak_dynamic_range_volts` must be a float or integer number, received object of type {type(ADC_peak_to_peak_dynamic_range_volts)}. ')
-			wf['Amplitude (V)'] = (samples-MAX_ADC/2)*ADC_peak_to_peak_dynamic_range_volts/MAX_ADC
+			samples -= MAX_ADC/2
+			samples *= ADC_peak_to_peak_dynamic_range_volts
+			samples /= MAX_ADC
+			wf['Amplitude (V)'] = samples
 		else:
 			wf['Amplitude (ADCu)'] = samples
+		if overflow_as_mask == True:
+			wf['ADC overflow'] = overflow
 		if time_axis_parameters is not None:
-			wf['Time (s)'] = time_array
+			if time_as_t0_and_dt == True:
+				wf.update(time_axis)
+			else:
+				wf['Time (s)'] = time_axis
 		
 		event_waveforms[channel_name] = wf
 	return event_waveforms
 
+def _validate_samples_dtype(dtype, ADC_peak_to_peak_dynamic_range_volts:float, overflow_as_mask:bool):
+	if ADC_peak_to_peak_dynamic_range_volts is not None and not isinstance(ADC_peak_to_peak_dynamic_range_volts, (int,float)):
+		raise TypeError(f'`ADC_peak_to_peak_dynamic_range_volts` must be a float or integer number, received object of type {type(ADC_peak_to_peak_dynamic_range_volts)}. ')
+	if numpy.issubdtype(dtype, numpy.integer):
+		if ADC_peak_to_peak_dynamic_range_volts is not None:
+			raise ValueError(f'Samples in volts cannot be stored with `dtype` {repr(dtype)}, use a floating point type or get them in ADC units. ')
+		if overflow_as_mask == False:
+			raise ValueError(f'With `dtype` {repr(dtype)} the ADC overflow cannot be marked with NaN, so `overflow_as_mask` must be `True`. ')
+	elif not numpy.issubdtype(dtype, numpy.floating):
+		raise TypeError(f'`dtype` must be a floating point or integer numpy type, received {repr(dtype)}. ')
+
+def _cast_ADC_samples(samples, dtype):
+	"""Returns a copy of `samples` with type `dtype`. Integer types get
+	the samples rounded and clipped to the range of the ADC, as after
+	the DRS4 correction they are not integers anymore."""
+	if numpy.issubdtype(dtype, numpy.integer):
+		return numpy.clip(numpy.rint(samples), 0, MAX_ADC).astype(dtype)
+	return samples.astype(dtype)
+
+def ADCu_to_volts(samples, ADC_peak_to_peak_dynamic_range_volts:float=1, overflow=None):
+	"""Convert samples in ADC units into volts, the same way it is done
+	by `CAEN_DT5742_Digitizer.get_waveforms`. This is useful to store
+	the samples as compact integers (see the `overflow_as_mask` and 
+	`dtype` arguments of `get_waveforms`) and convert them only when 
+	needed.
+	
+	Arguments
+	---------
+	samples: numpy.array
+		The samples in ADC units, of any shape.
+	ADC_peak_to_peak_dynamic_range_volts: float, default 1
+		The dynamic range of the ADC.
+	overflow: numpy.array of bool, default None
+		Array with the same shape as `samples`, those samples where 
+		it is `True` are replaced by NaN.
+	
+	Returns
+	-------
+	volts: numpy.array
+		A new float array with the samples in volts.
+	"""
+	volts = numpy.asarray(samples, dtype=float) - MAX_ADC/2
+	volts *= ADC_peak_to_peak_dynamic_range_volts
+	volts /= MAX_ADC
+	if overflow is not None:
+		volts[overflow] = float('NaN')
+	return volts
+
+def _finish_columnar_batch(samples, channels:tuple, event_info:dict, start_index_cell, ADC_peak_to_peak_dynamic_range_volts:float, time_axis_parameters:dict, ADC_dynamic_range_margin:int, time_as_t0_and_dt:bool, dtype, overflow_as_mask:bool)->dict:
+	"""Process the samples of a whole block at once and assemble the 
+	columnar batch. `samples` is an array of shape (n_events, n_channels, record_length)
+	with the ADC values, which is modified in place if it already has
+	a floating point `dtype`. The other arguments are those of `decode_event_waveforms_to_python_friendly_stuff`."""
+	_validate_samples_dtype(dtype, ADC_peak_to_peak_dynamic_range_volts, overflow_as_mask)
+	
+	overflow = (samples<ADC_dynamic_range_margin)|(samples>MAX_ADC-ADC_dynamic_range_margin) # These values are considered as ADC overflow.
+	if samples.dtype != dtype:
+		samples = _cast_ADC_samples(samples, dtype)
+	
+	batch = {'channels': channels}
+	if overflow_as_mask == False:
+		samples[overflow] = float('NaN') # It is safer to replace them with NaN so they don't go unnoticed.
+	if ADC_peak_to_peak_dynamic_range_volts is not None:
+		samples -= MAX_ADC/2
+		samples *= ADC_peak_to_peak_dynamic_range_volts
+		samples /= MAX_ADC
+		batch['Amplitude (V)'] = samples
+	else:
+		batch['Amplitude (ADCu)'] = samples
+	if overflow_as_mask == True:
+		batch['ADC overflow'] = overflow
+	if time_axis_parameters is not None:
+		time_axis = get_time_axis(record_length=samples.shape[2], only_t0_and_dt=time_as_t0_and_dt, **time_axis_parameters)
+		if time_as_t0_and_dt == True:
+			batch.update(time_axis)
+		else:
+			batch['Time (s)'] = time_axis
+	batch.update(event_info)
+	batch['StartIndexCell'] = start_index_cell
+	return batch
+
+def columnar_batch_to_events(batch:dict, copy:bool=False)->list:
+	"""Convert a columnar batch into a list of dictionaries, one per event,
+	as returned by `CAEN_DT5742_Digitizer.get_waveforms(columnar=False)`.
+	
+	Arguments
+	---------
+	batch: dict
+		The columnar batch.
+	copy: bool, default False
+		If `False`, the arrays in the returned dictionaries are views
+		of the arrays in `batch`, so keeping any of them keeps the whole
+		batch in memory. If `True`, the samples of each event are copied
+		into their own memory. The time axis is always shared.
+	"""
+	amplitude_key = 'Amplitude (V)' if 'Amplitude (V)' in batch else 'Amplitude (ADCu)'
+	time_axis = {key: batch[key] for key in ['Time (s)','t0 (s)','dt (s)'] if key in batch}
+	if 'Channel kept' in batch: # A reduced batch, see `reduce_waveforms`, the events have only the kept channels.
+		channel_kept = batch['Channel kept']
+		n_waveform = numpy.cumsum(channel_kept.reshape(-1)).reshape(channel_kept.shape) - 1
+	events = []
+	for n_event in range(len(batch['Channel kept'] if 'Channel kept' in batch else batch[amplitude_key])):
+		event = {}
+		for n_channel,channel in enumerate(batch['channels']):
+			if 'Channel kept' in batch:
+				if not channel_kept[n_event,n_channel]:
+					continue
+				waveform_index = (n_waveform[n_event,n_channel],)
+			else:
+				waveform_index = (n_event,n_channel)
+			event[channel] = {amplitude_key: batch[amplitude_key][waveform_index]}
+			if 'ADC overflow' in batch:
+				event[channel]['ADC overflow'] = batch['ADC overflow'][waveform_index]
+			if copy == True:
+				for key in [amplitude_key,'ADC overflow']:
+					if key in event[channel]:
+						event[channel][key] = event[channel][key].copy()
+			event[channel].update(time_axis)
+		events.append(event)
+	return events
+
+def events_to_columnar_batch(events:list)->dict:
+	"""Convert a list of dictionaries, one per event, as returned by 
+	`CAEN_DT5742_Digitizer.get_waveforms(columnar=False)`, into a columnar
+	batch. This is the inverse of `columnar_batch_to_events`. Since
+	the dictionaries don't contain the fields of `EventInfo`, neither 
+	does the returned batch. All the events must have the same channels
+	and number of samples.
+	
+	Arguments
+	---------
+	events: list of dict
+		The events.
+	
+	Returns
+	-------
+	batch: dict
+		A columnar batch, see `CAEN_DT5742_Digitizer.get_waveforms`.
+	"""
+	if len(events) == 0 or len(events[0]) == 0:
+		raise ValueError(f'`events` is empty or has no channels, cannot determine the channels nor the number of samples.')
+	channels = tuple(events[0].keys())
+	if any(tuple(event.keys()) != channels for event in events):
+		raise ValueError(f'All the events must have the same channels.')
+	first_waveform = events[0][channels[0]]
+	batch = {'channels': channels}
+	for key in ['Time (s)','t0 (s)','dt (s)']:
+		if key in first_waveform:
+			batch[key] = first_waveform[key]
+	for key in ['Amplitude (V)','Amplitude (ADCu)','ADC overflow']:
+		if key in first_waveform:
+			batch[key] = numpy.stack([numpy.stack([event[channel][key] for channel in channels]) for event in events])
+	return batch
+
+def _time_window_mask(time_axis, window_seconds:tuple, window_name:str):
+	if not isinstance(window_seconds, (tuple,list)) or len(window_seconds) != 2:
+		raise ValueError(f'`{window_name}` must be a tuple `(start, stop)` in seconds, received {repr(window_seconds)}. ')
+	mask = (time_axis >= window_seconds[0]) & (time_axis < window_seconds[1])
+	if not mask.any():
+		raise ValueError(f'The `{window_name}` {window_seconds} contains no samples, the time axis goes from {time_axis[0]} to {time_axis[-1]} s. ')
+	return mask
+
+def _interpolate_crossing_time(signal, signal_time, level, n_before):
+	# Time at which `signal` crosses `level` between the samples `n_before` and `n_before+1`, linearly interpolated. All with shape (n_events, n_channels), except `signal_time`.
+	n_after = numpy.minimum(n_before+1, signal.shape[2]-1)
+	signal_before = numpy.take_along_axis(signal, n_before[:,:,numpy.newaxis], axis=2)[:,:,0]
+	signal_after = numpy.take_along_axis(signal, n_after[:,:,numpy.newaxis], axis=2)[:,:,0]
+	with numpy.errstate(divide='ignore', invalid='ignore'):
+		return signal_time[n_before] + (level-signal_before)/(signal_after-signal_before)*(signal_time[n_after]-signal_time[n_before])
+
+def _rising_edge_time(signal, signal_time, level, n_peak):
+	# Time at which the rising edge of the pulse crosses `level`, i.e. between the last sample below `level` before the peak and the next one. NaN if there is no such sample.
+	n_signal_samples = signal.shape[2]
+	below = signal < level[:,:,numpy.newaxis]
+	below &= numpy.arange(n_signal_samples) < n_peak[:,:,numpy.newaxis]
+	n_before = n_signal_samples - 1 - numpy.argmax(below[:,:,::-1], axis=2)
+	crossing_time = _interpolate_crossing_time(signal, signal_time, level, n_before)
+	crossing_time[~below.any(axis=2)] = float('NaN')
+	return crossing_time
+
+def _time_over_threshold(signal, signal_time, threshold:float):
+	# From the first time the signal goes above `threshold` to the first time it goes back below it, both linearly interpolated. NaN if the signal does not cross the threshold upwards, or does not come back below it, within the window.
+	n_signal_samples = signal.shape[2]
+	if n_signal_samples < 2:
+		return numpy.full(signal.shape[:2], float('NaN'))
+	below = signal < threshold # Overflow samples (NaN) are neither below nor above.
+	rising = below[:,:,:-1] & (signal[:,:,1:] >= threshold)
+	n_before_rising = numpy.argmax(rising, axis=2)
+	falling = below & (numpy.arange(n_signal_samples) > n_before_rising[:,:,numpy.newaxis]+1)
+	n_before_falling = numpy.maximum(numpy.argmax(falling, axis=2) - 1, 0)
+	level = numpy.full(n_before_rising.shape, threshold, dtype=signal.dtype)
+	with numpy.errstate(invalid='ignore'):
+		time_over_threshold = _interpolate_crossing_time(signal, signal_time, level, n_before_falling) - _interpolate_crossing_time(signal, signal_time, level, n_before_rising)
+	time_over_threshold[~(rising.any(axis=2) & falling.any(axis=2))] = float('NaN')
+	return time_over_threshold
+
+def extract_features(batch:dict, baseline_window_seconds:tuple=None, signal_window_seconds:tuple=None, polarity:str='positive', constant_fraction:float=.5, rise_time_fractions:tuple=(.1,.9), time_over_threshold_volts:float=None, input_impedance_ohms:float=50)->dict:
+	"""Compute a few scalars for each channel of each event in a columnar
+	batch, all the events at once. This reduces the data by a factor
+	of about the record length, when the full waveforms are not needed.
+	
+	Usage example
+	-------------
+	```
+	for features in digitizer.stream(max_events=22222, features=dict(baseline_window_seconds=(-100e-9,-50e-9))):
+		do_something(features)
+	```
+	
+	Arguments
+	---------
+	batch: dict
+		A columnar batch with the samples in volts and the time axis,
+		see `CAEN_DT5742_Digitizer.get_waveforms`.
+	baseline_window_seconds: tuple of float, optional
+		Time window `(start, stop)` where the baseline is computed, in
+		the same time axis of the waveforms (i.e. the trigger is at 
+		t=0). By default the first 10 % of the samples.
+	signal_window_seconds: tuple of float, optional
+		Time window `(start, stop)` where the pulse is searched for. 
+		By default the whole waveform.
+	polarity: str, default `'positive'`
+		Either `'positive'` or `'negative'`, the polarity of the pulses.
+		For negative pulses the features are computed on the inverted 
+		waveforms, so the amplitude and the charge are positive numbers.
+	constant_fraction: float, default 0.5
+		Fraction of the amplitude at which the constant fraction time
+		is measured, on the rising edge before the peak.
+	rise_time_fractions: tuple of float, default (0.1, 0.9)
+		Fractions of the amplitude between which the rise time is 
+		measured, on the rising edge before the peak.
+	time_over_threshold_volts: float, optional
+		Threshold, measured from the baseline, for the time over threshold.
+		If `None` the time over threshold is not computed.
+	input_impedance_ohms: float, default 50
+		Input impedance of the digitizer, to convert the integral of 
+		the pulse into charge.
+	
+	Returns
+	-------
+	features: dict
+		A dictionary of the form
+		```
+		{
+			'channels': ('CH0', 'CH1', ...), # Same as in `batch`.
+			'Baseline (V)': numpy.array, # Shape (n_events, n_channels).
+			'Noise (V)': numpy.array, # Standard deviation in the baseline window.
+			'Peak amplitude (V)': numpy.array, # Maximum of the pulse, measured from the baseline.
+			'Peak time (s)': numpy.array,
+			'Constant fraction time (s)': numpy.array, # Linearly interpolated between samples.
+			'Rise time (s)': numpy.array, # Between `rise_time_fractions` of the amplitude, linearly interpolated.
+			'Time over threshold (s)': numpy.array, # Only if `time_over_threshold_volts` is given. From the first crossing of the threshold upwards to the next one downwards, linearly interpolated.
+			'Charge (C)': numpy.array, # Integral in the signal window, divided by `input_impedance_ohms`.
+			'EventCounter': numpy.array, # Shape (n_events,), the fields of `EventInfo` if present in `batch`.
+			...
+		}
+		```
+		Features that cannot be computed, e.g. the constant fraction
+		time when the pulse has no rising edge, are NaN. Samples with
+		ADC overflow (NaN) are ignored.
+	"""
+	if 'Amplitude (V)' not in batch:
+		raise ValueError(f'The samples must be in volts to extract the features, see `ADCu_to_volts`. ')
+	if 'Channel kept' in batch:
+		batch = expand_reduced_waveforms(batch) # The features of the dropped waveforms will be NaN.
+	if polarity not in {'positive','negative'}:
+		raise ValueError(f'`polarity` must be either `"positive"` or `"negative"`, received {repr(polarity)}. ')
+	if not isinstance(rise_time_fractions, (tuple,list)) or len(rise_time_fractions) != 2 or not 0 < rise_time_fractions[0] < rise_time_fractions[1] < 1:
+		raise ValueError(f'`rise_time_fractions` must be a tuple `(low, high)` with 0 < low < high < 1, received {repr(rise_time_fractions)}. ')
+	samples = batch['Amplitude (V)']
+	n_samples = samples.shape[2]
+	if 'Time (s)' in batch:
+		time_axis = numpy.asarray(batch['Time (s)'])
+	elif 't0 (s)' in batch:
+		time_axis = batch['t0 (s)'] + batch['dt (s)']*numpy.arange(n_samples)
+	else:
+		raise ValueError(f'The batch must contain the time axis to extract the features, use `get_time=True`. ')
+	dt = time_axis[1]-time_axis[0] if n_samples > 1 else float('NaN')
+	
+	if baseline_window_seconds is None:
+		baseline_mask = numpy.arange(n_samples) < max(1, n_samples//10)
+	else:
+		baseline_mask = _time_window_mask(time_axis, baseline_window_seconds, 'baseline_window_seconds')
+	if signal_window_seconds is None:
+		signal_mask = numpy.ones(n_samples, dtype=bool)
+	else:
+		signal_mask = _time_window_mask(time_axis, signal_window_seconds, 'signal_window_seconds')
+	
+	with warnings.catch_warnings():
+		warnings.simplefilter('ignore', RuntimeWarning) # E.g. "Mean of empty slice" when all the samples are overflow.
+		baseline = numpy.nanmean(samples[:,:,baseline_mask], axis=2)
+		noise = numpy.nanstd(samples[:,:,baseline_mask], axis=2)
+	signal = samples[:,:,signal_mask] - baseline[:,:,numpy.newaxis]
+	if polarity == 'negative':
+		signal *= -1
+	signal_time = time_axis[signal_mask]
+	
+	n_peak = numpy.argmax(numpy.where(numpy.isnan(signal), -numpy.inf, signal), axis=2)
+	amplitude = numpy.take_along_axis(signal, n_peak[:,:,numpy.newaxis], axis=2)[:,:,0]
+	peak_time = signal_time[n_peak]
+	
+	constant_fraction_time = _rising_edge_time(signal, signal_time, constant_fraction*amplitude, n_peak)
+	with numpy.errstate(invalid='ignore'):
+		rise_time = _rising_edge_time(signal, signal_time, rise_time_fractions[1]*amplitude, n_peak) - _rising_edge_time(signal, signal_time, rise_time_fractions[0]*amplitude, n_peak)
+	
+	features = {
+		'channels': batch['channels'],
+		'Baseline (V)': baseline,
+		'Noise (V)': noise,
+		'Peak amplitude (V)': amplitude,
+		'Peak time (s)': peak_time,
+		'Constant fraction time (s)': constant_fraction_time,
+		'Rise time (s)': rise_time,
+	}
+	if time_over_threshold_volts is not None:
+		features['Time over threshold (s)'] = _time_over_threshold(signal, signal_time, time_over_threshold_volts)
+	features['Charge (C)'] = numpy.nansum(signal, axis=2)*dt/input_impedance_ohms
+	for field in EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH:
+		if field in batch:
+			features[field] = batch[field]
+	return features
+
+REDUCED_BATCH_KEYS_PER_KEPT_WAVEFORM = ('Amplitude (V)','Amplitude (ADCu)','ADC overflow') # In a reduced batch these have one element per kept waveform along their first axis, see `reduce_waveforms`.
+
+def reduce_waveforms(batch:dict, roi_seconds:tuple=None, decimation:int=1, zero_suppression_peak_to_peak:float=None)->dict:
+	"""Reduce the amount of data in a columnar batch before storing it,
+	by cropping the waveforms to a region of interest, decimating the
+	samples and dropping the waveforms that only have noise (zero 
+	suppression).
+	
+	Usage example
+	-------------
+	```
+	for batch in digitizer.stream(max_events=22222, columnar=True):
+		writer.write(reduce_waveforms(batch, roi_seconds=(-20e-9,30e-9), zero_suppression_peak_to_peak=10e-3))
+	```
+	
+	Arguments
+	---------
+	batch: dict
+		A columnar batch with the time axis, see `CAEN_DT5742_Digitizer.get_waveforms`.
+	roi_seconds: tuple of float, optional
+		Time window `(start, stop)` to keep, in the same time axis of
+		the waveforms (i.e. the trigger is at t=0). By default the whole
+		waveform is kept.
+	decimation: int, default 1
+		Keep one every `decimation` samples.
+	zero_suppression_peak_to_peak: float, optional
+		Waveforms whose peak to peak within `roi_seconds` is smaller
+		than this, in the units of the samples (volts or ADC units), are
+		dropped. By default none are dropped.
+	
+	Returns
+	-------
+	reduced_batch: dict
+		A columnar batch with the time axis cropped and decimated, plus
+		`'Channel kept'`, a boolean array with shape (n_events, n_channels)
+		telling which waveforms were kept. `'Amplitude (V)'` (or `'Amplitude (ADCu)'`)
+		and `'ADC overflow'` have instead shape (n_kept_waveforms, n_samples),
+		with the kept waveforms in the order of `numpy.nonzero(reduced_batch['Channel kept'])`.
+		All the other fields are the same as in `batch`. See also `expand_reduced_waveforms`.
+	"""
+	if 'Channel kept' in batch:
+		raise ValueError(f'`batch` was already reduced. ')
+	if not isinstance(decimation, int) or decimation < 1:
+		raise ValueError(f'`decimation` must be a positive integer, received {repr(decimation)}. ')
+	amplitude_key = 'Amplitude (V)' if 'Amplitude (V)' in batch else 'Amplitude (ADCu)'
+	n_samples = batch[amplitude_key].shape[2]
+	if 'Time (s)' in batch:
+		time_axis = numpy.asarray(batch['Time (s)'])
+	elif 't0 (s)' in batch:
+		time_axis = batch['t0 (s)'] + batch['dt (s)']*numpy.arange(n_samples)
+	else:
+		raise ValueError(f'The batch must contain the time axis to reduce it, use `get_time=True`. ')
+	
+	if roi_seconds is None:
+		roi = slice(0, n_samples)
+	else:
+		n_roi_samples = numpy.nonzero(_time_window_mask(time_axis, roi_seconds, 'roi_seconds'))[0]
+		roi = slice(n_roi_samples[0], n_roi_samples[-1]+1)
+	kept_samples = slice(roi.start, roi.stop, decimation)
+	
+	if zero_suppression_peak_to_peak is None:
+		channel_kept = numpy.ones(batch[amplitude_key].shape[:2], dtype=bool)
+	else:
+		samples_in_roi = batch[amplitude_key][:,:,roi]
+		with warnings.catch_warnings():
+			warnings.simplefilter('ignore', RuntimeWarning) # All NaN waveforms, they are kept.
+			peak_to_peak = numpy.nanmax(samples_in_roi, axis=2).astype(float) - numpy.nanmin(samples_in_roi, axis=2)
+		channel_kept = ~(peak_to_peak < zero_suppression_peak_to_peak)
+	
+	reduced = {}
+	for key,value in batch.items():
+		if key in REDUCED_BATCH_KEYS_PER_KEPT_WAVEFORM:
+			reduced[key] = value[:,:,kept_samples][channel_kept]
+		elif key == 'Time (s)':
+			reduced[key] = time_axis[kept_samples]
+		elif key == 't0 (s)':
+			reduced[key] = time_axis[kept_samples.start] if n_samples > 0 else value
+		elif key == 'dt (s)':
+			reduced[key] = value*decimation
+		else:
+			reduced[key] = value
+	reduced['Channel kept'] = channel_kept
+	return reduced
+
+def expand_reduced_waveforms(reduced_batch:dict)->dict:
+	"""Inverse of the zero suppression of `reduce_waveforms`: returns
+	a columnar batch where the dropped waveforms are filled with NaN,
+	so all the events have all the channels again. Integer samples are
+	converted to `float` to hold the NaN. The cropping and decimation
+	cannot be undone."""
+	channel_kept = reduced_batch['Channel kept']
+	batch = {}
+	for key,value in reduced_batch.items():
+		if key == 'Channel kept':
+			continue
+		if key in REDUCED_BATCH_KEYS_PER_KEPT_WAVEFORM:
+			if key == 'ADC overflow':
+				expanded = numpy.zeros(channel_kept.shape + value.shape[1:], dtype=bool)
+			else:
+				expanded = numpy.full(channel_kept.shape + value.shape[1:], float('NaN'), dtype=value.dtype if numpy.issubdtype(value.dtype, numpy.floating) else float)
+			expanded[channel_kept] = value
+			batch[key] = expanded
+		else:
+			batch[key] = value
+	return batch
+
+def events_to_data_frame(events, format:str='long', first_n_event:int=0):
+	"""Convert the events, as returned by `CAEN_DT5742_Digitizer.get_waveforms`,
+	into a single `pandas.DataFrame`. The index is built directly from
+	integer codes, so this is much faster than creating one data frame
+	per event and channel and concatenating them. Requires `pandas`.
+	
+	Arguments
+	---------
+	events: list of dict or dict
+		The events, either a list of dictionaries or a columnar batch,
+		which can be reduced (see `reduce_waveforms`).
+	format: str, default `'long'`
+		Either `'long'` or `'wide'`. In the long format there is one 
+		row per sample, with index `('n_event','n_channel','n_sample')`
+		and columns `'Amplitude (V)'` (or `'Amplitude (ADCu)'`), `'Time (s)'`
+		and `'ADC overflow'` if present. In the wide format there is
+		one row per event and sample, with index `('n_event','n_sample')`,
+		a column `'Time (s)'` and one column per channel and variable,
+		e.g. `'CH0 Amplitude (V)'`.
+	first_n_event: int, default 0
+		Number given to the first event in the `'n_event'` level of
+		the index, the others are numbered consecutively.
+	
+	Returns
+	-------
+	data_frame: pandas.DataFrame
+		The data frame, e.g. in the long format:
+		```
+		                           Amplitude (V)      Time (s)
+		n_event n_channel n_sample                            
+		0       CH0       0             0.019902 -1.626000e-07
+		                  1             0.019902 -1.624000e-07
+		...                                  ...           ...
+		1023    trigger_group_1 1022    0.026986  4.180000e-08
+		                        1023    0.027718  4.200000e-08
+		```
+	"""
+	try:
+		import pandas
+	except ImportError as e:
+		raise ImportError(f'`events_to_data_frame` requires `pandas`, install it with `pip install pandas`. ') from e
+	if format not in {'long','wide'}:
+		raise ValueError(f'`format` must be either `"long"` or `"wide"`, received {repr(format)}. ')
+	if isinstance(events, list):
+		batch = events_to_columnar_batch(events) if len(events) > 0 else {'channels': tuple(), 'Amplitude (V)': numpy.empty((0,0,0))}
+	elif isinstance(events, dict):
+		batch = events
+	else:
+		raise TypeError(f'`events` must be a list of dict or a columnar batch (a dict), as returned by `get_waveforms`, received object of type {type(events)}. ')
+	if 'Channel kept' in batch and format == 'wide':
+		batch = expand_reduced_waveforms(batch)
+	
+	amplitude_key = 'Amplitude (V)' if 'Amplitude (V)' in batch else 'Amplitude (ADCu)'
+	if 'Channel kept' in batch: # Only the kept waveforms go into the long format.
+		n_events, n_channels = batch['Channel kept'].shape
+		n_samples = batch[amplitude_key].shape[1]
+		waveform_n_event, waveform_n_channel = numpy.nonzero(batch['Channel kept'])
+	else:
+		n_events, n_channels, n_samples = batch[amplitude_key].shape
+		waveform_n_event = numpy.repeat(numpy.arange(n_events), n_channels)
+		waveform_n_channel = numpy.tile(numpy.arange(n_channels), n_events)
+	n_waveforms = len(waveform_n_event)
+	if 'Time (s)' in batch:
+		time_axis = batch['Time (s)']
+	elif 't0 (s)' in batch:
+		time_axis = batch['t0 (s)'] + batch['dt (s)']*numpy.arange(n_samples)
+	else:
+		time_axis = None
+	per_sample_keys = [key for key in [amplitude_key,'ADC overflow'] if key in batch]
+	n_event_level = numpy.arange(first_n_event, first_n_event+n_events)
+	n_sample_level = numpy.arange(n_samples)
+	
+	if format == 'long':
+		index = pandas.MultiIndex(
+			levels = [n_event_level, list(batch['channels']), n_sample_level],
+			codes = [
+				numpy.repeat(waveform_n_event, n_samples),
+				numpy.repeat(waveform_n_channel, n_samples),
+				numpy.tile(n_sample_level, n_waveforms),
+			],
+			names = ['n_event','n_channel','n_sample'],
+			verify_integrity = False,
+		)
+		columns = {key: batch[key].reshape(-1) for key in per_sample_keys}
+		if time_axis is not None:
+			columns['Time (s)'] = numpy.tile(time_axis, n_waveforms)
+	else:
+		index = pandas.MultiIndex(
+			levels = [n_event_level, n_sample_level],
+			codes = [
+				numpy.repeat(numpy.arange(n_events), n_samples),
+				numpy.tile(n_sample_level, n_events),
+			],
+			names = ['n_event','n_sample'],
+			verify_integrity = False,
+		)
+		columns = {}
+		if time_axis is not None:
+			columns['Time (s)'] = numpy.tile(time_axis, n_events)
+		for key in per_sample_keys:
+			for n_channel,channel in enumerate(batch['channels']):
+				columns[f'{channel} {key}'] = batch[key][:,n_channel,:].reshape(-1)
+	return pandas.DataFrame(columns, index=index, copy=False)
+
+def iter_events_as_data_frames(blocks, format:str='long'):
+	"""Convert each block of events into a data frame with `events_to_data_frame`,
+	numbering the events consecutively across blocks, so the memory
+	holds only one block at a time.
+	
+	Usage example
+	-------------
+	```
+	for df in iter_events_as_data_frames(digitizer.stream(max_events=2222, columnar=True)):
+		df.to_csv('data.csv', mode='a')
+	```
+	
+	Arguments
+	---------
+	blocks: iterable
+		Each element is the output of `get_waveforms`, e.g. `CAEN_DT5742_Digitizer.stream`.
+	format: str, default `'long'`
+		See `events_to_data_frame`.
+	
+	Yields
+	------
+	data_frame: pandas.DataFrame
+		The events of each block, empty blocks are skipped.
+	"""
+	n_events = 0
+	for events in blocks:
+		data_frame = events_to_data_frame(events, format=format, first_n_event=n_events)
+		n_events_in_block = len(data_frame.index.levels[0])
+		if n_events_in_block == 0:
+			continue
+		n_events += n_events_in_block
+		yield data_frame
+
+def concatenate_columnar_batches(batches:list)->dict:
+	"""Concatenate several columnar batches (see `CAEN_DT5742_Digitizer.get_waveforms`),
+	e.g. the ones obtained in successive calls to `get_waveforms`, into
+	a single one. All the batches must have been acquired with the same
+	configuration of the digitizer.
+	
+	Arguments
+	---------
+	batches: list of dict
+		The batches to concatenate, as returned by `get_waveforms(columnar=True)`.
+	
+	Returns
+	-------
+	batch: dict
+		A columnar batch with all the events, in the same order.
+	"""
+	if len(batches) == 0:
+		raise ValueError(f'`batches` is empty, there is nothing to concatenate.')
+	non_empty_batches = [batch for batch in batches if len(batch['EventCounter']) > 0]
+	if len(non_empty_batches) == 0:
+		return batches[0]
+	if len(non_empty_batches) == 1:
+		return non_empty_batches[0]
+	concatenated = {}
+	for key,value in non_empty_batches[0].items():
+		if key in COLUMNAR_BATCH_KEYS_COMMON_TO_ALL_EVENTS:
+			if any(key not in batch or not numpy.array_equal(batch[key], value) for batch in non_empty_batches):
+				raise ValueError(f'Cannot concatenate batches with different {repr(key)}.')
+			concatenated[key] = value
+		else:
+			concatenated[key] = numpy.concatenate([batch[key] for batch in non_empty_batches])
+	return concatenated
+
+def _unpack_12_bit_samples(words):
+	"""Unpack the 12 bit samples packed in an array of 32 bit words of
+	shape (n_events, n_words) into an array of shape (n_events, n_words*32/12).
+	The samples are packed as a little endian bit stream, i.e. sample 
+	0 is in bits [11:0] of the first word, sample 1 in bits [23:12], 
+	sample 2 begins in bits [31:24] of the first word and ends in bits
+	[3:0] of the second one, and so on."""
+	triplets = numpy.ascontiguousarray(words, dtype='<u4').view(numpy.uint8).reshape(words.shape[0], -1, 3).astype(numpy.uint16) # Each 3 bytes contain 2 samples.
+	samples = numpy.empty((words.shape[0], triplets.shape[1]*2), dtype=numpy.uint16)
+	samples[:,0::2] = triplets[:,:,0] | ((triplets[:,:,1] & 0xF) << 8)
+	samples[:,1::2] = (triplets[:,:,1] >> 4) | (triplets[:,:,2] << 4)
+	return samples
+
+def parse_x742_raw_block(block)->dict:
+	"""Parse a raw block transfer from a x742 digitizer, as returned by
+	`CAEN_DGTZ_ReadData`, using only numpy, i.e. without the libCAENDigitizer.
+	The samples of all the events are unpacked at once. This follows 
+	the event format described in the user manual of the x742 digitizers:
+	a 4 words event header (event size, board ID, pattern, group mask,
+	event counter and trigger time tag) followed, for each group present,
+	by a group header (start index cell, trigger channel present and 
+	size), the 8 channels with 8 samples packed in each 3 words, the 
+	trigger channel (if digitized) and the group trigger time tag. 
+	
+	Note that the DRS4 correction is not applied, the samples are the
+	raw values from the ADC. All the events in the block must have the
+	same groups and sizes, which is always the case within an acquisition.
+	
+	Arguments
+	---------
+	block: bytes-like
+		The raw block transfer.
+	
+	Returns
+	-------
+	parsed_block: dict
+		A dictionary of the form
+		```
+		{
+			'channels': ('CH0', 'CH1', ..., 'trigger_group_1'), # Names of the channels, in the order of the second axis of 'Amplitude (ADCu)'.
+			'Amplitude (ADCu)': numpy.array, # uint16, shape (n_events, n_channels, record_length).
+			'EventCounter': numpy.array, # Shape (n_events,).
+			'TriggerTimeTag': numpy.array,
+			'Pattern': numpy.array,
+			'BoardId': numpy.array,
+			'StartIndexCell': numpy.array, # Shape (n_events, n_channels), the DRS4 cell of the first sample of each channel.
+		}
+		```
+	"""
+	block = memoryview(block).cast('B')
+	if block.nbytes % 4 != 0:
+		raise ValueError(f'The size of the block must be a multiple of 4 bytes, received a block of {block.nbytes} bytes.')
+	words = numpy.frombuffer(block, dtype='<u4')
+	
+	# Find the events:
+	event_size = None
+	position = 0
+	while position < len(words):
+		header = int(words[position])
+		if header >> 28 != 0b1010:
+			raise ValueError(f'Invalid event header at word {position} of the block.')
+		this_event_size = header & 0x0FFFFFFF
+		if event_size is None:
+			event_size = this_event_size
+		elif this_event_size != event_size:
+			raise ValueError(f'All the events in the block must have the same size, but event at word {position} has {this_event_size} words while the first one has {event_size}.')
+		if event_size < 4 or position+event_size > len(words):
+			raise ValueError(f'The block is truncated or corrupted, event at word {position} has a size of {event_size} words.')
+		position += event_size
+	n_events = 0 if event_size is None else len(words)//event_size
+	if n_events == 0:
+		return {
+			'channels': tuple(),
+			'Amplitude (ADCu)': numpy.empty((0,0,0), dtype=numpy.uint16),
+			**{field: numpy.empty(0, dtype=numpy.uint32) for field in EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH},
+			'StartIndexCell': numpy.empty((0,0), dtype=numpy.uint16),
+		}
+	events = words.reshape(n_events, event_size)
+	
+	group_mask = events[:,1] & 0xF
+	if numpy.any(group_mask != group_mask[0]):
+		raise ValueError(f'All the events in the block must have the same groups enabled.')
+	group_mask = int(group_mask[0])
+	if group_mask & 0b1100:
+		raise ValueError(f'The block contains groups 2 and/or 3, but the DT5742 has only groups 0 and 1.')
+	
+	channels = []
+	samples = []
+	start_index_cell = []
+	position = 4 # After the event header.
+	for n_group in range(2):
+		if not group_mask & (1<<n_group):
+			continue
+		group_header = events[:,position]
+		if numpy.any((group_header & 0x1FFF) != (group_header[0] & 0x1FFF)):
+			raise ValueError(f'All the events in the block must have the same size and trigger channel configuration in group {n_group}.')
+		size = int(group_header[0] & 0xFFF) # Number of words with the samples of the 8 channels.
+		trigger_channel_present = bool(group_header[0] & (1<<12))
+		if size % 3 != 0:
+			raise ValueError(f'Invalid size of {size} words for group {n_group}, it must be a multiple of 3.')
+		record_length = size//3
+		position += 1
+		
+		group_samples = _unpack_12_bit_samples(events[:,position:position+size]).reshape(n_events, record_length, 8).transpose(0,2,1) # Each 3 words contain one sample of each of the 8 channels.
+		position += size
+		channels += [CHANNELS_NAMES[9*n_group+n] for n in range(8)]
+		samples.append(group_samples)
+		if trigger_channel_present == True:
+			trigger_size = size//8
+			trigger_samples = _unpack_12_bit_samples(events[:,position:position+trigger_size])
+			position += trigger_size
+			channels.append(CHANNELS_NAMES[9*n_group+8])
+			samples.append(trigger_samples[:,numpy.newaxis,:])
+		position += 1 # Group trigger time tag.
+		start_index_cell.append(numpy.repeat(((group_header >> 20) & 0x3FF).astype(numpy.uint16)[:,numpy.newaxis], 9 if trigger_channel_present else 8, axis=1))
+	if position != event_size:
+		raise ValueError(f'The size of the events ({event_size} words) does not match their content ({position} words).')
+	
+	return {
+		'channels': tuple(channels),
+		'Amplitude (ADCu)': numpy.concatenate(samples, axis=1),
+		'EventCounter': events[:,2] & 0x3FFFFF,
+		'TriggerTimeTag': events[:,3].copy(),
+		'Pattern': (events[:,1] >> 8) & 0x3FFF, # Bits [21:8] of the second word of the header, the ones above are the board fail flag and reserved.
+		'BoardId': events[:,1] >> 27,
+		'StartIndexCell': numpy.concatenate(start_index_cell, axis=1),
+	}
+
+def decode_x742_raw_block(block, ADC_peak_to_peak_dynamic_range_volts:float=None, time_axis_parameters:dict=None, ADC_dynamic_range_margin:int=77, time_as_t0_and_dt:bool=False, columnar:bool=False, dtype=numpy.float64, overflow_as_mask:bool=False):
+	"""Decode a raw block transfer using only numpy (see `parse_x742_raw_block`)
+	into the same data structures that `CAEN_DT5742_Digitizer.get_waveforms`
+	produces using the libCAENDigitizer. The DRS4 correction is not
+	applied, so the result is meant to match the one of the 
+	libCAENDigitizer only when it is disabled. 
+	
+	Note that this has so far only been tested with blocks packed
+	according to the same reading of the user manual as this function,
+	not yet against a block captured from a DT5742 and decoded with
+	`CAEN_DGTZ_DecodeEvent` (see `tests/test_x742_raw_block.py`). Until
+	then, check it against `get_waveforms` before relying on it.
+	
+	Arguments
+	---------
+	block: bytes-like
+		The raw block transfer.
+	ADC_peak_to_peak_dynamic_range_volts, time_axis_parameters, ADC_dynamic_range_margin, time_as_t0_and_dt, dtype, overflow_as_mask:
+		Same as in `decode_event_waveforms_to_python_friendly_stuff`.
+	columnar: bool, default False
+		Same as in `CAEN_DT5742_Digitizer.get_waveforms`.
+	
+	Returns
+	-------
+	events: list of dict or dict
+		Same as `CAEN_DT5742_Digitizer.get_waveforms`.
+	"""
+	parsed = parse_x742_raw_block(block)
+	batch = _finish_columnar_batch(
+		samples = parsed['Amplitude (ADCu)'],
+		channels = parsed['channels'],
+		event_info = {field: parsed[field] for field in EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH},
+		start_index_cell = parsed['StartIndexCell'],
+		ADC_peak_to_peak_dynamic_range_volts = ADC_peak_to_peak_dynamic_range_volts,
+		time_axis_parameters = time_axis_parameters,
+		ADC_dynamic_range_margin = ADC_dynamic_range_margin,
+		time_as_t0_and_dt = time_as_t0_and_dt,
+		dtype = dtype,
+		overflow_as_mask = overflow_as_mask,
+	)
+	if columnar == True:
+		return batch
+	return columnar_batch_to_events(batch, copy=True)
+
+RAW_CAPTURE_MAGIC = b'CAENpy DT5742 raw capture\n'
+RAW_CAPTURE_INDEX_DTYPE = numpy.dtype([
+	('offset', '<u8'), # Position of the block in the capture file, in bytes.
+	('size', '<u8'), # Size of the block, in bytes.
+	('n_events', '<u4'), # Number of events in the block.
+	('time', '<f8'), # Unix time when the block was transferred from the digitizer.
+])
+
+def _raw_capture_index_path(path)->Path:
+	return Path(str(path) + '.index')
+
+class RawCaptureWriter:
+	"""Writes the raw block transfers from the digitizer, without decoding
+	them, into an append-only file. Next to it, an index file with one
+	record per block (see `RAW_CAPTURE_INDEX_DTYPE`) is written. The 
+	capture file starts with `RAW_CAPTURE_MAGIC` followed by a JSON line
+	with the metadata, and then the blocks one after the other.
+	
+	Usually you don't need to use this class directly, see `CAEN_DT5742_Digitizer.capture_raw_to_file`.
+	The blocks can be read back with `read_raw_capture`.
+	"""
+	def __init__(self, path, metadata:dict):
+		"""Creates the capture file and its index. They must not exist.
+		
+		Arguments
+		---------
+		path: str or Path
+			Path to the capture file. The index will be in the same place
+			with `'.index'` appended to the name.
+		metadata: dict
+			Anything that can be serialized to JSON, usually the configuration
+			of the digitizer which is required to decode the data.
+		"""
+		path = Path(path)
+		self._data_file = open(path, 'xb')
+		try:
+			self._index_file = open(_raw_capture_index_path(path), 'xb')
+		except:
+			self._data_file.close()
+			raise
+		self._data_file.write(RAW_CAPTURE_MAGIC)
+		self._data_file.write(json.dumps(metadata).encode('utf8') + b'\n')
+		self._index_record = numpy.zeros(1, dtype=RAW_CAPTURE_INDEX_DTYPE)
+	
+	def write_block(self, block, n_events:int):
+		"""Append a block to the capture file.
+		
+		Arguments
+		---------
+		block: bytes-like
+			The raw block transfer, any object supporting the buffer protocol.
+		n_events: int
+			Number of events in the block, to be stored in the index.
+		"""
+		block = memoryview(block).cast('B')
+		self._index_record['offset'] = self._data_file.tell()
+		self._index_record['size'] = block.nbytes
+		self._index_record['n_events'] = n_events
+		self._index_record['time'] = time.time()
+		self._data_file.write(block)
+		self._index_file.write(self._index_record.tobytes())
+	
+	def close(self):
+		self._data_file.close()
+		self._index_file.close()
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+def read_raw_capture(path)->tuple:
+	"""Read the metadata and the index of a capture file written by
+	`RawCaptureWriter`, e.g. by `CAEN_DT5742_Digitizer.capture_raw_to_file`.
+	
+	Arguments
+	---------
+	path: str or Path
+		Path to the capture file.
+	
+	Returns
+	-------
+	metadata: dict
+		The metadata stored in the file.
+	index: numpy.array
+		A structured array with one element per block, see `RAW_CAPTURE_INDEX_DTYPE`.
+	"""
+	path = Path(path)
+	with open(path, 'rb') as f:
+		if f.read(len(RAW_CAPTURE_MAGIC)) != RAW_CAPTURE_MAGIC:
+			raise ValueError(f'{path} is not a raw capture file.')
+		metadata = json.loads(f.readline().decode('utf8'))
+	index = numpy.fromfile(_raw_capture_index_path(path), dtype=RAW_CAPTURE_INDEX_DTYPE)
+	return metadata, index
+
+def iter_raw_capture_blocks(path):
+	"""Iterate over the blocks of a capture file written by `RawCaptureWriter`,
+	without loading the whole file into memory.
+	
+	Arguments
+	---------
+	path: str or Path
+		Path to the capture file.
+	
+	Yields
+	------
+	block: bytes
+		The raw block transfer, as it was read from the digitizer.
+	index_record: numpy.void
+		The corresponding element of the index, see `read_raw_capture`.
+	"""
+	_, index = read_raw_capture(path)
+	with open(path, 'rb') as f:
+		for index_record in index:
+			f.seek(int(index_record['offset']))
+			block = f.read(int(index_record['size']))
+			if len(block) != index_record['size']:
+				raise RuntimeError(f'The capture file {path} is truncated.')
+			yield block, index_record
+
+def decode_raw_capture_with_numpy(path, get_time:bool=True, get_ADCu_instead_of_volts:bool=False, columnar:bool=False, time_as_t0_and_dt:bool=False, dtype=numpy.float64, overflow_as_mask:bool=False):
+	"""Decode a file written by `CAEN_DT5742_Digitizer.capture_raw_to_file`
+	using `decode_x742_raw_block`, i.e. without the libCAENDigitizer nor
+	the digitizer. Note that the DRS4 correction is not applied, if 
+	you need it use `CAEN_DT5742_Digitizer.decode_raw_capture` instead.
+	
+	Arguments
+	---------
+	path: str or Path
+		Path to the capture file.
+	get_time, get_ADCu_instead_of_volts, columnar, time_as_t0_and_dt, dtype, overflow_as_mask:
+		Same as in `CAEN_DT5742_Digitizer.get_waveforms`.
+	
+	Yields
+	------
+	events: list of dict or dict
+		The events of each block, same as `CAEN_DT5742_Digitizer.get_waveforms`.
+	"""
+	metadata, _ = read_raw_capture(path)
+	configuration = metadata['configuration']
+	if metadata['DRS4_correction'] == True:
+		warnings.warn(f'The capture {path} was taken with the DRS4 correction enabled, but `decode_raw_capture_with_numpy` does not apply it.')
+	time_axis_parameters = dict(
+		sampling_frequency = configuration['sampling_frequency_MHz']*1e6,
+		post_trigger_size = configuration['post_trigger_size'],
+		fast_trigger_mode = configuration['fast_trigger_mode'],
+	)
+	for block,_ in iter_raw_capture_blocks(path):
+		yield decode_x742_raw_block(
+			block,
+			ADC_peak_to_peak_dynamic_range_volts = 1 if get_ADCu_instead_of_volts==False else None,
+			time_axis_parameters = time_axis_parameters if get_time else None,
+			time_as_t0_and_dt = time_as_t0_and_dt,
+			dtype = dtype,
+			overflow_as_mask = overflow_as_mask,
+			columnar = columnar,
+		)
+
+def _decode_raw_block_in_shared_memory(shared_memory_name:str, size:int, decoding_options:dict, process):
+	"""Runs in the worker processes of `_SharedMemoryDecodingPool`, decodes
+	the block in the shared memory `shared_memory_name` and applies `process`
+	to it. Returns the number of events in the block and the result."""
+	shared_memory = multiprocessing.shared_memory.SharedMemory(name=shared_memory_name)
+	try:
+		batch = decode_x742_raw_block(bytes(shared_memory.buf[:size]), columnar=True, **decoding_options) # Copied out of the shared memory, so the slot does not depend on the lifetime of the arrays.
+	finally:
+		shared_memory.close()
+	return len(batch['EventCounter']), process(batch) if process is not None else batch
+
+class _SharedMemoryDecodingPool:
+	"""A pool of worker processes that decode raw blocks transferred
+	through shared memory, see `CAEN_DT5742_Digitizer.stream_parallel`.
+	The results are obtained in the same order in which the blocks were
+	submitted."""
+	def __init__(self, n_workers:int, n_slots:int, decoding_options:dict, process):
+		self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=n_workers)
+		self.decoding_options = decoding_options
+		self.process = process
+		self.slots = [None]*n_slots # `SharedMemory` objects, created when first needed and grown if a block does not fit.
+		self.free_slots = list(range(n_slots))
+		self.pending = collections.deque() # `(future, n_slot, n_events)` in the order the blocks were submitted.
+	
+	def has_free_slot(self)->bool:
+		return len(self.free_slots) > 0
+	
+	def has_pending(self)->bool:
+		return len(self.pending) > 0
+	
+	def submit(self, block, n_events:int):
+		"""Copy `block` into a free slot and send it to the workers. There
+		must be a free slot, see `has_free_slot`."""
+		block = memoryview(block).cast('B')
+		n_slot = self.free_slots.pop()
+		shared_memory = self.slots[n_slot]
+		if shared_memory is None or shared_memory.size < block.nbytes:
+			if shared_memory is not None:
+				shared_memory.close()
+				shared_memory.unlink()
+			shared_memory = multiprocessing.shared_memory.SharedMemory(create=True, size=max(block.nbytes, 1))
+			self.slots[n_slot] = shared_memory
+		shared_memory.buf[:block.nbytes] = block
+		try:
+			future = self.executor.submit(_decode_raw_block_in_shared_memory, shared_memory.name, block.nbytes, self.decoding_options, self.process)
+		except:
+			self.free_slots.append(n_slot)
+			raise
+		self.pending.append((future, n_slot, n_events))
+	
+	def pop_result(self, wait:bool):
+		"""Returns `(True, result)` for the oldest submitted block if it 
+		is done (or after waiting for it if `wait`), otherwise `(False, None)`."""
+		if len(self.pending) == 0 or (wait == False and not self.pending[0][0].done()):
+			return False, None
+		future, n_slot, n_events = self.pending.popleft()
+		try:
+			n_decoded_events, result = future.result()
+		finally:
+			self.free_slots.append(n_slot)
+		if n_decoded_events != n_events:
+			raise RuntimeError(f'A block with {n_events} events according to the libCAENDigitizer was decoded into {n_decoded_events} events. ')
+		return True, result
+	
+	def close(self):
+		self.executor.shutdown(wait=True, cancel_futures=True)
+		for shared_memory in self.slots:
+			if shared_memory is not None:
+				shared_memory.close()
+				shared_memory.unlink()
+
+class _DifferentRecordLengths(RuntimeError):
+	"""Raised when the events of a block cannot be decoded into a columnar
+	batch because not all their channels have the same number of samples."""
+
+class _LockedLibrary:
+	"""Gives access to the functions of the libCAENDigitizer, each call
+	holding `lock`. The library does not promise to be thread safe for
+	a single handle, and the background readout thread (see `CAEN_DT5742_Digitizer.start_background_readout`)
+	uses the same handle as the rest of the methods."""
+	def __init__(self, lock):
+		self.lock = lock
+	
+	def __getattr__(self, name):
+		function = getattr(libCAENDigitizer, name)
+		def call_holding_lock(*args):
+			with self.lock:
+				return function(*args)
+		setattr(self, name, call_holding_lock) # So `__getattr__` is not called again for this function.
+		return call_holding_lock
+
+class _BackgroundReadout:
+	"""State shared between the background readout thread and the consumer,
+	see `CAEN_DT5742_Digitizer.start_background_readout`."""
+	def __init__(self, n_blocks:int):
+		# The ring of block transfer buffers, each one allocated by the libCAENDigitizer.
+		self.buffers = [POINTER(c_char)() for _ in range(n_blocks)]
+		self.allocated_sizes = [c_uint32() for _ in range(n_blocks)]
+		self.buffer_sizes = [c_uint32() for _ in range(n_blocks)]
+		self.n_allocated_buffers = 0
+		# Indices of the buffers, they go from one queue to the other and back.
+		self.free_slots = queue.Queue()
+		self.filled_slots = queue.Queue()
+		
+		self.stop = threading.Event()
+		self.thread = None
+		self.exception = None # If the thread fails, the exception is stored here to be raised in the consumer.
+		self.stats_lock = threading.Lock()
+		self.stats = {
+			'blocks read': 0,
+			'events read': 0,
+			'ring full': 0,
+			'digitizer memory full': 0,
+		}
+
 class CAEN_DT5742_Digitizer:
 	"""A class designed to interface with CAEN DT5742 digitizers in an
 	easy and Pythonic way.
@@ -239,6 +1397,7 @@ class CAEN_DT5742_Digitizer:
 		"""
 		self._connected = False
 		self._LinkNum = LinkNum
+		self._library = _LockedLibrary(threading.RLock()) # All calls to the libCAENDigitizer go through this.
 		self.__handle = c_int() # Handle object, keep track of our connection.
 		
 		# These are some objects required by the libCAENDigitizer.
@@ -250,6 +1409,12 @@ class CAEN_DT5742_Digitizer:
 		self.eventBufferSize = c_uint32() # Size in memory of the events' block transfer.
 		self.eventVoidPointer = cast(byref(self.eventObject), POINTER(c_void_p)) # Need to create a **void since technically speaking other kinds of Event() esist as well (the CAENDigitizer library supports a multitude of devices, with different Event() structures) and we need to pass this to "universal" methods.
 		
+		self._configuration_cache = {} # Values of the configuration known to be in the digitizer, see `get_configuration`.
+		self._acquisition_configuration = None # Snapshot of the configuration taken when the acquisition starts, see `start_acquisition`.
+		self._readout_memory_allocated = False # Whether `eventObject` and `eventBuffer` are currently allocated, see `_allocate_readout_memory`.
+		self._background_readout = None # See `start_background_readout`.
+		self._stream_stats = None # See `stream`.
+		
 		self._open() # Open the connection to the digitizer.
 		
 		model = self.get_info()['ModelName'].decode('utf8')
@@ -283,16 +1448,27 @@ class CAEN_DT5742_Digitizer:
 		"""
 		if self.get_acquisition_status()['acquiring now'] == True:
 			raise RuntimeError(f'The digitizer is already acquiring, cannot start a new acquisition.')
+		self._acquisition_configuration = self.get_configuration() # The configuration cannot change during the acquisition, so this is all we need to decode the data.
 		if DRS4_correction == True:
-			self._LoadDRS4CorrectionData(MHz=self.get_sampling_frequency())
+			self._LoadDRS4CorrectionData(MHz=self._acquisition_configuration['sampling_frequency_MHz'])
 		self._DRS4_correction(enable=DRS4_correction)
-		self._start_acquisition()
+		self._free_readout_memory() # In case it was allocated with a previous configuration, since its size depends on it.
+		self._allocate_readout_memory() # Allocate once, and reuse it in every call to `get_waveforms` until the acquisition is stopped.
+		try:
+			self._start_acquisition()
+		except:
+			self._free_readout_memory()
+			raise
 		self.get_acquisition_status() # This makes it work better. Don't know why.
 	
 	def stop_acquisition(self):
 		"""Stops the acquisition and cleans the memory used by the `libCAENDigitizer`
 		library to read out the instrument."""
-		self._stop_acquisition()
+		try:
+			self.stop_background_readout()
+			self._stop_acquisition()
+		finally:
+			self._free_readout_memory()
 	
 	def __enter__(self):
 		self.start_acquisition()
@@ -305,8 +1481,10 @@ class CAEN_DT5742_Digitizer:
 	
 	def _open(self):
 		"""Open the connection to the digitizer."""
+		if libCAENDigitizer is None:
+			raise RuntimeError(f'The libCAENDigitizer could not be loaded, so the digitizer cannot be operated. Reason: {_libCAENDigitizer_loading_error}')
 		if self._connected == False:
-			code = libCAENDigitizer.CAEN_DGTZ_OpenDigitizer(
+			code = self._library.CAEN_DGTZ_OpenDigitizer(
 				c_long(0), # LinkType (0 is USB).
 				c_int(self._LinkNum),
 				c_int(0), # ConetNode.
@@ -319,7 +1497,9 @@ class CAEN_DT5742_Digitizer:
 	def close(self):
 		"""Close the connection with the digitizer."""
 		if self._connected == True:
-			code = libCAENDigitizer.CAEN_DGTZ_CloseDigitizer(self.__handle) # Most of the times this line produces a `Segmentation fault (core dumped)`...
+			self.stop_background_readout()
+			self._free_readout_memory()
+			code = self._library.CAEN_DGTZ_CloseDigitizer(self.__handle) # Most of the times this line produces a `Segmentation fault (core dumped)`...
 			check_error_code(code)
 			self._connected = False
 	
@@ -334,19 +1514,77 @@ class CAEN_DT5742_Digitizer:
 	
 	def reset(self):
 		"""Reset the digitizer."""
-		code = libCAENDigitizer.CAEN_DGTZ_Reset(self._get_handle())
+		code = self._library.CAEN_DGTZ_Reset(self._get_handle())
 		check_error_code(code)
+		self._configuration_cache.clear() # The reset brings back the default configuration.
+	
+	def get_configuration(self)->dict:
+		"""Returns the configuration of the digitizer that is required
+		to interpret the data, e.g. to reconstruct the time axis. The
+		values are cached, i.e. the digitizer is only queried for the 
+		values that were never read or that were changed since the last
+		time they were read.
+		
+		Returns
+		-------
+		configuration: dict
+			A dictionary of the form:
+			```
+			{
+				'sampling_frequency_MHz': int,
+				'post_trigger_size': int,
+				'fast_trigger_mode': bool,
+				'record_length': int,
+				'enabled_channels': dict, # Same as `get_enabled_channels`.
+				'max_num_events_BLT': int,
+			}
+			```
+		"""
+		GETTERS = {
+			'sampling_frequency_MHz': self.get_sampling_frequency,
+			'post_trigger_size': self.get_post_trigger_size,
+			'fast_trigger_mode': self.get_fast_trigger_mode,
+			'record_length': self.get_record_length,
+			'enabled_channels': self.get_enabled_channels,
+			'max_num_events_BLT': self.get_max_num_events_BLT,
+		}
+		configuration = {}
+		for name,getter in GETTERS.items():
+			if name not in self._configuration_cache:
+				getter() # Each getter stores its value in the cache.
+			configuration[name] = self._configuration_cache[name]
+		return configuration
+	
+	def _get_acquisition_configuration(self)->dict:
+		"""Returns the configuration with which the data in the digitizer
+		was acquired, i.e. the snapshot taken by `start_acquisition`. If
+		no acquisition was ever started, the current configuration is
+		returned."""
+		if self._acquisition_configuration is None:
+			return self.get_configuration()
+		return self._acquisition_configuration
+	
+	def _get_time_axis_parameters(self)->dict:
+		"""Returns the `time_axis_parameters` for `decode_event_waveforms_to_python_friendly_stuff`
+		corresponding to the data in the digitizer."""
+		configuration = self._get_acquisition_configuration()
+		return dict(
+			sampling_frequency = configuration['sampling_frequency_MHz']*1e6,
+			post_trigger_size = configuration['post_trigger_size'],
+			fast_trigger_mode = configuration['fast_trigger_mode'],
+		)
 
 	def write_register(self, address, data):
 		"""Write data to a given register. It is advised by the manual
 		of the CAENDigitizer library that one should avoid using this
 		function, and use the specific functions instead."""
-		code = libCAENDigitizer.CAEN_DGTZ_WriteRegister(
+		code = self._library.CAEN_DGTZ_WriteRegister(
 			self._get_handle(), 
 			c_uint32(address), 
 			c_uint32(data)
 		)
 		check_error_code(code)
+		self._configuration_cache.clear() # We don't know what was changed by writing this register.
 
 	def read_register(self, address):
 		"""Read bytes from a specific register. Returns the data in the
@@ -354,7 +1592,7 @@ class CAEN_DT5742_Digitizer:
 		if not isinstance(address, int) or not 0 <=address<2**16:
 			raise ValueError(f'`address` must be a 16 bit integer, received {repr(address)}. ')
 		data = c_uint32()
-		code = libCAENDigitizer.CAEN_DGTZ_ReadRegister(
+		code = self._library.CAEN_DGTZ_ReadRegister(
 			self._get_handle(), 
 			c_uint32(address), 
 			byref(data),
@@ -376,7 +1614,7 @@ class CAEN_DT5742_Digitizer:
 		MODES = {'sw_controlled': 0, 'in_controlled': 1, 'first_trg_controlled': 2}
 		if mode not in MODES:
 			raise ValueError(f'`mode` must be one of {set(MODES.keys())}, received {repr(mode)}. ')
-		code = libCAENDigitizer.CAEN_DGTZ_SetAcquisitionMode(
+		code = self._library.CAEN_DGTZ_SetAcquisitionMode(
 			self._get_handle(), 
 			c_long(MODES[mode]),
 		)
@@ -385,7 +1623,7 @@ class CAEN_DT5742_Digitizer:
 	def get_info(self)->dict:
 		"""Get information related to the board such as serial number, etc."""
 		info = BoardInfo()
-		code = libCAENDigitizer.CAEN_DGTZ_GetInfo(
+		code = self._library.CAEN_DGTZ_GetInfo(
 			self._get_handle(), 
 			byref(info)
 		)
@@ -394,35 +1632,65 @@ class CAEN_DT5742_Digitizer:
 
 	def _allocateEvent(self):
 		"""Allocate space in memory for the event object."""
-		code = libCAENDigitizer.CAEN_DGTZ_AllocateEvent(
+		code = self._library.CAEN_DGTZ_AllocateEvent(
 			self._get_handle(), 
 			self.eventVoidPointer
 		)
 		check_error_code(code)
 
-	def _mallocBuffer(self):
-		"""Allocate space in memory for the events' block transfer."""
-		code = libCAENDigitizer.CAEN_DGTZ_MallocReadoutBuffer(
+	def _mallocBuffer(self, buffer=None, allocated_size=None):
+		"""Allocate space in memory for the events' block transfer. By
+		default it is allocated in `self.eventBuffer`, other `POINTER(c_char)`
+		and `c_uint32` objects can be given in `buffer` and `allocated_size`."""
+		code = self._library.CAEN_DGTZ_MallocReadoutBuffer(
 			self._get_handle(), 
-			byref(self.eventBuffer),
-			byref(self.eventAllocatedSize)
+			byref(self.eventBuffer if buffer is None else buffer),
+			byref(self.eventAllocatedSize if allocated_size is None else allocated_size)
 		)
 		check_error_code(code)
 
 	def _freeEvent(self):
 		"""Free memory that was allocated for the event object."""
 		ptr = cast(pointer(self.eventObject), POINTER(c_void_p))
-		code = libCAENDigitizer.CAEN_DGTZ_FreeEvent(
+		code = self._library.CAEN_DGTZ_FreeEvent(
 			self._get_handle(), 
 			ptr
 		)
 		check_error_code(code)
 
-	def _freeBuffer(self):
-		"""Free memory that was allocated for the events' block transfer."""
-		code = libCAENDigitizer.CAEN_DGTZ_FreeReadoutBuffer(byref(self.eventBuffer))
+	def _freeBuffer(self, buffer=None):
+		"""Free memory that was allocated for the events' block transfer,
+		by default `self.eventBuffer`."""
+		code = self._library.CAEN_DGTZ_FreeReadoutBuffer(byref(self.eventBuffer if buffer is None else buffer))
 		check_error_code(code)
 
+	def _allocate_readout_memory(self):
+		"""Allocate the event object and the buffer for the block transfers,
+		unless they are already allocated. Note that the size of the
+		buffer depends on the configuration of the digitizer (record 
+		length, number of events per block transfer, etc.) so it has to
+		be allocated after configuring it."""
+		if self._readout_memory_allocated == True:
+			return
+		self._allocateEvent()
+		try:
+			self._mallocBuffer()
+		except:
+			self._freeEvent()
+			raise
+		self._readout_memory_allocated = True
+	
+	def _free_readout_memory(self):
+		"""Free the memory allocated by `_allocate_readout_memory`, if
+		it is allocated."""
+		if self._readout_memory_allocated == False:
+			return
+		self._readout_memory_allocated = False
+		try:
+			self._freeEvent()
+		finally:
+			self._freeBuffer()
+	
 	def set_max_num_events_BLT(self, numEvents):
 		"""Max number of events per block transfer. Minimum is 1, maximum
 		is 1023. It's recommended to set it to the maximum allowed value 
@@ -435,11 +1703,23 @@ class CAEN_DT5742_Digitizer:
 		This is a wrapper of the method `CAEN_DGTZ_SetMaxNumEventsBLT`
 		from the CAENDigitizer library.
 		"""
-		code = libCAENDigitizer.CAEN_DGTZ_SetMaxNumEventsBLT(
+		code = self._library.CAEN_DGTZ_SetMaxNumEventsBLT(
 			self._get_handle(),
 			c_uint32(numEvents)
 		)
 		check_error_code(code)
+		self._configuration_cache.pop('max_num_events_BLT', None) # The digitizer may limit the value, so it has to be read back.
+	
+	def get_max_num_events_BLT(self)->int:
+		"""Get the max number of events per block transfer, see `set_max_num_events_BLT`."""
+		numEvents = c_uint32()
+		code = self._library.CAEN_DGTZ_GetMaxNumEventsBLT(
+			self._get_handle(),
+			byref(numEvents)
+		)
+		check_error_code(code)
+		self._configuration_cache['max_num_events_BLT'] = int(numEvents.value)
+		return self._configuration_cache['max_num_events_BLT']
 
 	def get_acquisition_status(self) -> dict:
 		"""Reads and returns the 'Acquisition Status' register.
@@ -485,22 +1765,24 @@ class CAEN_DT5742_Digitizer:
 		"""
 		if not isinstance(enabled, bool):
 			raise TypeError(f'`enabled` must be of type {repr(bool)}, received object of type {repr(type(enabled))} instead.')
-		code = libCAENDigitizer.CAEN_DGTZ_SetFastTriggerMode(
+		code = self._library.CAEN_DGTZ_SetFastTriggerMode(
 			self._get_handle(), 
 			c_long(0 if enabled == False else 1)
 		)
 		check_error_code(code)
+		self._configuration_cache['fast_trigger_mode'] = enabled
 	
 	def get_fast_trigger_mode(self):
 		"""Get the status (enabled or disabled) of the TRn as the local 
 		trigger in the x742 series."""
 		status = c_long()
-		code = libCAENDigitizer.CAEN_DGTZ_GetFastTriggerMode(
+		code = self._library.CAEN_DGTZ_GetFastTriggerMode(
 			self._get_handle(), 
 			byref(status)
 		)
 		check_error_code(code)
-		return int(status.value) == 1
+		self._configuration_cache['fast_trigger_mode'] = int(status.value) == 1
+		return self._configuration_cache['fast_trigger_mode']
 
 	def set_fast_trigger_digitizing(self, enabled:bool):
 		"""Regarding the x742 series, enables/disables (set) the presence
@@ -513,7 +1795,7 @@ class CAEN_DT5742_Digitizer:
 		"""
 		if not isinstance(enabled, bool):
 			raise TypeError(f'`enabled` must be of type {repr(bool)}, received object of type {repr(type(enabled))} instead.')
-		code = libCAENDigitizer.CAEN_DGTZ_SetFastTriggerDigitizing(
+		code = self._library.CAEN_DGTZ_SetFastTriggerDigitizing(
 			self._get_handle(), 
 			c_long(0 if enabled == False else 1)
 		)
@@ -541,7 +1823,7 @@ class CAEN_DT5742_Digitizer:
 			if not isinstance(V, (int,float)) or not -1 <= V <= 1:
 				raise ValueError('`V` must be a float between -1 and 1.')
 			DAC = int((V+1)/2*(2**16-1))
-		code = libCAENDigitizer.CAEN_DGTZ_SetGroupFastTriggerDCOffset(
+		code = self._library.CAEN_DGTZ_SetGroupFastTriggerDCOffset(
 			self._get_handle(), 
 			c_uint32(0), # This is for the 'group', not sure what it is but it is always 0 for us.
 			c_uint32(DAC)
@@ -558,7 +1840,7 @@ class CAEN_DT5742_Digitizer:
 		"""
 		if not isinstance(threshold, int) or not 0 <= threshold < 2**16:
 			raise ValueError(f'`threshold` must be an integer number between 0 and 2**16-1.')
-		code = libCAENDigitizer.CAEN_DGTZ_SetGroupFastTriggerThreshold(
+		code = self._library.CAEN_DGTZ_SetGroupFastTriggerThreshold(
 			self._get_handle(), 
 			c_uint32(0), # This is for the 'group', not sure what it is but it is always 0 for us.
 			c_uint32(threshold)
@@ -578,11 +1860,12 @@ class CAEN_DT5742_Digitizer:
 		"""
 		if not isinstance(percentage, int) or not 0 <= percentage <= 100:
 			raise ValueError(f'`percentage` must be an integer number between 0 and 100.')
-		code = libCAENDigitizer.CAEN_DGTZ_SetPostTriggerSize(
+		code = self._library.CAEN_DGTZ_SetPostTriggerSize(
 			self._get_handle(), 
 			c_uint32(percentage),
 		)
 		check_error_code(code)
+		self._configuration_cache.pop('post_trigger_size', None) # The digitizer may round the value, so it has to be read back.
 	
 	def get_post_trigger_size(self)->int:
 		"""Get the 'post trigger size', i.e. the position of the trigger
@@ -596,12 +1879,13 @@ class CAEN_DT5742_Digitizer:
 			the beginning.
 		"""
 		percentage = c_uint32()
-		code = libCAENDigitizer.CAEN_DGTZ_GetPostTriggerSize(
+		code = self._library.CAEN_DGTZ_GetPostTriggerSize(
 			self._get_handle(), 
 			byref(percentage),
 		)
 		check_error_code(code)
-		return int(percentage.value)
+		self._configuration_cache['post_trigger_size'] = int(percentage.value)
+		return self._configuration_cache['post_trigger_size']
 
 	def set_record_length(self, length:int):
 		"""Set how many samples should be taken for each event.
@@ -610,11 +1894,12 @@ class CAEN_DT5742_Digitizer:
 		length: int
 			The size of the record (in samples).
 		"""
-		code = libCAENDigitizer.CAEN_DGTZ_SetRecordLength(
+		code = self._library.CAEN_DGTZ_SetRecordLength(
 			self._get_handle(), 
 			c_uint32(length),
 		)
 		check_error_code(code)
+		self._configuration_cache.pop('record_length', None) # The digitizer may round the value, so it has to be read back.
 
 	def set_ext_trigger_input_mode(self, mode:str):
 		"""Enable or disable the external trigger (TRIG IN).
@@ -627,7 +1912,7 @@ class CAEN_DT5742_Digitizer:
 		"""
 		if mode not in CAEN_DGTZ_TriggerMode:
 			raise ValueError(f'`mode` must be one of {set(CAEN_DGTZ_TriggerMode.keys())}, received {repr(mode)}. ')
-		code = libCAENDigitizer.CAEN_DGTZ_SetExtTriggerInputMode(
+		code = self._library.CAEN_DGTZ_SetExtTriggerInputMode(
 			self._get_handle(), 
 			c_long(CAEN_DGTZ_TriggerMode[mode])
 		)
@@ -646,7 +1931,7 @@ class CAEN_DT5742_Digitizer:
 		EDGE_VALUES = {'rising','falling'}
 		if edge not in EDGE_VALUES:
 			raise ValueError(f'`edge` must be one of {EDGE_VALUES}, received {repr(edge)}. ')
-		code = libCAENDigitizer.CAEN_DGTZ_SetTriggerPolarity(
+		code = self._library.CAEN_DGTZ_SetTriggerPolarity(
 			self._get_handle(), 
 			c_uint32(channel), 
 			c_long(0 if edge == 'rising' else 1),
@@ -666,31 +1951,34 @@ class CAEN_DT5742_Digitizer:
 		FREQUENCY_VALUES = CAEN_DGTZ_DRS4Frequency_MEGA_HERTZ
 		if MHz not in FREQUENCY_VALUES:
 			raise ValueError(f'`MHz` must be one of {set(FREQUENCY_VALUES.keys())}, received {repr(MHz)}. ')
-		code = libCAENDigitizer.CAEN_DGTZ_SetDRS4SamplingFrequency(
+		code = self._library.CAEN_DGTZ_SetDRS4SamplingFrequency(
 			self._get_handle(), 
 			c_long(FREQUENCY_VALUES[MHz]),
 		)
 		check_error_code(code)
+		self._configuration_cache['sampling_frequency_MHz'] = MHz
 	
 	def get_sampling_frequency(self) -> int:
 		"""Returns the sampling frequency as an integer number in mega Hertz."""
 		freq = c_long()
-		code = libCAENDigitizer.CAEN_DGTZ_GetDRS4SamplingFrequency(
+		code = self._library.CAEN_DGTZ_GetDRS4SamplingFrequency(
 			self._get_handle(), 
 			byref(freq),
 		)
 		check_error_code(code)
-		return {code: MHz for MHz,code in CAEN_DGTZ_DRS4Frequency_MEGA_HERTZ.items()}[int(freq.value)]
+		self._configuration_cache['sampling_frequency_MHz'] = {code: MHz for MHz,code in CAEN_DGTZ_DRS4Frequency_MEGA_HERTZ.items()}[int(freq.value)]
+		return self._configuration_cache['sampling_frequency_MHz']
 	
 	def get_record_length(self) -> int:
 		"""Returns the record length."""
 		record_length = c_long()
-		code = libCAENDigitizer.CAEN_DGTZ_GetRecordLength(
+		code = self._library.CAEN_DGTZ_GetRecordLength(
 			self._get_handle(),
 			byref(record_length),
 		)
 		check_error_code(code)
-		return int(record_length.value)
+		self._configuration_cache['record_length'] = int(record_length.value)
+		return self._configuration_cache['record_length']
 	
 	def enable_channels(self, group_1:bool, group_2:bool):
 		"""Set which groups to enable and/or disable.
@@ -705,11 +1993,30 @@ class CAEN_DT5742_Digitizer:
 		mask = 0
 		for i,group in enumerate([group_1, group_2]):
 			mask |= (1 if group else 0) << i
-		code = libCAENDigitizer.CAEN_DGTZ_SetGroupEnableMask(
+		code = self._library.CAEN_DGTZ_SetGroupEnableMask(
 			self._get_handle(), 
 			c_uint32(mask),
 		)
 		check_error_code(code)
+		self._configuration_cache['enabled_channels'] = dict(group_1=bool(group_1), group_2=bool(group_2))
+	
+	def get_enabled_channels(self)->dict:
+		"""Get which groups are enabled.
+		
+		Returns
+		-------
+		enabled_channels: dict
+			A dictionary of the form `{'group_1': bool, 'group_2': bool}`,
+			see `enable_channels`.
+		"""
+		mask = c_uint32()
+		code = self._library.CAEN_DGTZ_GetGroupEnableMask(
+			self._get_handle(), 
+			byref(mask),
+		)
+		check_error_code(code)
+		self._configuration_cache['enabled_channels'] = dict(group_1=bool(mask.value & 1), group_2=bool(mask.value & 2))
+		return dict(self._configuration_cache['enabled_channels'])
 
 	def set_channel_DC_offset(self, channel:int, DAC:int=None, V:float=None):
 		"""
@@ -736,7 +2043,7 @@ class CAEN_DT5742_Digitizer:
 			if not isinstance(V, (int,float)) or not -1 <= V <= 1:
 				raise ValueError('`V` must be a float between -1 and 1.')
 			DAC = int((V+1)/2*(2**16-1))
-		code = libCAENDigitizer.CAEN_DGTZ_SetChannelDCOffset(
+		code = self._library.CAEN_DGTZ_SetChannelDCOffset(
 			self._get_handle(), 
 			c_uint32(channel), 
 			c_uint32(DAC),
@@ -754,7 +2061,7 @@ class CAEN_DT5742_Digitizer:
 		if not isinstance(channel, int) or not 0 <= channel < 16:
 			raise ValueError(f'`channel` must be 0, 1, ..., 15, received {repr(channel)}. ')
 		value = c_uint32(0)
-		code = libCAENDigitizer.CAEN_DGTZ_GetChannelDCOffset(
+		code = self._library.CAEN_DGTZ_GetChannelDCOffset(
 			self._get_handle(), 
 			c_uint32(channel), 
 			byref(value),
@@ -764,38 +2071,41 @@ class CAEN_DT5742_Digitizer:
 
 	def _start_acquisition(self):
 		"""Start the acquisition in the board. The RUN LED will turn on."""
-		code = libCAENDigitizer.CAEN_DGTZ_SWStartAcquisition(self._get_handle())
+		code = self._library.CAEN_DGTZ_SWStartAcquisition(self._get_handle())
 		check_error_code(code)
 
 	def _stop_acquisition(self):
 		"""Stop the acquisition. The RUN LED will turn off."""
-		code = libCAENDigitizer.CAEN_DGTZ_SWStopAcquisition(self._get_handle())
+		code = self._library.CAEN_DGTZ_SWStopAcquisition(self._get_handle())
 		check_error_code(code)
 
-	def _ReadData(self):
-		"""Reads data from the digitizer into the computer."""
-		code = libCAENDigitizer.CAEN_DGTZ_ReadData(
+	def _ReadData(self, buffer=None, buffer_size=None):
+		"""Reads data from the digitizer into the computer. By default
+		the data goes into `self.eventBuffer` and its size into `self.eventBufferSize`,
+		other buffer (allocated with `_mallocBuffer`) and `c_uint32` can
+		be given in `buffer` and `buffer_size`."""
+		code = self._library.CAEN_DGTZ_ReadData(
 			self._get_handle(), 
 			c_long(0), 
-			self.eventBuffer,
-			byref(self.eventBufferSize)
+			self.eventBuffer if buffer is None else buffer,
+			byref(self.eventBufferSize if buffer_size is None else buffer_size)
 		)
 		check_error_code(code)
 
-	def _GetNumEvents(self):
+	def _GetNumEvents(self, buffer=None, buffer_size=None):
 		"""Get the number of events contained in the last block transfer
-		initiated."""
+		initiated, or in `buffer` if given (see `_ReadData`)."""
 		eventNumber = c_uint32()
-		code = libCAENDigitizer.CAEN_DGTZ_GetNumEvents(
+		code = self._library.CAEN_DGTZ_GetNumEvents(
 			self._get_handle(),
-			self.eventBuffer, 
-			self.eventBufferSize,
+			self.eventBuffer if buffer is None else buffer, 
+			self.eventBufferSize if buffer_size is None else buffer_size,
 			byref(eventNumber)
 		)
 		check_error_code(code)
 		return eventNumber.value
 
-	def _GetEventInfo(self, n_event:int):
+	def _GetEventInfo(self, n_event:int, buffer=None, buffer_size=None):
 		"""Fill the eventInfo object declared in __init__ with stats from
 		the i-th event in the buffer (and thus from the last block transfer).
 		At the end of this function eventPointer will point to the i-th event.
@@ -804,11 +2114,14 @@ class CAEN_DT5742_Digitizer:
 		---------
 		n_event: int
 			Number of event to get the event info.
+		buffer, buffer_size:
+			The buffer containing the block transfer, see `_ReadData`.
+			By default `self.eventBuffer`.
 		"""
-		code = libCAENDigitizer.CAEN_DGTZ_GetEventInfo(
+		code = self._library.CAEN_DGTZ_GetEventInfo(
 			self._get_handle(), 
-			self.eventBuffer, 
-			self.eventBufferSize, 
+			self.eventBuffer if buffer is None else buffer, 
+			self.eventBufferSize if buffer_size is None else buffer_size, 
 			c_uint32(n_event),
 			byref(self.eventInfo), 
 			byref(self.eventPointer)
@@ -819,7 +2132,7 @@ class CAEN_DT5742_Digitizer:
 		"""Decode the event in eventPointer and put all data in the eventObject
 		created in __init__. eventPointer is filled by calling getEventInfo first.
 		"""
-		code = libCAENDigitizer.CAEN_DGTZ_DecodeEvent(
+		code = self._library.CAEN_DGTZ_DecodeEvent(
 			self._get_handle(), 
 			self.eventPointer, 
 			self.eventVoidPointer
@@ -838,7 +2151,7 @@ class CAEN_DT5742_Digitizer:
 		FREQUENCY_VALUES = CAEN_DGTZ_DRS4Frequency_MEGA_HERTZ
 		if MHz not in FREQUENCY_VALUES:
 			raise ValueError(f'`MHz` must be one of {set(FREQUENCY_VALUES.keys())}, received {repr(MHz)}. ')
-		code = libCAENDigitizer.CAEN_DGTZ_LoadDRS4CorrectionData(
+		code = self._library.CAEN_DGTZ_LoadDRS4CorrectionData(
 			self._get_handle(), 
 			c_long(FREQUENCY_VALUES[MHz])
 		)
@@ -853,12 +2166,12 @@ class CAEN_DT5742_Digitizer:
 		if not isinstance(enable, bool):
 			raise ValueError(f'`enable` must be an instance of {repr(bool)}, received object of type {repr(type(enable))}.')
 		if enable == True:
-			code = libCAENDigitizer.CAEN_DGTZ_EnableDRS4Correction(self._get_handle())
+			code = self._library.CAEN_DGTZ_EnableDRS4Correction(self._get_handle())
 		else:
-			code = libCAENDigitizer.CAEN_DGTZ_DisableDRS4Correction(self._get_handle())
+			code = self._library.CAEN_DGTZ_DisableDRS4Correction(self._get_handle())
 		check_error_code(code)
 	
-	def get_waveforms(self, get_time:bool=True, get_ADCu_instead_of_volts:bool=False):
+	def get_waveforms(self, get_time:bool=True, get_ADCu_instead_of_volts:bool=False, columnar:bool=False, time_as_t0_and_dt:bool=False, dtype=numpy.float64, overflow_as_mask:bool=False):
 		"""Reads all the data from the digitizer into the computer and parses
 		it, returning a human friendly data structure with the waveforms.
 		
@@ -876,16 +2189,35 @@ class CAEN_DT5742_Digitizer:
 			returned within the `waveforms` dict. If `False`, the `'Time (s)'`
 			component is omitted. This may be useful to produce smaller
 			amounts of data to store.
+		time_as_t0_and_dt: bool, default False
+			If `True` (and `get_time` is `True`), the `'Time (s)'` array
+			is replaced by the time of the first sample `'t0 (s)'` and 
+			the sampling period `'dt (s)'`, see `get_time_axis`.
 		get_ADCu_instead_of_volts: bool, default False
 			If `True` the `'Amplitude (V)'` component in the returned 
 			`waveforms` dict is replaced by an array containing the samples
 			in ADC units (i.e. 0, 1, ..., 2**N_BITS-1) and called 
 			`'Amplitude (ADCu)'`.
+		columnar: bool, default False
+			If `True`, instead of one dictionary per event all the events
+			are returned in a single "columnar batch", i.e. one array
+			with the samples of all the events and channels plus one
+			array for each of the fields of `EventInfo`. This avoids the
+			creation of many small arrays, and is much faster for large
+			numbers of events.
+		dtype: numpy dtype, default `numpy.float64`
+			Floating point type of the samples, e.g. `numpy.float32` to
+			halve the memory, or `numpy.uint16` for samples in ADC units,
+			see `decode_event_waveforms_to_python_friendly_stuff`.
+		overflow_as_mask: bool, default False
+			If `True`, the ADC overflow is given in a boolean array `'ADC overflow'`
+			instead of replacing the samples with NaN, see `decode_event_waveforms_to_python_friendly_stuff`.
 		
 		Returns
 		-------
 		events: list of dict
-			A list of dictionaries with the waveforms, of the form:
+			If `columnar` is `False`, a list of dictionaries with the 
+			waveforms, of the form:
 			```
 			single_event_waveforms[channel_name][variable]
 			```
@@ -895,39 +2227,700 @@ class CAEN_DT5742_Digitizer:
 			and additionally `'trigger_group_0'` and `'trigger_group_1'`
 			if the digitization of the trigger is enabled. In such case
 			it is automatically added in the return dictionaries.
+		batch: dict
+			If `columnar` is `True`, a dictionary of the form:
+			```
+			{
+				'channels': ('CH0', 'CH1', ..., 'trigger_group_1'), # Names of the channels, in the order of the second axis of the samples array.
+				'Amplitude (V)': numpy.array, # Shape (n_events, n_channels, record_length), or 'Amplitude (ADCu)' if `get_ADCu_instead_of_volts`.
+				'ADC overflow': numpy.array, # bool, same shape as the samples. Only if `overflow_as_mask`.
+				'Time (s)': numpy.array, # Shape (record_length,), common to all events and channels. Only if `get_time`.
+				'EventCounter': numpy.array, # Shape (n_events,).
+				'TriggerTimeTag': numpy.array, # Shape (n_events,).
+				'Pattern': numpy.array, # Shape (n_events,).
+				'BoardId': numpy.array, # Shape (n_events,).
+			}
+			```
 		"""
 		
-		self._allocateEvent()
-		self._mallocBuffer()
-		
-		self._ReadData() # Bring data from digitizer to PC.
-		
+		if self._background_readout is not None:
+			raise RuntimeError(f'The background readout is running, use `get_waveforms_from_background_readout` instead.')
+		keep_readout_memory = self._readout_memory_allocated # If it was already allocated, it is because we are within an acquisition, so it will be reused in the next call.
+		self._allocate_readout_memory()
+		try:
+			self._ReadData() # Bring data from digitizer to PC.
+			events = self._decode_readout_buffer(
+				get_time = get_time,
+				get_ADCu_instead_of_volts = get_ADCu_instead_of_volts,
+				columnar = columnar,
+				time_as_t0_and_dt = time_as_t0_and_dt,
+				dtype = dtype,
+				overflow_as_mask = overflow_as_mask,
+			)
+		finally:
+			if keep_readout_memory == False:
+				self._free_readout_memory()
+		return events
+	
+	def _decode_readout_buffer(self, get_time:bool, get_ADCu_instead_of_volts:bool, columnar:bool, time_as_t0_and_dt:bool, dtype, overflow_as_mask:bool, buffer=None, buffer_size=None, time_axis_parameters:dict=None):
+		"""Decode all the events in the readout buffer, i.e. from the last
+		block transfer, or in `buffer` if given (see `_ReadData`). The 
+		`time_axis_parameters` are taken from the digitizer unless given.
+		The other arguments and the returned object are those of `get_waveforms`."""
 		# Convert the data into something human friendly for the user, i.e. all the ugly stuff is happening below...
-		n_events = self._GetNumEvents()
-		events = []
-		pointer_to_event = POINTER(Event)()
+		n_events = self._GetNumEvents(buffer, buffer_size)
+		if get_time == False:
+			time_axis_parameters = None
+		elif time_axis_parameters is None:
+			time_axis_parameters = self._get_time_axis_parameters()
+		try:
+			batch = self._decode_events_into_columnar_batch( # All the samples of the block are processed at once, also when one dict per event is requested.
+				n_events = n_events,
+				ADC_peak_to_peak_dynamic_range_volts = 1 if get_ADCu_instead_of_volts==False else None,
+				time_axis_parameters = time_axis_parameters,
+				time_as_t0_and_dt = time_as_t0_and_dt,
+				dtype = dtype,
+				overflow_as_mask = overflow_as_mask,
+				buffer = buffer,
+				buffer_size = buffer_size,
+			)
+		except _DifferentRecordLengths:
+			if columnar == True:
+				raise
+			# The dictionaries can hold channels with different number of samples, so decode each event on its own.
+			events = []
+			for n_event in range(n_events):
+				self._GetEventInfo(n_event, buffer, buffer_size) # Put the "header info" of event number `n_event` inside `self.eventInfo`, which was created in the `__init__` method.
+				self._DecodeEvent() # Decode the event whose info was get by the previous line, and place the decoded event info in `self.eventObject`, which was created in the `__init__` method.
+				events.append(
+					decode_event_waveforms_to_python_friendly_stuff(
+						self.eventObject.contents,
+						ADC_peak_to_peak_dynamic_range_volts = 1 if get_ADCu_instead_of_volts==False else None,
+						time_axis_parameters = time_axis_parameters,
+						time_as_t0_and_dt = time_as_t0_and_dt,
+						dtype = dtype,
+						overflow_as_mask = overflow_as_mask,
+					)
+				)
+			return events
+		if columnar == True:
+			return batch
+		return columnar_batch_to_events(batch, copy=True) # Each event in its own memory, so keeping one of them does not keep the whole block.
+	
+	def _decode_events_into_columnar_batch(self, n_events:int, ADC_peak_to_peak_dynamic_range_volts:float=None, time_axis_parameters:dict=None, ADC_dynamic_range_margin:int=77, time_as_t0_and_dt:bool=False, dtype=numpy.float64, overflow_as_mask:bool=False, buffer=None, buffer_size=None)->dict:
+		"""Decode the `n_events` events from the last block transfer (or
+		from `buffer`, see `_ReadData`) into a columnar batch, see `get_waveforms`
+		for details. The other arguments have the same meaning as in 
+		`decode_event_waveforms_to_python_friendly_stuff`.
+		"""
+		_validate_samples_dtype(dtype, ADC_peak_to_peak_dynamic_range_volts, overflow_as_mask)
+		if not numpy.issubdtype(dtype, numpy.floating):
+			dtype_while_decoding = numpy.float32 # The samples from the library are `float32`, they are converted to `dtype` at the end in a single pass.
+		else:
+			dtype_while_decoding = dtype
+		
+		event_info = {field: numpy.empty(n_events, dtype=numpy.uint32) for field in EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH}
+		samples = numpy.empty((n_events,0,0), dtype=dtype_while_decoding) # Will be allocated once the first event tells us the number of channels and the record length.
+		start_index_cell = numpy.empty((n_events,0), dtype=numpy.uint16)
+		channels = []
 		for n_event in range(n_events):
-			self._GetEventInfo(n_event) # Put the "header info" of event number `n_event` inside `self.eventInfo`, which was created in the `__init__` method.
-			self._DecodeEvent() # Decode the event whose info was get by the previous line, and place the decoded event info in `self.eventObject`, which was created in the `__init__` method.
-			event = self.eventObject.contents # The decoded event. Unfortunately, this still has lots of pointers to the temporary buffer so it is not persistent, we cannot return this. And I still don't know how to properly create a copy of this into my own memory block without processing each waveform individually.
+			self._GetEventInfo(n_event, buffer, buffer_size)
+			self._DecodeEvent()
+			event = self.eventObject.contents
 			
-			event_waveforms = decode_event_waveforms_to_python_friendly_stuff(
-				event,
-				ADC_peak_to_peak_dynamic_range_volts = 1 if get_ADCu_instead_of_volts==False else None,
-				time_axis_parameters = dict(
-					sampling_frequency = self.get_sampling_frequency()*1e6,
-					post_trigger_size = self.get_post_trigger_size(),
-					fast_trigger_mode = self.get_fast_trigger_mode(),
-				) if get_time else None,
+			if n_event == 0:
+				channels = _channels_present_in_event(event)
+				record_length = event.DataGroup[channels[0][1]].ChSize[channels[0][2]] if len(channels) > 0 else 0
+				samples = numpy.empty((n_events, len(channels), record_length), dtype=dtype_while_decoding) # One single allocation for the whole block.
+				start_index_cell = numpy.empty((n_events, len(channels)), dtype=numpy.uint16)
+			
+			for n_channel_in_batch, (n_channel, n_group, n_channel_within_group) in enumerate(channels):
+				block = event.DataGroup[n_group]
+				if block.ChSize[n_channel_within_group] != record_length:
+					raise _DifferentRecordLengths(f'Channel {CHANNELS_NAMES[n_channel]} of event {n_event} has {block.ChSize[n_channel_within_group]} samples, but {record_length} were expected. All the channels in all the events must have the same number of samples to be decoded into a columnar batch.')
+				samples[n_event,n_channel_in_batch,:] = _view_channel_samples(block, n_channel_within_group)
+				start_index_cell[n_event,n_channel_in_batch] = block.StartIndexCell
+			for field in EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH:
+				event_info[field][n_event] = getattr(self.eventInfo, field)
+		
+		return _finish_columnar_batch(
+			samples = samples,
+			channels = tuple(CHANNELS_NAMES[n_channel] for n_channel,_,_ in channels),
+			event_info = event_info,
+			start_index_cell = start_index_cell,
+			ADC_peak_to_peak_dynamic_range_volts = ADC_peak_to_peak_dynamic_range_volts,
+			time_axis_parameters = time_axis_parameters,
+			ADC_dynamic_range_margin = ADC_dynamic_range_margin,
+			time_as_t0_and_dt = time_as_t0_and_dt,
+			dtype = dtype,
+			overflow_as_mask = overflow_as_mask,
+		)
+	
+	def start_background_readout(self, n_blocks:int=64, poll_interval_seconds:float=.005):
+		"""Start a thread that does nothing but transferring the data from
+		the digitizer into a ring of `n_blocks` preallocated buffers, so
+		the memory of the digitizer keeps being emptied while your program
+		is busy doing other things, e.g. decoding or writing to disk. 
+		The data is then obtained with `get_waveforms_from_background_readout`.
+		
+		The acquisition has to be running. The thread is stopped with
+		`stop_background_readout`, which is automatically called by
+		`stop_acquisition` (and thus when exiting the `with` block). The
+		blocks that were not yet obtained at that moment are discarded.
+		
+		Usage example
+		-------------
+		```
+		with digitizer:
+			digitizer.start_background_readout()
+			while still_want_more_events:
+				events = digitizer.get_waveforms_from_background_readout(timeout_seconds=1)
+				# Do something with `events`...
+			print(digitizer.background_readout_stats)
+		```
+		
+		Arguments
+		---------
+		n_blocks: int, default 64
+			Number of buffers in the ring, each of them holds one block
+			transfer (see `set_max_num_events_BLT`). If all of them are 
+			full the thread waits until one is freed by `get_waveforms_from_background_readout`,
+			meanwhile the events accumulate in the memory of the digitizer.
+			Each time this happens it is counted in `background_readout_stats`.
+		poll_interval_seconds: float, default .005
+			Time to wait before asking the digitizer again when there
+			are no events to read.
+		"""
+		if self._background_readout is not None:
+			raise RuntimeError(f'The background readout is already running.')
+		if not isinstance(n_blocks, int) or n_blocks < 1:
+			raise ValueError(f'`n_blocks` must be a positive integer, received {repr(n_blocks)}. ')
+		if not isinstance(poll_interval_seconds, (int,float)) or poll_interval_seconds < 0:
+			raise ValueError(f'`poll_interval_seconds` must be a positive number, received {repr(poll_interval_seconds)}. ')
+		if self.get_acquisition_status()['acquiring now'] == False:
+			raise RuntimeError(f'The digitizer is not acquiring, call `start_acquisition` before starting the background readout.')
+		
+		readout = _BackgroundReadout(n_blocks)
+		try:
+			for n_slot in range(n_blocks):
+				self._mallocBuffer(readout.buffers[n_slot], readout.allocated_sizes[n_slot])
+				readout.n_allocated_buffers += 1
+				readout.free_slots.put(n_slot)
+		except:
+			self._free_background_readout_buffers(readout)
+			raise
+		readout.thread = threading.Thread(
+			target = self._background_readout_loop,
+			args = (readout, poll_interval_seconds),
+			daemon = True,
+		)
+		self._background_readout = readout
+		readout.thread.start()
+	
+	def stop_background_readout(self):
+		"""Stop the thread started by `start_background_readout` and release
+		its memory. The blocks that were not yet obtained with `get_waveforms_from_background_readout`
+		are discarded. If the background readout is not running, nothing
+		is done."""
+		readout = self._background_readout
+		if readout is None:
+			return
+		readout.stop.set()
+		readout.thread.join()
+		self._background_readout = None
+		self._free_background_readout_buffers(readout)
+	
+	def _free_background_readout_buffers(self, readout:_BackgroundReadout):
+		for buffer in readout.buffers[:readout.n_allocated_buffers]:
+			self._freeBuffer(buffer)
+		readout.n_allocated_buffers = 0
+	
+	def _background_readout_loop(self, readout:_BackgroundReadout, poll_interval_seconds:float):
+		"""This is what runs in the background readout thread."""
+		try:
+			while not readout.stop.is_set():
+				try:
+					n_slot = readout.free_slots.get_nowait()
+				except queue.Empty:
+					with readout.stats_lock:
+						readout.stats['ring full'] += 1
+					while not readout.stop.is_set():
+						try:
+							n_slot = readout.free_slots.get(timeout=poll_interval_seconds)
+							break
+						except queue.Empty:
+							continue
+					else:
+						break
+				
+				status = self.get_acquisition_status()
+				if status['events memory is full'] == True:
+					with readout.stats_lock:
+						readout.stats['digitizer memory full'] += 1
+				if status['at least one event available for readout'] == False:
+					readout.free_slots.put(n_slot)
+					readout.stop.wait(poll_interval_seconds)
+					continue
+				
+				self._ReadData(readout.buffers[n_slot], readout.buffer_sizes[n_slot])
+				n_events = self._GetNumEvents(readout.buffers[n_slot], readout.buffer_sizes[n_slot])
+				if n_events == 0:
+					readout.free_slots.put(n_slot)
+					continue
+				with readout.stats_lock:
+					readout.stats['blocks read'] += 1
+					readout.stats['events read'] += n_events
+				readout.filled_slots.put(n_slot)
+		except Exception as e:
+			readout.exception = e
+	
+	@property
+	def background_readout_stats(self)->dict:
+		"""Statistics of the background readout, see `start_background_readout`.
+		
+		Returns
+		-------
+		stats: dict
+			A dictionary of the form:
+			```
+			{
+				'blocks read': int, # Number of block transfers from the digitizer.
+				'events read': int, # Number of events in those block transfers.
+				'ring full': int, # Number of times that the thread had to wait because all the buffers in the ring were full.
+				'digitizer memory full': int, # Number of times that the memory of the digitizer was found full, so events may have been lost.
+				'blocks pending': int, # Number of blocks in the ring waiting to be obtained with `get_waveforms_from_background_readout`.
+			}
+			```
+		"""
+		readout = self._background_readout
+		if readout is None:
+			raise RuntimeError(f'The background readout is not running.')
+		with readout.stats_lock:
+			stats = dict(readout.stats)
+		stats['blocks pending'] = readout.filled_slots.qsize()
+		return stats
+	
+	def _get_filled_background_readout_slots(self, timeout_seconds:float, max_slots:int=None)->list:
+		"""Take the filled buffers out of the ring of the background readout,
+		waiting at most `timeout_seconds` for the first one. Returns a 
+		list with their indices, which have to be put back into `free_slots`
+		after use."""
+		readout = self._background_readout
+		if readout is None:
+			raise RuntimeError(f'The background readout is not running, call `start_background_readout` first.')
+		if not isinstance(timeout_seconds, (int,float)) or timeout_seconds < 0:
+			raise ValueError(f'`timeout_seconds` must be a positive number, received {repr(timeout_seconds)}. ')
+		slots = []
+		try:
+			slots.append(readout.filled_slots.get(timeout=timeout_seconds) if timeout_seconds > 0 else readout.filled_slots.get_nowait())
+			while max_slots is None or len(slots) < max_slots:
+				slots.append(readout.filled_slots.get_nowait())
+		except queue.Empty:
+			pass
+		if len(slots) == 0 and readout.exception is not None:
+			raise RuntimeError(f'The background readout thread has stopped because of an error.') from readout.exception
+		return slots
+	
+	def get_waveforms_from_background_readout(self, timeout_seconds:float=0, get_time:bool=True, get_ADCu_instead_of_volts:bool=False, columnar:bool=False, time_as_t0_and_dt:bool=False, dtype=numpy.float64, overflow_as_mask:bool=False):
+		"""Decode all the blocks that were transferred by the background
+		readout (see `start_background_readout`) and not yet obtained, 
+		and free their buffers so they can be used again.
+		
+		Arguments
+		---------
+		timeout_seconds: float, default 0
+			If there are no blocks available, wait at most this time for
+			the first one to arrive. If none arrives, no events are returned.
+		get_time, get_ADCu_instead_of_volts, columnar, time_as_t0_and_dt, dtype, overflow_as_mask:
+			Same as in `get_waveforms`.
+		
+		Returns
+		-------
+		events: list of dict or dict
+			Same as `get_waveforms`, containing the events of all the
+			blocks in the order in which they were read.
+		"""
+		readout = self._background_readout
+		if readout is None:
+			raise RuntimeError(f'The background readout is not running, call `start_background_readout` first.')
+		
+		slots = self._get_filled_background_readout_slots(timeout_seconds)
+		decoded_blocks = []
+		try:
+			for n_slot in slots:
+				decoded_blocks.append(
+					self._decode_readout_buffer(
+						get_time = get_time,
+						get_ADCu_instead_of_volts = get_ADCu_instead_of_volts,
+						columnar = columnar,
+						time_as_t0_and_dt = time_as_t0_and_dt,
+						dtype = dtype,
+						overflow_as_mask = overflow_as_mask,
+						buffer = readout.buffers[n_slot],
+						buffer_size = readout.buffer_sizes[n_slot],
+					)
+				)
+		finally:
+			for n_slot in slots:
+				readout.free_slots.put(n_slot)
+		
+		if columnar == True:
+			if len(decoded_blocks) == 0:
+				return self._decode_events_into_columnar_batch(
+					n_events = 0,
+					time_axis_parameters = self._get_time_axis_parameters() if get_time else None,
+					ADC_peak_to_peak_dynamic_range_volts = 1 if get_ADCu_instead_of_volts==False else None,
+					time_as_t0_and_dt = time_as_t0_and_dt,
+					dtype = dtype,
+					overflow_as_mask = overflow_as_mask,
+				)
+			return concatenate_columnar_batches(decoded_blocks)
+		return [event for events in decoded_blocks for event in events]
+	
+	def stream(self, max_events:int=None, max_seconds:float=None, get_time:bool=True, get_ADCu_instead_of_volts:bool=False, columnar:bool=False, time_as_t0_and_dt:bool=False, dtype=numpy.float64, overflow_as_mask:bool=False, background_readout:bool=False, DRS4_correction:bool=True, features:dict=None):
+		"""Starts an acquisition and yields the events as they are read
+		from the digitizer, one batch at a time, until any of `max_events`
+		or `max_seconds` is reached or until you stop iterating. The 
+		acquisition is always stopped at the end, also if you `break`
+		the loop or an error happens.
+		
+		The time between consecutive reads adapts to the observed trigger
+		rate, such that at high rates each read brings about half of
+		`max_num_events_BLT` events and at low rates the events are
+		yielded shortly after they arrive.
+		
+		Usage example
+		-------------
+		```
+		for events in digitizer.stream(max_events=2222):
+			do_something(events)
+		print(digitizer.stream_stats)
+		```
+		
+		Arguments
+		---------
+		max_events: int, default None
+			Stop after at least this number of events were yielded. 
+			Note that the last batch is yielded complete, so the total
+			number of events can be larger. `None` means no limit.
+		max_seconds: float, default None
+			Stop after this time. `None` means no limit.
+		get_time, get_ADCu_instead_of_volts, columnar, time_as_t0_and_dt, dtype, overflow_as_mask:
+			Same as in `get_waveforms`.
+		background_readout: bool, default False
+			If `True`, the data is transferred from the digitizer by
+			the background readout thread, see `start_background_readout`.
+		DRS4_correction: bool, default True
+			Same as in `start_acquisition`.
+		features: dict, optional
+			If given, instead of the waveforms yield the features computed
+			by `extract_features` with these arguments, e.g. `dict(polarity='negative')`.
+			The waveforms are then always decoded in volts, with time,
+			into a columnar batch, and `get_time`, `get_ADCu_instead_of_volts`
+			and `columnar` are ignored.
+		
+		Yields
+		------
+		events: list of dict or dict
+			The events of each read, same as `get_waveforms`, or the 
+			features if `features` is given. Reads that bring no events
+			are not yielded.
+		"""
+		if features is not None:
+			get_time, get_ADCu_instead_of_volts, columnar = True, False, True
+		for buffer,buffer_size,_ in self._stream_reads(max_events=max_events, max_seconds=max_seconds, background_readout=background_readout, DRS4_correction=DRS4_correction):
+			events = self._decode_readout_buffer(
+				get_time = get_time,
+				get_ADCu_instead_of_volts = get_ADCu_instead_of_volts,
+				columnar = columnar,
+				time_as_t0_and_dt = time_as_t0_and_dt,
+				dtype = dtype,
+				overflow_as_mask = overflow_as_mask,
+				buffer = buffer,
+				buffer_size = buffer_size,
 			)
-			events.append(event_waveforms)
+			yield extract_features(events, **features) if features is not None else events
+	
+	def stream_parallel(self, max_events:int=None, max_seconds:float=None, n_workers:int=None, process=None, get_time:bool=True, get_ADCu_instead_of_volts:bool=False, time_as_t0_and_dt:bool=False, dtype=numpy.float64, overflow_as_mask:bool=False, max_blocks_in_flight:int=None, background_readout:bool=False):
+		"""Same as `stream` but the decoding is done in parallel by a pool
+		of worker processes, so the decoding is not limited by a single
+		core. This process only transfers the blocks from the digitizer
+		and copies them into shared memory, the workers decode them with
+		`decode_x742_raw_block` into columnar batches and optionally reduce
+		them with `process`, so only its result is sent back.
 		
-		self._freeEvent()
-		self._freeBuffer()
+		Note that `decode_x742_raw_block` does not apply the DRS4 correction.
 		
-		return events
+		Ordering: the results are yielded in the same order in which
+		the blocks were read from the digitizer, no matter which worker
+		finishes first, and within each block the events keep the order
+		of the digitizer. The number of events decoded from each block 
+		is checked against the one reported by the libCAENDigitizer.
+		
+		Usage example
+		-------------
+		```
+		def amplitudes(batch):
+			return batch['EventCounter'], numpy.nanmax(batch['Amplitude (V)'], axis=2)
+		
+		for event_counter, amplitude in digitizer.stream_parallel(max_events=22222, process=amplitudes):
+			do_something(event_counter, amplitude)
+		```
+		
+		Arguments
+		---------
+		max_events, max_seconds, background_readout:
+			Same as in `stream`.
+		n_workers: int, optional
+			Number of worker processes, by default one less than the
+			number of cores.
+		process: callable, optional
+			A function that receives each columnar batch in the worker
+			and returns something smaller to be sent back, e.g. some 
+			features of the waveforms. It must be picklable, i.e. defined
+			at the top level of a module. If `None`, the batches are 
+			sent back. For example `functools.partial(extract_features, polarity='negative')`
+			to obtain only the features of the waveforms.
+		get_time, get_ADCu_instead_of_volts, time_as_t0_and_dt, dtype, overflow_as_mask:
+			Same as in `get_waveforms`. The events are always decoded
+			into columnar batches.
+		max_blocks_in_flight: int, optional
+			Maximum number of blocks being decoded at the same time, 
+			each one takes a shared memory buffer. By default twice `n_workers`.
+			When reached, the reading from the digitizer waits for the
+			oldest block to be decoded.
+		
+		Yields
+		------
+		result:
+			For each block, `process(batch)` or the batch itself.
+		"""
+		if n_workers is None:
+			n_workers = max(1, (os.cpu_count() or 2)-1)
+		if not isinstance(n_workers, int) or n_workers < 1:
+			raise ValueError(f'`n_workers` must be a positive integer, received {repr(n_workers)}. ')
+		if max_blocks_in_flight is None:
+			max_blocks_in_flight = 2*n_workers
+		if not isinstance(max_blocks_in_flight, int) or max_blocks_in_flight < 1:
+			raise ValueError(f'`max_blocks_in_flight` must be a positive integer, received {repr(max_blocks_in_flight)}. ')
+		
+		ADC_peak_to_peak_dynamic_range_volts = 1 if get_ADCu_instead_of_volts==False else None
+		_validate_samples_dtype(dtype, ADC_peak_to_peak_dynamic_range_volts, overflow_as_mask)
+		pool = None
+		try:
+			for buffer,buffer_size,n_events in self._stream_reads(max_events=max_events, max_seconds=max_seconds, background_readout=background_readout, DRS4_correction=False):
+				if pool is None: # Created here because only now the acquisition has started, so the time axis is the one of this acquisition.
+					decoding_options = dict(
+						ADC_peak_to_peak_dynamic_range_volts = ADC_peak_to_peak_dynamic_range_volts,
+						time_axis_parameters = self._get_time_axis_parameters() if get_time else None,
+						time_as_t0_and_dt = time_as_t0_and_dt,
+						dtype = dtype,
+						overflow_as_mask = overflow_as_mask,
+					)
+					pool = _SharedMemoryDecodingPool(n_workers=n_workers, n_slots=max_blocks_in_flight, decoding_options=decoding_options, process=process)
+				while not pool.has_free_slot():
+					_, result = pool.pop_result(wait=True)
+					yield result
+				pool.submit(cast(buffer, POINTER(c_char*buffer_size.value)).contents, n_events=n_events)
+				while True:
+					done, result = pool.pop_result(wait=False)
+					if not done:
+						break
+					yield result
+			while pool is not None and pool.has_pending():
+				_, result = pool.pop_result(wait=True)
+				yield result
+		finally:
+			if pool is not None:
+				pool.close()
+	
+	def _stream_reads(self, max_events:int, max_seconds:float, background_readout:bool, DRS4_correction:bool):
+		"""The acquisition loop behind `stream`, see there for the arguments.
+		It yields `(buffer, buffer_size, n_events)` for each block transfer
+		that contains events, they are valid only until the next iteration."""
+		if max_events is not None and (not isinstance(max_events, int) or max_events <= 0):
+			raise ValueError(f'`max_events` must be a positive integer, received {repr(max_events)}. ')
+		if max_seconds is not None and (not isinstance(max_seconds, (int,float)) or max_seconds <= 0):
+			raise ValueError(f'`max_seconds` must be a positive number, received {repr(max_seconds)}. ')
+		MIN_POLL_INTERVAL_SECONDS = 1e-3
+		MAX_POLL_INTERVAL_SECONDS = .1
+		
+		self.start_acquisition(DRS4_correction=DRS4_correction)
+		stats = {
+			'events': 0,
+			'batches': 0,
+			'seconds': 0,
+			'average rate (events/s)': float('NaN'),
+			'poll interval (s)': MAX_POLL_INTERVAL_SECONDS,
+		}
+		self._stream_stats = stats
+		try:
+			target_events_per_read = max(1, self._acquisition_configuration['max_num_events_BLT']/2)
+			if background_readout == True:
+				self.start_background_readout(poll_interval_seconds=MIN_POLL_INTERVAL_SECONDS)
+			began = time.time()
+			last_read = began
+			rate = None # Exponential moving average of the trigger rate, in events per second.
+			while True:
+				now = time.time()
+				if max_seconds is not None and now-began >= max_seconds:
+					break
+				timeout_seconds = None if max_seconds is None else max_seconds-(now-began)
+				if background_readout == True:
+					slots = self._get_filled_background_readout_slots(
+						timeout_seconds = min(MAX_POLL_INTERVAL_SECONDS, timeout_seconds if timeout_seconds is not None else MAX_POLL_INTERVAL_SECONDS),
+						max_slots = 1,
+					)
+					if len(slots) == 0:
+						continue
+					n_slot = slots[0]
+					buffer = self._background_readout.buffers[n_slot]
+					buffer_size = self._background_readout.buffer_sizes[n_slot]
+				else:
+					self.wait_for(at_least_one_event=True, timeout_seconds=timeout_seconds, poll_interval_seconds=stats['poll interval (s)'])
+					self._ReadData()
+					buffer = self.eventBuffer
+					buffer_size = self.eventBufferSize
+				try:
+					n_events = self._GetNumEvents(buffer, buffer_size)
+					
+					now = time.time()
+					if n_events > 0:
+						this_rate = n_events/max(now-last_read, 1e-9)
+						rate = this_rate if rate is None else .7*rate + .3*this_rate
+						stats['poll interval (s)'] = min(max(target_events_per_read/rate, MIN_POLL_INTERVAL_SECONDS), MAX_POLL_INTERVAL_SECONDS)
+						last_read = now
+					stats['seconds'] = now-began
+					if n_events == 0:
+						continue
+					stats['events'] += n_events
+					stats['batches'] += 1
+					stats['average rate (events/s)'] = stats['events']/stats['seconds'] if stats['seconds'] > 0 else float('NaN')
+					
+					yield buffer, buffer_size, n_events
+				finally:
+					if background_readout == True:
+						self._background_readout.free_slots.put(n_slot)
+				
+				if max_events is not None and stats['events'] >= max_events:
+					break
+				if background_readout == False and stats['poll interval (s)'] > MIN_POLL_INTERVAL_SECONDS:
+					time.sleep(stats['poll interval (s)']) # Let the events accumulate in the digitizer, so each read brings many of them.
+		finally:
+			self.stop_acquisition()
+	
+	def capture_raw_to_file(self, path, max_events:int=None, max_seconds:float=None, background_readout:bool=False, DRS4_correction:bool=True)->dict:
+		"""Starts an acquisition and writes the block transfers from the 
+		digitizer into a file as they are, without decoding them, until
+		any of `max_events` or `max_seconds` is reached. This decouples
+		the readout speed from the (slow) decoding in Python. The file
+		can later be decoded with `decode_raw_capture`.
+		
+		Arguments
+		---------
+		path: str or Path
+			Path to the capture file, it must not exist. An index file
+			is created next to it, see `RawCaptureWriter`.
+		max_events, max_seconds, background_readout, DRS4_correction:
+			Same as in `stream`. At least one of `max_events` or `max_seconds`
+			has to be given. Note that the DRS4 correction is not applied
+			to the raw data, it is applied (or not) when decoding, but 
+			this is stored in the file to remember what was the intention.
+		
+		Returns
+		-------
+		stats: dict
+			Same as `stream_stats`.
+		"""
+		if max_events is None and max_seconds is None:
+			raise ValueError(f'At least one of `max_events` or `max_seconds` must be given, otherwise the capture would never end.')
+		configuration = self.get_configuration()
+		info = self.get_info()
+		metadata = dict(
+			idn = self.idn,
+			serial_number = info['SerialNumber'],
+			configuration = configuration,
+			DRS4_correction = DRS4_correction,
+		)
+		with RawCaptureWriter(path, metadata) as writer:
+			for buffer,buffer_size,n_events in self._stream_reads(max_events=max_events, max_seconds=max_seconds, background_readout=background_readout, DRS4_correction=DRS4_correction):
+				block = cast(buffer, POINTER(c_char*buffer_size.value)).contents # A view of the buffer, without copying it.
+				writer.write_block(block, n_events=n_events)
+		return self.stream_stats
+	
+	def decode_raw_capture(self, path, get_time:bool=True, get_ADCu_instead_of_volts:bool=False, columnar:bool=False, time_as_t0_and_dt:bool=False, dtype=numpy.float64, overflow_as_mask:bool=False):
+		"""Decode a file written by `capture_raw_to_file` using the 
+		libCAENDigitizer, yielding the events of each block. The digitizer
+		must not be acquiring. If the DRS4 correction was requested for
+		the capture, the correction tables of this digitizer are loaded
+		for the sampling frequency of the capture, so this should be 
+		the same digitizer that produced the file.
+		
+		Arguments
+		---------
+		path: str or Path
+			Path to the capture file.
+		get_time, get_ADCu_instead_of_volts, columnar, time_as_t0_and_dt, dtype, overflow_as_mask:
+			Same as in `get_waveforms`.
+		
+		Yields
+		------
+		events: list of dict or dict
+			The events of each block, same as `get_waveforms`.
+		"""
+		metadata, _ = read_raw_capture(path)
+		configuration = metadata['configuration']
+		if metadata['DRS4_correction'] == True:
+			self._LoadDRS4CorrectionData(MHz=configuration['sampling_frequency_MHz'])
+		self._DRS4_correction(enable=metadata['DRS4_correction'])
+		time_axis_parameters = dict(
+			sampling_frequency = configuration['sampling_frequency_MHz']*1e6,
+			post_trigger_size = configuration['post_trigger_size'],
+			fast_trigger_mode = configuration['fast_trigger_mode'],
+		)
+		keep_readout_memory = self._readout_memory_allocated
+		self._allocate_readout_memory() # We need the event object.
+		try:
+			for block,_ in iter_raw_capture_blocks(path):
+				buffer = create_string_buffer(block, len(block))
+				yield self._decode_readout_buffer(
+					get_time = get_time,
+					get_ADCu_instead_of_volts = get_ADCu_instead_of_volts,
+					columnar = columnar,
+					time_as_t0_and_dt = time_as_t0_and_dt,
+					dtype = dtype,
+					overflow_as_mask = overflow_as_mask,
+					buffer = cast(buffer, POINTER(c_char)),
+					buffer_size = c_uint32(len(block)),
+					time_axis_parameters = time_axis_parameters,
+				)
+		finally:
+			if keep_readout_memory == False:
+				self._free_readout_memory()
+	
+	@property
+	def stream_stats(self)->dict:
+		"""Statistics of the current (or last) call to `stream` or `capture_raw_to_file`.
+		
+		Returns
+		-------
+		stats: dict
+			A dictionary of the form:
+			```
+			{
+				'events': int, # Number of events yielded so far.
+				'batches': int, # Number of batches yielded so far.
+				'seconds': float, # Time since the stream started.
+				'average rate (events/s)': float,
+				'poll interval (s)': float, # Current time between reads.
+			}
+			```
+		"""
+		if self._stream_stats is None:
+			raise RuntimeError(f'`stream` was never called.')
+		return dict(self._stream_stats)
 	
-	def wait_for(self, at_least_one_event:bool, memory_full:bool=False, timeout_seconds:float=None):
+	def wait_for(self, at_least_one_event:bool, memory_full:bool=False, timeout_seconds:float=None, poll_interval_seconds:float=.1):
 		"""Halts the execution of the program until any of the conditions 
 		is met. Note that this means that as soon as any of the conditions
 		is met, the execution will continue.
@@ -943,6 +2936,8 @@ class CAEN_DT5742_Digitizer:
 		timeout_seconds: float, default None
 			Timeout in seconds before un-halting even if no condition is
 			met. `None` means to halt forever.
+		poll_interval_seconds: float, default .1
+			Time between consecutive checks of the conditions.
 		"""
 		if not isinstance(at_least_one_event, bool):
 			raise TypeError(f'`at_least_one_event` must be an instance of {repr(bool)}, received an object of type {repr(type(at_least_one_event))}. ')
@@ -964,7 +2959,7 @@ class CAEN_DT5742_Digitizer:
 				break
 			if memory_full==True and status['events memory is full']:
 				break
-			time.sleep(.1)
+			time.sleep(poll_interval_seconds)
 
 def __init__():
 	functions = [
@@ -980,6 +2975,7 @@ def __init__():
 		libCAENDigitizer.CAEN_DGTZ_FreeEvent,
 		libCAENDigitizer.CAEN_DGTZ_FreeReadoutBuffer,
 		libCAENDigitizer.CAEN_DGTZ_SetMaxNumEventsBLT,
+		libCAENDigitizer.CAEN_DGTZ_GetMaxNumEventsBLT,
 		libCAENDigitizer.CAEN_DGTZ_SetFastTriggerMode,
 		libCAENDigitizer.CAEN_DGTZ_SetFastTriggerDigitizing,
 		libCAENDigitizer.CAEN_DGTZ_SetGroupFastTriggerDCOffset,
@@ -991,6 +2987,7 @@ def __init__():
 		libCAENDigitizer.CAEN_DGTZ_SendSWtrigger,
 		libCAENDigitizer.CAEN_DGTZ_SetDRS4SamplingFrequency,
 		libCAENDigitizer.CAEN_DGTZ_SetGroupEnableMask,
+		libCAENDigitizer.CAEN_DGTZ_GetGroupEnableMask,
 		libCAENDigitizer.CAEN_DGTZ_SetChannelDCOffset,
 		libCAENDigitizer.CAEN_DGTZ_GetChannelDCOffset,
 		libCAENDigitizer.CAEN_DGTZ_SWStartAcquisition,
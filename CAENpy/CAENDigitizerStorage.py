@@ -0,0 +1,625 @@
+# Writers to store the events from a CAEN digitizer directly on disk, in chunked and compressed HDF5 or Parquet files.
+
+import numpy
+import json
+from pathlib import Path
+from .CAENDigitizer import EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH, COLUMNAR_BATCH_KEYS_COMMON_TO_ALL_EVENTS, REDUCED_BATCH_KEYS_PER_KEPT_WAVEFORM, events_to_columnar_batch, get_time_axis, _cast_ADC_samples
+
+PARQUET_SCHEMA_METADATA_KEY = b'CAENpy'
+
+def _to_json_friendly(obj):
+	"""Convert `obj` recursively into something that can be serialized
+	to JSON, e.g. the `bytes` from `get_info` into `str`."""
+	if isinstance(obj, dict):
+		return {str(key): _to_json_friendly(value) for key,value in obj.items()}
+	if isinstance(obj, (list,tuple)):
+		return [_to_json_friendly(value) for value in obj]
+	if isinstance(obj, bytes):
+		return obj.decode('ascii', errors='replace').rstrip('\x00')
+	if isinstance(obj, numpy.ndarray):
+		return obj.tolist()
+	if isinstance(obj, numpy.generic):
+		return obj.item()
+	return obj
+
+def _as_columnar_batch(events)->dict:
+	"""Returns `events` as a columnar batch, `events` can be either one
+	or a list of dictionaries as returned by `get_waveforms`."""
+	if isinstance(events, dict):
+		return events
+	if isinstance(events, list):
+		return events_to_columnar_batch(events) if len(events) > 0 else None
+	raise TypeError(f'`events` must be a list of dict or a columnar batch (a dict), as returned by `get_waveforms`, received object of type {type(events)}. ')
+
+def _number_of_events_in_batch(batch:dict)->int:
+	if 'Channel kept' in batch: # A reduced batch, see `reduce_waveforms`.
+		return len(batch['Channel kept'])
+	amplitude_key = 'Amplitude (V)' if 'Amplitude (V)' in batch else 'Amplitude (ADCu)'
+	return len(batch[amplitude_key])
+
+def digitizer_run_metadata(digitizer)->dict:
+	"""Collect the information about the digitizer and its configuration
+	that is worth storing together with the data of a run.
+	
+	Arguments
+	---------
+	digitizer: CAEN_DT5742_Digitizer
+		The digitizer.
+	
+	Returns
+	-------
+	metadata: dict
+		A dictionary that can be serialized to JSON, with the keys
+		`'idn'`, `'info'` (see `get_info`) and `'configuration'` (see
+		`get_configuration`).
+	"""
+	return _to_json_friendly(
+		dict(
+			idn = digitizer.idn,
+			info = digitizer.get_info(),
+			configuration = digitizer.get_configuration(),
+		)
+	)
+
+class _EventsWriter:
+	"""Common logic of the writers. The data is received in blocks,
+	either as lists of events or columnar batches (see `get_waveforms`),
+	and all the blocks must have the same channels, number of samples
+	and time axis."""
+	def __init__(self, path, metadata:dict=None):
+		self.path = Path(path)
+		self.metadata = _to_json_friendly(metadata if metadata is not None else {})
+		self.n_events = 0
+		self._layout = None # Defined by the first block.
+	
+	def write(self, events):
+		"""Append a block of events to the file.
+		
+		Arguments
+		---------
+		events: list of dict or dict
+			The events, as returned by `get_waveforms`, either a list
+			of dictionaries or a columnar batch.
+		"""
+		batch = _as_columnar_batch(events)
+		if batch is None or _number_of_events_in_batch(batch) == 0:
+			return
+		layout = dict(
+			channels = tuple(batch['channels']),
+			per_event_keys = tuple(key for key in batch if key not in COLUMNAR_BATCH_KEYS_COMMON_TO_ALL_EVENTS),
+			common = {key: batch[key] for key in COLUMNAR_BATCH_KEYS_COMMON_TO_ALL_EVENTS-{'channels'} if key in batch},
+		)
+		if self._layout is None:
+			self._layout = layout
+			self._create(batch)
+		elif layout['channels'] != self._layout['channels'] or layout['per_event_keys'] != self._layout['per_event_keys'] or layout['common'].keys() != self._layout['common'].keys() or any(not numpy.array_equal(value, self._layout['common'][key]) for key,value in layout['common'].items()):
+			raise ValueError(f'All the blocks written to {self.path} must have the same channels, fields and time axis, but this one is different from the first one. ')
+		self._append(batch)
+		self.n_events += _number_of_events_in_batch(batch)
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, exc_type, exc_value, exc_traceback):
+		self.close()
+
+class HDF5EventsWriter(_EventsWriter):
+	"""Appends the events to an HDF5 file, each block is written to disk
+	as it arrives so the memory usage does not depend on the number
+	of events. Requires `h5py`.
+	
+	The file contains one resizable dataset per field of the columnar
+	batch (see `get_waveforms`) with the events along the first axis,
+	e.g. `'Amplitude (V)'` with shape (n_events, n_channels, record_length)
+	and `'EventCounter'` with shape (n_events,), or one row per kept 
+	waveform for batches reduced with `reduce_waveforms`. The `'Time (s)'` is
+	stored once, and the channels names, `'t0 (s)'`, `'dt (s)'` and
+	the metadata (as JSON) are stored as attributes of the file.
+	
+	Usage example
+	-------------
+	```
+	with HDF5EventsWriter('run.h5', metadata=digitizer_run_metadata(digitizer)) as writer:
+		for batch in digitizer.stream(max_events=22222, columnar=True):
+			writer.write(batch)
+	```
+	"""
+	def __init__(self, path, metadata:dict=None, compression:str='gzip', compression_opts=4, chunk_size_bytes:int=2**20):
+		"""Creates the file, it must not exist.
+		
+		Arguments
+		---------
+		path: str or Path
+			Path to the file.
+		metadata: dict, optional
+			Anything that can be serialized to JSON, see `digitizer_run_metadata`.
+		compression: str, default `'gzip'`
+			Any compression filter supported by `h5py`, or `None`.
+		compression_opts: default 4
+			Options for the compression filter, e.g. the level for `'gzip'`.
+		chunk_size_bytes: int, default 1 MiB
+			Approximate size of the chunks of the samples dataset.
+		"""
+		try:
+			import h5py
+		except ImportError as e:
+			raise ImportError(f'`HDF5EventsWriter` requires `h5py`, install it with `pip install h5py`. ') from e
+		super().__init__(path, metadata)
+		self._compression = dict(compression=compression, compression_opts=compression_opts if compression is not None else None, shuffle=compression is not None)
+		self._chunk_size_bytes = chunk_size_bytes
+		self._file = h5py.File(self.path, 'w-')
+		self._file.attrs['metadata'] = json.dumps(self.metadata)
+	
+	def _create(self, batch:dict):
+		self._file.attrs['channels'] = list(batch['channels'])
+		for key in ['t0 (s)','dt (s)']:
+			if key in batch:
+				self._file.attrs[key] = batch[key]
+		if 'Time (s)' in batch:
+			self._file.create_dataset('Time (s)', data=batch['Time (s)'])
+		for key in self._layout['per_event_keys']:
+			data = numpy.asarray(batch[key])
+			bytes_per_event = max(data.itemsize*int(numpy.prod(data.shape[1:])), 1)
+			events_per_chunk = max(1, self._chunk_size_bytes//bytes_per_event)
+			self._file.create_dataset(
+				key,
+				shape = (0,) + data.shape[1:],
+				maxshape = (None,) + data.shape[1:],
+				dtype = data.dtype,
+				chunks = (events_per_chunk,) + data.shape[1:],
+				**self._compression,
+			)
+	
+	def _append(self, batch:dict):
+		for key in self._layout['per_event_keys']:
+			dataset = self._file[key]
+			n_rows = len(dataset) # Not always `self.n_events`, in reduced batches some fields have one row per kept waveform.
+			dataset.resize(n_rows+len(batch[key]), axis=0)
+			dataset[n_rows:] = batch[key]
+	
+	def close(self):
+		"""Close the file."""
+		self._file.close()
+
+class ParquetEventsWriter(_EventsWriter):
+	"""Appends the events to a Parquet file, one row per event. Requires
+	`pyarrow`. The events are buffered until there are enough for a
+	row group, so the memory usage is bounded by `events_per_row_group`.
+	
+	Each channel has one column with the samples, a fixed size list
+	named e.g. `'CH0 Amplitude (V)'`, plus the columns `'CH0 StartIndexCell'`,
+	`'CH0 ADC overflow'` and `'CH0 Channel kept'` if present. The waveforms
+	dropped by `reduce_waveforms` are null. The fields of `EventInfo` are
+	one column each. The channels names, the time axis and the metadata
+	are stored as JSON in the metadata of the schema, see `read_events_file`.
+	
+	Usage example
+	-------------
+	```
+	with ParquetEventsWriter('run.parquet', metadata=digitizer_run_metadata(digitizer)) as writer:
+		for batch in digitizer.stream(max_events=22222, columnar=True):
+			writer.write(batch)
+	```
+	"""
+	def __init__(self, path, metadata:dict=None, compression:str='zstd', events_per_row_group:int=1000):
+		"""Creates the file, it must not exist.
+		
+		Arguments
+		---------
+		path: str or Path
+			Path to the file.
+		metadata: dict, optional
+			Anything that can be serialized to JSON, see `digitizer_run_metadata`.
+		compression: str, default `'zstd'`
+			Any compression supported by `pyarrow.parquet`.
+		events_per_row_group: int, default 1000
+			Number of events that are buffered before writing them to
+			the file as one row group.
+		"""
+		try:
+			import pyarrow
+			import pyarrow.parquet
+		except ImportError as e:
+			raise ImportError(f'`ParquetEventsWriter` requires `pyarrow`, install it with `pip install pyarrow`. ') from e
+		if not isinstance(events_per_row_group, int) or events_per_row_group < 1:
+			raise ValueError(f'`events_per_row_group` must be a positive integer, received {repr(events_per_row_group)}. ')
+		super().__init__(path, metadata)
+		if self.path.exists():
+			raise FileExistsError(f'{self.path} already exists. ')
+		self._pyarrow = pyarrow
+		self._compression = compression
+		self._events_per_row_group = events_per_row_group
+		self._pending_tables = []
+		self._n_pending_events = 0
+		self._writer = None
+	
+	def _create(self, batch:dict):
+		schema_metadata = dict(
+			metadata = self.metadata,
+			channels = list(batch['channels']),
+			**{key: _to_json_friendly(batch[key]) for key in COLUMNAR_BATCH_KEYS_COMMON_TO_ALL_EVENTS-{'channels'} if key in batch},
+		)
+		schema = self._batch_to_table(batch).schema.with_metadata({PARQUET_SCHEMA_METADATA_KEY: json.dumps(schema_metadata)})
+		self._writer = self._pyarrow.parquet.ParquetWriter(self.path, schema, compression=self._compression)
+	
+	def _batch_to_table(self, batch:dict):
+		pyarrow = self._pyarrow
+		columns = {}
+		if 'Channel kept' in batch:
+			channel_kept = batch['Channel kept']
+			n_waveform = numpy.cumsum(channel_kept.reshape(-1)).reshape(channel_kept.shape) - 1
+		for key in self._layout['per_event_keys']:
+			data = numpy.asarray(batch[key])
+			if data.ndim == 1:
+				columns[key] = pyarrow.array(data)
+				continue
+			if 'Channel kept' in batch and key in REDUCED_BATCH_KEYS_PER_KEPT_WAVEFORM: # The dropped waveforms are stored as nulls.
+				for n_channel,channel in enumerate(batch['channels']):
+					kept = channel_kept[:,n_channel]
+					channel_data = numpy.zeros((len(kept),)+data.shape[1:], dtype=data.dtype)
+					channel_data[kept] = data[n_waveform[kept,n_channel]]
+					columns[f'{channel} {key}'] = pyarrow.FixedSizeListArray.from_arrays(pyarrow.array(channel_data.reshape(-1)), data.shape[1], mask=pyarrow.array(~kept))
+				continue
+			for n_channel,channel in enumerate(batch['channels']):
+				channel_data = numpy.ascontiguousarray(data[:,n_channel])
+				if channel_data.ndim == 1:
+					columns[f'{channel} {key}'] = pyarrow.array(channel_data)
+				else:
+					columns[f'{channel} {key}'] = pyarrow.FixedSizeListArray.from_arrays(pyarrow.array(channel_data.reshape(-1)), channel_data.shape[1])
+		return pyarrow.table(columns)
+	
+	def _append(self, batch:dict):
+		self._pending_tables.append(self._batch_to_table(batch))
+		self._n_pending_events += _number_of_events_in_batch(batch)
+		if self._n_pending_events >= self._events_per_row_group:
+			self._flush()
+	
+	def _flush(self):
+		if self._n_pending_events == 0:
+			return
+		table = self._pyarrow.concat_tables(self._pending_tables).replace_schema_metadata(self._writer.schema.metadata)
+		self._writer.write_table(table, row_group_size=self._events_per_row_group)
+		self._pending_tables = []
+		self._n_pending_events = 0
+	
+	def close(self):
+		"""Write the buffered events, if any, and close the file."""
+		if self._writer is None:
+			return
+		self._flush()
+		self._writer.close()
+		self._writer = None
+
+WAVEFORM_ARCHIVE_MAGIC = b'CAENpy waveform archive\n'
+WAVEFORM_ARCHIVE_HEADER_ALIGNMENT = 4096 # The samples start at a multiple of this, so they are aligned to the memory pages.
+WAVEFORM_ARCHIVE_SAMPLES_DTYPE = numpy.dtype('<u2')
+
+def _waveform_archive_index_path(path)->Path:
+	return Path(str(path) + '.index')
+
+def _waveform_archive_index_dtype(n_channels:int):
+	return numpy.dtype([(field, '<u4') for field in EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH] + [('StartIndexCell', '<u2', (n_channels,))])
+
+class WaveformArchiveWriter(_EventsWriter):
+	"""Writes the samples in ADC units into a fixed record binary file
+	that can be opened instantly, whatever its size, with `WaveformArchive`.
+	
+	The file starts with `WAVEFORM_ARCHIVE_MAGIC` followed by a JSON
+	line with the header (channels, record length and the metadata,
+	which should contain the configuration of the digitizer, see `digitizer_run_metadata`),
+	padded up to a multiple of `WAVEFORM_ARCHIVE_HEADER_ALIGNMENT` bytes.
+	Then come the samples as little endian `uint16`, one record of 
+	shape (n_channels, record_length) per event. The fields of `EventInfo`
+	and the `StartIndexCell` go into an index file next to it, with 
+	`'.index'` appended to the name.
+	
+	Only columnar batches (or lists of events) with `'Amplitude (ADCu)'`
+	can be written, the ADC overflow can be recomputed from the samples
+	so `'ADC overflow'` is not stored.
+	
+	Usage example
+	-------------
+	```
+	with WaveformArchiveWriter('run.wfa', metadata=digitizer_run_metadata(digitizer)) as writer:
+		for batch in digitizer.stream(max_events=22222, columnar=True, get_ADCu_instead_of_volts=True, dtype=numpy.uint16, overflow_as_mask=True):
+			writer.write(batch)
+	```
+	"""
+	def __init__(self, path, metadata:dict=None):
+		"""Creates the archive and its index, they must not exist.
+		
+		Arguments
+		---------
+		path: str or Path
+			Path to the archive.
+		metadata: dict, optional
+			Anything that can be serialized to JSON, see `digitizer_run_metadata`.
+		"""
+		super().__init__(path, metadata)
+		self._data_file = open(self.path, 'xb')
+		try:
+			self._index_file = open(_waveform_archive_index_path(self.path), 'xb')
+		except:
+			self._data_file.close()
+			raise
+	
+	def _write_header(self, channels:tuple, record_length:int):
+		header = json.dumps(
+			dict(
+				channels = list(channels),
+				record_length = record_length,
+				samples_dtype = WAVEFORM_ARCHIVE_SAMPLES_DTYPE.str,
+				metadata = self.metadata,
+			)
+		).encode('utf8') + b'\n'
+		header = WAVEFORM_ARCHIVE_MAGIC + header
+		header += b'\x00'*(-len(header) % WAVEFORM_ARCHIVE_HEADER_ALIGNMENT)
+		self._data_file.write(header)
+	
+	def _create(self, batch:dict):
+		if 'Amplitude (ADCu)' not in batch:
+			raise ValueError(f'Only samples in ADC units can be written into a waveform archive, use `get_ADCu_instead_of_volts=True`. ')
+		if 'Channel kept' in batch:
+			raise ValueError(f'A waveform archive has fixed size records, so the waveforms cannot be dropped with the zero suppression of `reduce_waveforms`. ')
+		samples = batch['Amplitude (ADCu)']
+		self._write_header(channels=batch['channels'], record_length=samples.shape[2])
+		self._index_dtype = _waveform_archive_index_dtype(len(batch['channels']))
+	
+	def _append(self, batch:dict):
+		samples = batch['Amplitude (ADCu)']
+		if samples.dtype != WAVEFORM_ARCHIVE_SAMPLES_DTYPE:
+			samples = _cast_ADC_samples(samples, WAVEFORM_ARCHIVE_SAMPLES_DTYPE)
+		index = numpy.zeros(len(samples), dtype=self._index_dtype)
+		for field in self._index_dtype.names:
+			if field in batch:
+				index[field] = batch[field]
+		self._data_file.write(memoryview(numpy.ascontiguousarray(samples)).cast('B')) # The samples first, so the index never points beyond them.
+		self._index_file.write(memoryview(index).cast('B'))
+	
+	def close(self):
+		"""Close the archive and its index."""
+		if self._layout is None and self._data_file.tell() == 0:
+			self._write_header(channels=tuple(), record_length=0) # No events were written, still produce a valid archive.
+		self._data_file.close()
+		self._index_file.close()
+
+class WaveformArchive:
+	"""Read only access to a file written by `WaveformArchiveWriter`,
+	without reading nor parsing the samples: they are mapped into memory
+	with `numpy.memmap` so opening an archive is instant whatever its
+	size, and only the events that are accessed are read from disk.
+	
+	Usage example
+	-------------
+	```
+	archive = WaveformArchive('run.wfa')
+	print(len(archive), archive.channels)
+	archive.samples # Array of shape (n_events, n_channels, record_length), without copying.
+	batch = archive[1000:2000] # A columnar batch, see `get_waveforms`.
+	batch = archive[archive.find('EventCounter', [5, 77, 123])]
+	```
+	"""
+	def __init__(self, path):
+		"""Open an archive.
+		
+		Arguments
+		---------
+		path: str or Path
+			Path to the archive.
+		"""
+		self.path = Path(path)
+		with open(self.path, 'rb') as f:
+			if f.read(len(WAVEFORM_ARCHIVE_MAGIC)) != WAVEFORM_ARCHIVE_MAGIC:
+				raise ValueError(f'{self.path} is not a waveform archive. ')
+			header = json.loads(f.readline().decode('utf8'))
+			header_size = f.tell() + (-f.tell() % WAVEFORM_ARCHIVE_HEADER_ALIGNMENT)
+			file_size = f.seek(0, 2)
+		self.metadata = header['metadata']
+		self.channels = tuple(header['channels'])
+		self.record_length = header['record_length']
+		samples_dtype = numpy.dtype(header['samples_dtype'])
+		
+		index_dtype = _waveform_archive_index_dtype(len(self.channels))
+		index_path = _waveform_archive_index_path(self.path)
+		bytes_per_event = samples_dtype.itemsize*len(self.channels)*self.record_length
+		n_events = min(
+			max(file_size-header_size, 0)//bytes_per_event if bytes_per_event > 0 else 0,
+			index_path.stat().st_size//index_dtype.itemsize,
+		) # If the writing was interrupted the last event may be incomplete, so it is ignored.
+		if n_events == 0: # `numpy.memmap` cannot map empty files.
+			self.samples = numpy.empty((0, len(self.channels), self.record_length), dtype=samples_dtype)
+			self.index = numpy.empty(0, dtype=index_dtype)
+		else:
+			self.samples = numpy.memmap(self.path, dtype=samples_dtype, mode='r', offset=header_size, shape=(n_events, len(self.channels), self.record_length))
+			self.index = numpy.memmap(index_path, dtype=index_dtype, mode='r', shape=(n_events,))
+		self._sorting = {}
+	
+	def __len__(self):
+		return len(self.samples)
+	
+	@property
+	def time_axis_parameters(self)->dict:
+		"""The parameters for `get_time_axis`, taken from the configuration
+		of the digitizer in the metadata, or `None` if it is not there."""
+		configuration = self.metadata.get('configuration')
+		if configuration is None:
+			return None
+		return dict(
+			sampling_frequency = configuration['sampling_frequency_MHz']*1e6,
+			post_trigger_size = configuration['post_trigger_size'],
+			fast_trigger_mode = configuration['fast_trigger_mode'],
+		)
+	
+	def __getitem__(self, events)->dict:
+		"""Get some events as a columnar batch (see `get_waveforms`) with
+		the samples in ADC units. `events` is anything that can index 
+		the first axis of a numpy array, e.g. a slice or an array of
+		positions. For slices the samples are not copied."""
+		if isinstance(events, int):
+			events = slice(events, events+1 if events != -1 else None)
+		index = self.index[events]
+		batch = {
+			'channels': self.channels,
+			'Amplitude (ADCu)': self.samples[events],
+		}
+		time_axis_parameters = self.time_axis_parameters
+		if time_axis_parameters is not None:
+			batch['Time (s)'] = get_time_axis(record_length=self.record_length, **time_axis_parameters)
+		for field in index.dtype.names:
+			batch[field] = index[field]
+		return batch
+	
+	def find(self, field:str, values):
+		"""Find the position of the events with the given values of one
+		of the fields of `EventInfo`, e.g. `'EventCounter'` or `'TriggerTimeTag'`.
+		The first time a field is used it is sorted, which only involves
+		reading the index, not the samples.
+		
+		Arguments
+		---------
+		field: str
+			One of `EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH`.
+		values: int or array of int
+			The values to look for.
+		
+		Returns
+		-------
+		positions: numpy.array
+			The positions in the archive of all the events matching any
+			of the values, sorted. Note that the counters of the digitizer
+			wrap around, so a value may match more than one event in 
+			long runs.
+		"""
+		if field not in EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH:
+			raise ValueError(f'`field` must be one of {EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH}, received {repr(field)}. ')
+		if field not in self._sorting:
+			column = numpy.array(self.index[field])
+			order = numpy.argsort(column, kind='stable')
+			self._sorting[field] = (order, column[order])
+		order, sorted_column = self._sorting[field]
+		values = numpy.atleast_1d(values)
+		starts = numpy.searchsorted(sorted_column, values, side='left')
+		stops = numpy.searchsorted(sorted_column, values, side='right')
+		return numpy.sort(numpy.concatenate([order[start:stop] for start,stop in zip(starts,stops)] + [numpy.empty(0, dtype=order.dtype)]))
+
+def open_events_writer(path, metadata:dict=None, **kwargs):
+	"""Create a writer for `path` according to its extension, `HDF5EventsWriter`
+	for `.h5` and `.hdf5`, `ParquetEventsWriter` for `.parquet` or 
+	`WaveformArchiveWriter` for `.wfa`. The `kwargs` are passed to the writer."""
+	suffix = Path(path).suffix.lower()
+	if suffix in {'.h5','.hdf5'}:
+		return HDF5EventsWriter(path, metadata=metadata, **kwargs)
+	if suffix == '.parquet':
+		return ParquetEventsWriter(path, metadata=metadata, **kwargs)
+	if suffix == '.wfa':
+		return WaveformArchiveWriter(path, metadata=metadata, **kwargs)
+	raise ValueError(f'Cannot determine the format from the extension of {repr(str(path))}, it must be one of `.h5`, `.hdf5`, `.parquet` or `.wfa`. ')
+
+def acquire_to_file(digitizer, path, max_events:int=None, max_seconds:float=None, get_ADCu_instead_of_volts:bool=False, dtype=numpy.float32, overflow_as_mask:bool=False, background_readout:bool=False, DRS4_correction:bool=True, writer_options:dict=None)->dict:
+	"""Run an acquisition (see `CAEN_DT5742_Digitizer.stream`) writing
+	the events to an HDF5, Parquet or waveform archive file as they 
+	are read, together with `digitizer_run_metadata`. The format is 
+	chosen by the extension of `path`, see `open_events_writer`.
+	
+	Arguments
+	---------
+	digitizer: CAEN_DT5742_Digitizer
+		The digitizer, already configured.
+	path: str or Path
+		Path to the file, it must not exist.
+	max_events, max_seconds, background_readout, DRS4_correction:
+		Same as in `CAEN_DT5742_Digitizer.stream`.
+	get_ADCu_instead_of_volts, dtype, overflow_as_mask:
+		Same as in `CAEN_DT5742_Digitizer.get_waveforms`. The default
+		`dtype` is `numpy.float32` to halve the size of the file. They
+		are ignored for waveform archives, which always store the samples
+		in ADC units as `uint16`.
+	writer_options: dict, optional
+		Passed to the writer, e.g. `dict(compression='lzf')`.
+	
+	Returns
+	-------
+	stream_stats: dict
+		The `stream_stats` of the digitizer at the end of the acquisition.
+	"""
+	metadata = digitizer_run_metadata(digitizer)
+	metadata['DRS4_correction'] = DRS4_correction
+	if Path(path).suffix.lower() == '.wfa':
+		get_ADCu_instead_of_volts, dtype, overflow_as_mask = True, numpy.uint16, True
+	with open_events_writer(path, metadata=metadata, **(writer_options if writer_options is not None else {})) as writer:
+		for batch in digitizer.stream(
+			max_events = max_events,
+			max_seconds = max_seconds,
+			get_ADCu_instead_of_volts = get_ADCu_instead_of_volts,
+			columnar = True,
+			dtype = dtype,
+			overflow_as_mask = overflow_as_mask,
+			background_readout = background_readout,
+			DRS4_correction = DRS4_correction,
+		):
+			writer.write(batch)
+	return digitizer.stream_stats
+
+def read_events_file(path):
+	"""Read a whole file written by `HDF5EventsWriter` or `ParquetEventsWriter`
+	into memory. Files written by `WaveformArchiveWriter` are also accepted,
+	in this case the samples are mapped rather than read, see `WaveformArchive`.
+	
+	Arguments
+	---------
+	path: str or Path
+		Path to the file.
+	
+	Returns
+	-------
+	metadata: dict
+		The metadata given to the writer.
+	batch: dict
+		A columnar batch with all the events, see `get_waveforms`.
+	"""
+	suffix = Path(path).suffix.lower()
+	if suffix in {'.h5','.hdf5'}:
+		import h5py
+		with h5py.File(path, 'r') as f:
+			metadata = json.loads(f.attrs['metadata'])
+			batch = {'channels': tuple(str(channel) for channel in f.attrs.get('channels', []))}
+			for key in ['t0 (s)','dt (s)']:
+				if key in f.attrs:
+					batch[key] = float(f.attrs[key])
+			for key in f.keys():
+				batch[key] = f[key][()]
+		return metadata, batch
+	if suffix == '.parquet':
+		import pyarrow.parquet
+		table = pyarrow.parquet.read_table(path)
+		schema_metadata = json.loads(table.schema.metadata[PARQUET_SCHEMA_METADATA_KEY])
+		channels = tuple(schema_metadata['channels'])
+		batch = {'channels': channels}
+		for key in ['t0 (s)','dt (s)']:
+			if key in schema_metadata:
+				batch[key] = schema_metadata[key]
+		if 'Time (s)' in schema_metadata:
+			batch['Time (s)'] = numpy.array(schema_metadata['Time (s)'])
+		for name in table.column_names:
+			if name in EVENT_INFO_FIELDS_IN_COLUMNAR_BATCH:
+				batch[name] = table[name].to_numpy()
+		for key in ['Channel kept','Amplitude (V)','Amplitude (ADCu)','ADC overflow','StartIndexCell']:
+			if f'{channels[0]} {key}' not in table.column_names:
+				continue
+			per_channel = []
+			for channel in channels:
+				column = table[f'{channel} {key}'].combine_chunks()
+				if isinstance(column.type, pyarrow.FixedSizeListType):
+					size = column.type.list_size
+					values = column.values.slice(column.offset*size, len(column)*size) # Including the values under the nulls, so it can be reshaped.
+					per_channel.append(values.to_numpy(zero_copy_only=False).reshape(len(column), size))
+				else:
+					per_channel.append(column.to_numpy(zero_copy_only=False))
+			batch[key] = numpy.stack(per_channel, axis=1)
+			if 'Channel kept' in batch and key in REDUCED_BATCH_KEYS_PER_KEPT_WAVEFORM:
+				batch[key] = batch[key][batch['Channel kept']]
+		return schema_metadata['metadata'], batch
+	if suffix == '.wfa':
+		archive = WaveformArchive(path)
+		return archive.metadata, archive[:]
+	raise ValueError(f'Cannot determine the format from the extension of {repr(str(path))}, it must be one of `.h5`, `.hdf5`, `.parquet` or `.wfa`. ')
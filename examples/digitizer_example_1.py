@@ -1,7 +1,6 @@
-from CAENpy.CAENDigitizer import CAEN_DT5742_Digitizer
+from CAENpy.CAENDigitizer import CAEN_DT5742_Digitizer, events_to_data_frame
 import pandas
 import numpy
-import time
 
 def configure_digitizer(digitizer:CAEN_DT5742_Digitizer):
 	digitizer.set_sampling_frequency(MHz=5000)
@@ -20,15 +19,7 @@ def configure_digitizer(digitizer:CAEN_DT5742_Digitizer):
 		digitizer.set_trigger_polarity(channel=ch, edge='rising')
 
 def convert_dicitonaries_to_data_frame(waveforms:dict):
-	data = []
-	for n_event,event_waveforms in enumerate(waveforms):
-		for n_channel in event_waveforms:
-			df = pandas.DataFrame(event_waveforms[n_channel])
-			df['n_event'] = n_event
-			df['n_channel'] = n_channel
-			df.set_index(['n_event','n_channel'], inplace=True)
-			data.append(df)
-	return pandas.concat(data)
+	return events_to_data_frame(waveforms)
 
 if __name__ == '__main__':
 	d = CAEN_DT5742_Digitizer(LinkNum=0)
@@ -38,19 +29,13 @@ if __name__ == '__main__':
 	d.set_max_num_events_BLT(1024) # Override the maximum number of events to be stored in the digitizer's self buffer.
 	
 	# Data acquisition ---
-	n_events = 0
 	ACQUIRE_AT_LEAST_THIS_NUMBER_OF_EVENTS = 2222
 	data = []
-	with d: # Enable digitizer to take data
-		print('Digitizer is enabled! Acquiring data...')
-		while n_events < ACQUIRE_AT_LEAST_THIS_NUMBER_OF_EVENTS:
-			time.sleep(.05)
-			waveforms = d.get_waveforms() # Acquire the data.
-			this_readout_n_events = len(waveforms)
-			n_events += this_readout_n_events
-			data += waveforms
-			print(f'{n_events} out of {ACQUIRE_AT_LEAST_THIS_NUMBER_OF_EVENTS} were acquired.')
-		print(f'A total of {n_events} were acquired, finishing acquisition and stopping digitizer.')
+	print('Acquiring data...')
+	for waveforms in d.stream(max_events=ACQUIRE_AT_LEAST_THIS_NUMBER_OF_EVENTS): # This starts the digitizer, and stops it when finished.
+		data += waveforms
+		print(f'{len(data)} out of {ACQUIRE_AT_LEAST_THIS_NUMBER_OF_EVENTS} were acquired.')
+	print(f'A total of {len(data)} were acquired, acquisition finished and digitizer stopped. Stats: {d.stream_stats}')
 	
 	print(f'Creating a pandas data frame with the data...')
 	data = convert_dicitonaries_to_data_frame(data)
@@ -59,18 +44,18 @@ if __name__ == '__main__':
 	print(data)
 	# The previous line should print something like this:
 	#
-	#	                         Amplitude (V)      Time (s)
-	#	n_event n_channel                                   
-	#	0       CH0                   0.019902 -1.626000e-07
-	#			CH0                   0.019902 -1.624000e-07
-	#			CH0                   0.019662 -1.622000e-07
-	#			CH0                   0.021121 -1.620000e-07
-	#			CH0                   0.020635 -1.618000e-07
-	#	...                                ...           ...
-	#	1023    trigger_group_1       0.026258  4.120000e-08
-	#			trigger_group_1       0.026986  4.140000e-08
-	#			trigger_group_1       0.027227  4.160000e-08
-	#			trigger_group_1       0.026986  4.180000e-08
-	#			trigger_group_1       0.027718  4.200000e-08
+	#	                                 Amplitude (V)      Time (s)
+	#	n_event n_channel       n_sample                            
+	#	0       CH0             0             0.019902 -1.626000e-07
+	#	                        1             0.019902 -1.624000e-07
+	#	                        2             0.019662 -1.622000e-07
+	#	                        3             0.021121 -1.620000e-07
+	#	                        4             0.020635 -1.618000e-07
+	#	...                                        ...           ...
+	#	1023    trigger_group_1 1019          0.026258  4.120000e-08
+	#	                        1020          0.026986  4.140000e-08
+	#	                        1021          0.027227  4.160000e-08
+	#	                        1022          0.026986  4.180000e-08
+	#	                        1023          0.027718  4.200000e-08
 	#	
 	#	[18874368 rows x 2 columns]
@@ -16,4 +16,8 @@ setuptools.setup(
 	install_requires = [
 		'pyserial',
 	],
+	extras_require = {
+		'hdf5': ['h5py'],
+		'parquet': ['pyarrow'],
+	},
 )
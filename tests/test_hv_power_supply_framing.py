@@ -0,0 +1,149 @@
+import socket
+import threading
+import time
+import types
+
+import pytest
+
+import CAENpy.CAENDesktopHighVoltagePowerSupply as hv
+
+class FakeInstrument:
+	"""Answers the commands of `CAENDesktopHighVoltagePowerSupply` like a
+	DT1470ET with one board of 4 channels, over either a TCP like socket
+	or a serial like port. The answers to all the commands received
+	together are sent together, split in packets of `packet_size` bytes
+	if given, and `delays` answers each parameter that many seconds late."""
+	def __init__(self, packet_size=None, delays=None):
+		self.values = {PAR: [float(n_channel+offset) for n_channel in range(4)] for PAR, offset in [('VSET',100), ('ISET',10)]}
+		self.packet_size = packet_size
+		self.delays = delays if delays is not None else {}
+		self.n_connections = 0
+
+	def answer(self, command:str):
+		fields = dict(field.split(':', 1) for field in command.lstrip('$').split(','))
+		PAR = fields['PAR']
+		time.sleep(self.delays.get(PAR, 0))
+		value = self.values[PAR][int(fields['CH'])]
+		if fields['CMD'] == 'SET':
+			self.values[PAR][int(fields['CH'])] = float(fields['VAL'])
+			return f'#BD:{int(fields["BD"]):02d},CMD:OK\r\n'.encode('ASCII')
+		return f'#BD:{int(fields["BD"]):02d},CMD:OK,VAL:{value:06.1f}\r\n'.encode('ASCII')
+
+	def packets(self, commands:bytes):
+		answers = b''.join(self.answer(command.decode('ASCII')) for command in commands.split(b'\r\n')[:-1])
+		packet_size = self.packet_size if self.packet_size is not None else len(answers)
+		for n in range(0, len(answers), packet_size):
+			yield answers[n:n+packet_size]
+
+	def serve(self, connection):
+		received = b''
+		with connection:
+			while True:
+				try:
+					data = connection.recv(1024)
+				except OSError:
+					return
+				if len(data) == 0:
+					return
+				received += data
+				end_of_commands = received.rfind(b'\r\n') + 2
+				commands, received = received[:end_of_commands], received[end_of_commands:]
+				try:
+					for packet in self.packets(commands):
+						connection.sendall(packet)
+						time.sleep(.001)
+				except OSError: # The client closed this connection while we were late.
+					return
+
+	def socket(self, *args):
+		class ConnectedSocket(socket.socket):
+			def connect(self, address):
+				pass
+		client_side, instrument_side = socket.socketpair()
+		self.n_connections += 1
+		threading.Thread(target=self.serve, args=(instrument_side,), daemon=True).start()
+		return ConnectedSocket(fileno=client_side.detach())
+
+class FakeSerialPort:
+	def __init__(self, instrument, timeout, **kwargs):
+		self.instrument = instrument
+		self.timeout = timeout
+		self._buffer = bytearray()
+		self._condition = threading.Condition()
+		self._answering = threading.Lock() # The instrument answers one command after the other.
+
+	@property
+	def in_waiting(self):
+		return len(self._buffer)
+
+	def write(self, data):
+		def answer():
+			with self._answering:
+				for packet in self.instrument.packets(data):
+					with self._condition:
+						self._buffer += packet
+						self._condition.notify_all()
+					time.sleep(.001)
+		threading.Thread(target=answer, daemon=True).start()
+
+	def read(self, size):
+		with self._condition:
+			self._condition.wait_for(lambda: len(self._buffer) > 0, timeout=self.timeout)
+			data = bytes(self._buffer[:size])
+			del self._buffer[:size]
+		return data
+
+	def reset_input_buffer(self):
+		with self._condition:
+			self._buffer.clear()
+
+	def close(self):
+		pass
+
+def connect(monkeypatch, instrument, timeout=1, through='socket'):
+	if through == 'socket':
+		monkeypatch.setattr(hv, 'socket', types.SimpleNamespace(socket=instrument.socket, AF_INET=socket.AF_INET, SOCK_STREAM=socket.SOCK_STREAM))
+		return hv.CAENDesktopHighVoltagePowerSupply(ip='127.0.0.1', timeout=timeout)
+	monkeypatch.setattr(hv.serial, 'Serial', lambda **kwargs: FakeSerialPort(instrument, **kwargs))
+	return hv.CAENDesktopHighVoltagePowerSupply(port='/dev/ttyFAKE', timeout=timeout)
+
+@pytest.mark.parametrize('through', ['socket','serial'])
+@pytest.mark.parametrize('packet_size', [1, 3, 7])
+def test_answers_split_across_packets(monkeypatch, through, packet_size):
+	caen = connect(monkeypatch, FakeInstrument(packet_size=packet_size), through=through)
+	for _ in range(3):
+		for n_channel in range(4):
+			assert caen.get_single_channel_parameter('VSET', n_channel) == 100+n_channel
+			assert caen.get_single_channel_parameter('ISET', n_channel) == 10+n_channel
+	assert len(caen._received_bytes) == 0
+
+@pytest.mark.parametrize('packet_size', [None, 5, 40])
+def test_answers_merged_in_one_packet(monkeypatch, packet_size):
+	caen = connect(monkeypatch, FakeInstrument(packet_size=packet_size))
+	requests = [dict(parameter=PAR, channel=n_channel) for n_channel in range(4) for PAR in ['VSET','ISET']]
+	assert caen.get_many_channel_parameters(requests) == [100.,10.,101.,11.,102.,12.,103.,13.]
+	caen.set_many_channel_parameters([dict(parameter='VSET', channel=n_channel, value=50+n_channel) for n_channel in range(4)])
+	assert caen.get_many_channel_parameters([dict(parameter='VSET', channel=n_channel) for n_channel in range(4)]) == [50.,51.,52.,53.]
+	assert len(caen._received_bytes) == 0
+
+@pytest.mark.parametrize('through', ['socket','serial'])
+def test_late_answer_is_not_taken_as_the_next_answer(monkeypatch, through):
+	instrument = FakeInstrument(packet_size=3, delays={'ISET': 1.5})
+	caen = connect(monkeypatch, instrument, timeout=1, through=through)
+	with pytest.raises((TimeoutError, socket.timeout)):
+		caen.get_single_channel_parameter('ISET', 0)
+	assert len(caen._received_bytes) == 0
+	instrument.delays = {}
+	assert caen.get_single_channel_parameter('VSET', 1) == 101
+	assert caen.get_single_channel_parameter('ISET', 2) == 12
+	if through == 'socket':
+		assert instrument.n_connections == 2
+
+def test_late_answer_in_pipelined_query(monkeypatch):
+	instrument = FakeInstrument(delays={'ISET': 1.5})
+	caen = connect(monkeypatch, instrument, timeout=1)
+	with pytest.raises((TimeoutError, socket.timeout)):
+		caen.get_many_channel_parameters([dict(parameter=PAR, channel=0) for PAR in ['VSET','ISET','VSET']])
+	assert len(caen._received_bytes) == 0
+	instrument.delays = {}
+	assert caen.get_many_channel_parameters([dict(parameter='VSET', channel=n_channel) for n_channel in range(4)]) == [100.,101.,102.,103.]
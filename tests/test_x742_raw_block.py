@@ -0,0 +1,128 @@
+from pathlib import Path
+import numpy
+import pytest
+from CAENpy.CAENDigitizer import parse_x742_raw_block, decode_x742_raw_block, CHANNELS_NAMES
+
+RECORD_LENGTH = 16
+
+def pack_12_bit_samples(samples)->bytes:
+	# Packs the samples as a little endian bit stream, i.e. sample n goes in bits [12n+11:12n].
+	bit_stream = 0
+	for n,sample in enumerate(samples):
+		bit_stream |= int(sample) << (12*n)
+	return bit_stream.to_bytes(len(samples)*12//8, 'little')
+
+def pack_event(samples, event_counter, trigger_time_tag, groups=(0,1), trigger_channel=True, start_index_cell=(5,7), board_id=3, pattern=0x2ABC, header_extra_bits=0):
+	# `samples` has shape (18, RECORD_LENGTH), i.e. CH0...CH7, trigger_group_1, CH8...CH15, trigger_group_2.
+	body = b''
+	for n_group in groups:
+		size = RECORD_LENGTH*3
+		group_header = (start_index_cell[n_group] << 20) | (int(trigger_channel) << 12) | size
+		body += numpy.uint32(group_header).tobytes()
+		body += pack_12_bit_samples(samples[9*n_group:9*n_group+8].T.reshape(-1)) # One sample of each channel after the other.
+		if trigger_channel:
+			body += pack_12_bit_samples(samples[9*n_group+8])
+		body += numpy.uint32(trigger_time_tag + n_group).tobytes() # Group trigger time tag.
+	group_mask = sum(1<<n_group for n_group in groups)
+	header = numpy.array(
+		[
+			(0b1010 << 28) | (4 + len(body)//4),
+			(board_id << 27) | header_extra_bits | (pattern << 8) | group_mask,
+			event_counter,
+			trigger_time_tag,
+		],
+		dtype = '<u4',
+	)
+	return header.tobytes() + body
+
+@pytest.fixture
+def samples():
+	return numpy.random.default_rng(0).integers(0, 2**12, size=(5, 18, RECORD_LENGTH), dtype=numpy.uint16)
+
+def pack_block(samples, **kwargs)->bytes:
+	return b''.join(pack_event(s, event_counter=100+n, trigger_time_tag=7*n, **kwargs) for n,s in enumerate(samples))
+
+def test_round_trip_with_trigger_channel(samples):
+	parsed = parse_x742_raw_block(pack_block(samples))
+	assert parsed['channels'] == tuple(CHANNELS_NAMES)
+	assert parsed['Amplitude (ADCu)'].dtype == numpy.uint16
+	numpy.testing.assert_array_equal(parsed['Amplitude (ADCu)'], samples)
+	numpy.testing.assert_array_equal(parsed['EventCounter'], 100+numpy.arange(5))
+	numpy.testing.assert_array_equal(parsed['TriggerTimeTag'], 7*numpy.arange(5))
+	numpy.testing.assert_array_equal(parsed['BoardId'], 3)
+	numpy.testing.assert_array_equal(parsed['Pattern'], 0x2ABC)
+	assert parsed['StartIndexCell'].shape == (5, 18)
+	numpy.testing.assert_array_equal(parsed['StartIndexCell'][:,:9], 5)
+	numpy.testing.assert_array_equal(parsed['StartIndexCell'][:,9:], 7)
+
+def test_one_group_without_trigger_channel(samples):
+	parsed = parse_x742_raw_block(pack_block(samples, groups=(1,), trigger_channel=False))
+	assert parsed['channels'] == tuple(CHANNELS_NAMES[9:17])
+	numpy.testing.assert_array_equal(parsed['Amplitude (ADCu)'], samples[:,9:17])
+	numpy.testing.assert_array_equal(parsed['StartIndexCell'], 7)
+
+def test_pattern_ignores_board_fail_and_reserved_bits(samples):
+	parsed = parse_x742_raw_block(pack_block(samples, pattern=0x3FFF, header_extra_bits=0b11111 << 22))
+	numpy.testing.assert_array_equal(parsed['Pattern'], 0x3FFF)
+	numpy.testing.assert_array_equal(parsed['BoardId'], 3)
+
+def test_decode_columnar_and_events_agree(samples):
+	block = pack_block(samples)
+	time_axis_parameters = dict(sampling_frequency=5e9, post_trigger_size=50, fast_trigger_mode=True)
+	batch = decode_x742_raw_block(block, ADC_peak_to_peak_dynamic_range_volts=1, time_axis_parameters=time_axis_parameters, columnar=True)
+	events = decode_x742_raw_block(block, ADC_peak_to_peak_dynamic_range_volts=1, time_axis_parameters=time_axis_parameters)
+	assert len(events) == 5
+	for n_event,event in enumerate(events):
+		for n_channel,channel in enumerate(batch['channels']):
+			numpy.testing.assert_array_equal(event[channel]['Amplitude (V)'], batch['Amplitude (V)'][n_event,n_channel])
+	assert numpy.all(numpy.diff(events[0]['CH0']['Time (s)']) > 0)
+
+def test_empty_block():
+	parsed = parse_x742_raw_block(b'')
+	assert parsed['Amplitude (ADCu)'].shape == (0,0,0)
+	assert len(parsed['EventCounter']) == 0
+
+@pytest.mark.parametrize('corrupt', [
+	pytest.param(lambda block: block[:-4], id='truncated by one word'),
+	pytest.param(lambda block: block[:-2], id='not a multiple of 4 bytes'),
+	pytest.param(lambda block: block[:4*9], id='truncated inside the first event'),
+	pytest.param(lambda block: b'\x00\x00\x00\x00' + block[4:], id='invalid header mark'),
+	pytest.param(lambda block: numpy.uint32((0b1010 << 28) | 3).tobytes() + block[4:], id='event size smaller than its header'),
+])
+def test_corrupt_blocks_are_rejected(samples, corrupt):
+	with pytest.raises(ValueError):
+		parse_x742_raw_block(corrupt(pack_block(samples)))
+
+def test_events_of_different_size_are_rejected(samples):
+	block = pack_event(samples[0], 0, 0) + pack_event(samples[1], 1, 1, trigger_channel=False)
+	with pytest.raises(ValueError):
+		parse_x742_raw_block(block)
+
+def test_group_size_not_multiple_of_3_is_rejected(samples):
+	block = bytearray(pack_block(samples[:1]))
+	block[16:20] = numpy.uint32((5 << 20) | (1 << 12) | 47).tobytes() # Group header of group 0.
+	with pytest.raises(ValueError):
+		parse_x742_raw_block(bytes(block))
+
+def test_groups_not_in_the_DT5742_are_rejected(samples):
+	block = bytearray(pack_block(samples[:1]))
+	block[4:8] = numpy.uint32((3 << 27) | 0b0111).tobytes()
+	with pytest.raises(ValueError):
+		parse_x742_raw_block(bytes(block))
+
+CAPTURED_BLOCK_PATH = Path(__file__).parent/'data'/'x742_raw_block_DRS4_off.npz'
+
+@pytest.mark.skipif(not CAPTURED_BLOCK_PATH.is_file(), reason=f'No block captured from a DT5742 in {CAPTURED_BLOCK_PATH}. ')
+def test_captured_block_matches_libCAENDigitizer():
+	# All the other tests pack the blocks following the same reading of the user manual as `parse_x742_raw_block`, so only this one can tell if that reading is wrong. The file holds a raw block transfer from a DT5742 acquiring with the DRS4 correction disabled, as returned by `CAEN_DGTZ_ReadData` (e.g. from `read_raw_capture`), and what `CAEN_DGTZ_DecodeEvent` decoded from it:
+	# - 'block': uint8 array, the raw block.
+	# - 'channels': the names of the channels, in the order of the second axis of 'Amplitude (ADCu)'.
+	# - 'Amplitude (ADCu)': shape (n_events, n_channels, record_length), the `DataChannel` of each event.
+	# - 'EventCounter', 'TriggerTimeTag', 'Pattern', 'BoardId': the `EventInfo` of each event.
+	# - 'StartIndexCell': shape (n_events, n_channels), the `StartIndexCell` of the group of each channel.
+	captured = numpy.load(CAPTURED_BLOCK_PATH)
+	parsed = parse_x742_raw_block(captured['block'].tobytes())
+	assert parsed['channels'] == tuple(captured['channels'])
+	numpy.testing.assert_array_equal(parsed['Amplitude (ADCu)'], captured['Amplitude (ADCu)'])
+	for field in ['EventCounter','TriggerTimeTag','Pattern','BoardId','StartIndexCell']:
+		numpy.testing.assert_array_equal(parsed[field], captured[field], err_msg=field)